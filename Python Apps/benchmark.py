@@ -0,0 +1,156 @@
+# Imported first so the startup timeline starts with the process
+from utilities.startup import startup
+from motion.motion_controller import MotionController
+from pose_estimation.skeleton import load_layout
+from recording.skeleton_stream import SkeletonRecorder
+from socket_sender.socket_receiver import SocketReceiver
+from socket_sender.socket_sender import SocketSender
+from video_feed.video_offline_reader import VideoOfflineReader
+from video_feed.scene_change_detector import SceneChangeDetector
+from utilities.profiler import profiler
+from utilities.stopwatch import Stopwatch
+
+import argparse
+import datetime
+import json
+import platform
+import resource
+import time
+
+
+def create_pose_estimator(args):
+    # Model stacks are imported on demand so the stub modes run without CUDA, TensorRT or TensorFlow
+    if args.pose == 'stub':
+        from pose_estimation.stubs import StubPoseEstimator
+        pose_estimator = StubPoseEstimator(args.models)
+    elif args.pose == 'recorded':
+        from pose_estimation.stubs import RecordedPoseEstimator
+        pose_estimator = RecordedPoseEstimator(args.recorded)
+    else:
+        from pose_estimation.openpose import OpenPose
+        human_detector = None
+        if args.detector == 'stub':
+            from pose_estimation.stubs import StubHumanDetection
+            human_detector = StubHumanDetection()
+        pose_estimator = OpenPose(args.models,  detection_interval=args.detection_interval,  human_detector=human_detector,
+                                  backend=args.backend,  detector_backend=args.detector_backend,  num_threads=args.threads,
+                                  crop_to_person=args.crop_to_person)
+        pose_estimator.warm_up()
+
+    return pose_estimator
+
+
+def run(args):
+    video_reader = VideoOfflineReader(args.video)
+    pose_estimator = create_pose_estimator(args)
+    motion = MotionController(jump_window_s=1.0)
+    receiver = SocketReceiver(port=0,  transport=args.transport)
+    receiver.start()
+    socket_sender = SocketSender(port=receiver.port,  transport=args.transport,  protocol_version=2,  send_on_change=False)
+    recorder = None
+    if args.record is not None:
+        recorder = SkeletonRecorder(args.record,  load_layout(args.models))
+
+    scene_change = SceneChangeDetector(idle_fps=args.idle_fps) if args.scene_gate else None
+
+    profiler.configure(enabled=True,  report_interval_s=float('inf'))
+    num_frames = 0
+    objects = []
+    total_sw = Stopwatch()
+    while args.max_frames is None or num_frames < args.max_frames:
+        frame_sw = Stopwatch()
+        with profiler.stage('read'):
+            buffer = video_reader.read_frame_buffer()
+        if buffer is None:
+            break
+        img = buffer.array
+
+        num_frames += 1
+        timestamp = time.monotonic()
+        with profiler.stage('scene'):
+            infer = scene_change is None or scene_change.should_infer(img,  timestamp)
+        if infer:
+            with profiler.stage('detect'):
+                objects,  _ = pose_estimator.detect(img)
+        if recorder is not None:
+            recorder.record(timestamp,  objects,  getattr(pose_estimator,  'last_detected_humans',  ()))
+        with profiler.stage('gesture'):
+            roll,  pitch,  game_state,  left_wing_roll_target,  right_wing_roll_target,  body_height = motion.parse_objects(objects,  timestamp)
+        with profiler.stage('send'):
+            socket_sender.send(int(roll),  int(pitch),  game_state,  int(left_wing_roll_target),  int(right_wing_roll_target),  int(body_height))
+        if num_frames == 1:
+            startup.mark('first control packet')
+        buffer.release()
+        profiler.record('frame',  frame_sw.get_ns())
+
+    elapsed_s = total_sw.get_ns() / 1e9
+    socket_sender.close()
+    receiver.stop()
+
+    if recorder is not None:
+        recorder.close()
+
+    return {
+        'date': datetime.datetime.now().isoformat(),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+        'video': args.video,
+        'pose': args.pose,
+        'detector': args.detector,
+        'backend': args.backend,
+        'detector_backend': args.detector_backend,
+        'threads': args.threads,
+        'detection_interval': args.detection_interval,
+        'crop_to_person': args.crop_to_person,
+        'scene_gate': scene_change.stats() if scene_change is not None else None,
+        'transport': args.transport,
+        'frames': num_frames,
+        'elapsed_s': elapsed_s,
+        'fps': num_frames / elapsed_s if elapsed_s > 0 else 0.0,
+        'packets_received': receiver.num_packets,
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        'stages': profiler.summary(),
+        'startup': startup.report(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replays a video through detect -> parse_objects -> send as fast as possible')
+    parser.add_argument('video',  help='video file to replay')
+    parser.add_argument('--models',  default='models')
+    parser.add_argument('--pose',  choices=('openpose',  'stub',  'recorded'),  default='openpose')
+    parser.add_argument('--recorded',  help='pose output saved with --record, for --pose recorded')
+    parser.add_argument('--record',  help='append the pose output to this skeleton recording')
+    parser.add_argument('--detector',  choices=('ssd',  'stub'),  default='ssd')
+    parser.add_argument('--backend',  choices=('tensorrt',  'onnxruntime',  'opencv'),  default='tensorrt',  help='pose model runtime for --pose openpose')
+    parser.add_argument('--detector-backend',  choices=('tensorflow',  'opencv'),  default='tensorflow',  help='SSD runtime for --detector ssd')
+    parser.add_argument('--threads',  type=int,  help='intra-op threads for the CPU runtimes')
+    parser.add_argument('--detection-interval',  type=int,  default=1)
+    parser.add_argument('--crop-to-person',  action='store_true',  help='run the pose model on a crop around the detected people')
+    parser.add_argument('--scene-gate',  action='store_true',  help='skip inference on frames where nothing moved')
+    parser.add_argument('--idle-fps',  type=float,  default=1.0,  help='inference rate while the scene is static, for --scene-gate')
+    parser.add_argument('--transport',  choices=('tcp',  'udp'),  default='tcp')
+    parser.add_argument('--max-frames',  type=int)
+    parser.add_argument('--output',  help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = run(args)
+
+    print(f"{results['frames']} frames in {results['elapsed_s']:.2f}s: {results['fps']:.1f} fps, peak RSS {results['peak_rss_mb']:.0f} MB")
+    first_packet = [event for event in results['startup'] if event['name'] == 'first control packet']
+    if len(first_packet) > 0:
+        print(f"  first control packet {first_packet[0]['start_s']:.2f}s after start")
+    if results['scene_gate'] is not None:
+        print(f"  scene gate skipped {results['scene_gate']['skipped']} frames ({results['scene_gate']['skipped_ratio']:.2f}), "
+              f"woke {results['scene_gate']['wakeups']} times")
+    for name, stats in results['stages'].items():
+        print(f"  {name:8s} mean={stats['mean_ms']:.2f}ms p50={stats['p50_ms']:.2f}ms p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms")
+
+    if args.output is not None:
+        with open(args.output,  'w') as f:
+            json.dump(results,  f,  indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+from video_feed.video_reader import VideoReader
+from video_feed.video_process_reader import VideoProcessReader
+from video_feed.shared_frame_ring import SharedFrameRing
+from jetcam.frame_pool import unpooled
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+
+class PacedReader(VideoReader):
+    """A camera stand-in that delivers a frame every 1/fps seconds, stamped with the time it was read"""
+
+    def __init__(self,  fps,  duration_s,  shape=(224,  224,  3)):
+        self._interval_s = 1.0 / fps
+        self._image = np.zeros(shape,  dtype=np.uint8)
+        self._next = time.monotonic()
+        self._end = self._next + duration_s
+
+    def read_frame(self):
+        self._next += self._interval_s
+        if self._next > self._end:
+            return None
+        time.sleep(max(0.0,  self._next - time.monotonic()))
+        return self._image
+
+    def read_frame_buffer(self):
+        image = self.read_frame()
+        if image is None:
+            return None
+
+        buffer = unpooled(image)
+        buffer.timestamp = time.monotonic()
+        return buffer
+
+
+def python_work(duration_s):
+    # Skeleton parsing and gestures are plain Python, which holds the GIL
+    end = time.perf_counter() + duration_s
+    total = 0
+    while time.perf_counter() < end:
+        for i in range(1000):
+            total += i * i
+    return total
+
+
+def busy_thread(stop,  duty):
+    # Stands in for the parse executor, preview and socket threads of the pipeline
+    while not stop.is_set():
+        python_work(0.005 * duty)
+        time.sleep(0.005 * (1.0 - duty))
+
+
+def consume(reader,  args):
+    """Inference in this process: python work on every frame, and a long stall now and then"""
+    stop = threading.Event()
+    threads = [threading.Thread(target=busy_thread,  args=(stop,  0.5),  daemon=True) for _ in range(args.busy_threads)]
+    for thread in threads:
+        thread.start()
+
+    num_frames = 0
+    next_stall = time.monotonic() + args.stall_every_s
+    while True:
+        frame = reader.read_frame_buffer()
+        if frame is None:
+            break
+        num_frames += 1
+        python_work(args.inference_ms / 1000.0)
+        if time.monotonic() >= next_stall:
+            python_work(args.stall_ms / 1000.0)
+            next_stall = time.monotonic() + args.stall_every_s
+        frame.release()
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return num_frames
+
+
+class CaptureThreadReader(VideoReader):
+    """The same ring, written by a capture thread in this process as jetcam's Camera does"""
+
+    def __init__(self,  reader):
+        self._reader = reader
+        self._last_seq = 0
+        buffer = reader.read_frame_buffer()
+        self._ring = SharedFrameRing(buffer.array.shape,  buffer.array.dtype)
+        self._ring.write(buffer.array,  buffer.timestamp)
+        self._thread = threading.Thread(target=self._capture,  daemon=True)
+        self._thread.start()
+
+    def _capture(self):
+        buffer = self._reader.read_frame_buffer()
+        while buffer is not None:
+            self._ring.write(buffer.array,  buffer.timestamp)
+            buffer = self._reader.read_frame_buffer()
+        self._ring.finish()
+
+    def read_frame(self):
+        frame = self.read_frame_buffer()
+        if frame is None:
+            return None
+
+        image = np.copy(frame.array)
+        frame.release()
+        return image
+
+    def read_frame_buffer(self):
+        frame = self._ring.read_latest(self._last_seq)
+        if frame is not None:
+            self._last_seq = frame.frame_id
+        return frame
+
+    def stats(self):
+        return self._ring.stats()
+
+    def close(self):
+        self._thread.join()
+        self._ring.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Capture jitter with the camera read on a thread of the inference process and in a process of its own')
+    parser.add_argument('--duration',  type=float,  default=10.0)
+    parser.add_argument('--fps',  type=float,  default=30.0)
+    parser.add_argument('--inference-ms',  type=float,  default=25.0,  help='python work per frame')
+    parser.add_argument('--stall-ms',  type=float,  default=300.0,  help='length of an occasional inference stall')
+    parser.add_argument('--stall-every-s',  type=float,  default=2.0)
+    parser.add_argument('--busy-threads',  type=int,  default=3)
+    args = parser.parse_args()
+
+    # The process is forked before this process starts any thread of its own
+    runs = [
+        ('capture process',  lambda: VideoProcessReader(PacedReader,  args.fps,  args.duration)),
+        ('capture thread',  lambda: CaptureThreadReader(PacedReader(args.fps,  args.duration))),
+    ]
+    for name, create_reader in runs:
+        reader = create_reader()
+        num_frames = consume(reader,  args)
+        stats = reader.stats()
+        reader.close()
+        print(f"{name:16s} interval={stats['interval_ms']:5.1f}ms jitter={stats['jitter_ms']:5.2f}ms max={stats['max_interval_ms']:6.1f}ms "
+              f"written={stats['written']} inferred={num_frames} overwritten={stats['overwritten']} dropped={stats['dropped']}")
+
+
+if __name__ == '__main__':
+    main()
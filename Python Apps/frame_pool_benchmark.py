@@ -0,0 +1,69 @@
+from jetcam.frame_pool import shared_pool_stats
+from pipeline.pipeline_runner import PipelineRunner, FramePacket
+from video_feed.video_offline_reader import VideoOfflineReader
+
+import argparse
+import resource
+import time
+import tracemalloc
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs a video through the pipeline with pooled frames and checks memory stays flat')
+    parser.add_argument('video')
+    parser.add_argument('--frames',  type=int,  default=20000)
+    parser.add_argument('--detect-ms',  type=float,  default=1.0,  help='simulated inference time, slower than capture so frames get dropped')
+    args = parser.parse_args()
+
+    state = {'reader': VideoOfflineReader(args.video),  'frames': 0}
+
+    def capture_stage():
+        if state['frames'] >= args.frames:
+            return None
+
+        buffer = state['reader'].read_frame_buffer()
+        if buffer is None:
+            # Loop the video
+            state['reader'] = VideoOfflineReader(args.video)
+            buffer = state['reader'].read_frame_buffer()
+
+        state['frames'] += 1
+        packet = FramePacket(state['frames'],  buffer.array)
+        packet.buffer = buffer
+        return packet
+
+    def detect_stage(packet):
+        time.sleep(args.detect_ms / 1000.0)
+        return packet
+
+    tracemalloc.start()
+    runner = PipelineRunner(queue_size=1,  on_drop=FramePacket.release)
+    runner.add_source('capture',  capture_stage)
+    runner.add_stage('detect',  detect_stage)
+    runner.start()
+
+    samples = []
+    next_sample = 0
+    while runner.is_running():
+        packet = runner.get_output(timeout=0.1)
+        if packet is not None:
+            packet.release()
+
+        if state['frames'] >= next_sample:
+            next_sample += args.frames // 10
+            allocations = sum(stats['allocations'] for stats in shared_pool_stats())
+            traced,  _ = tracemalloc.get_traced_memory()
+            rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+            samples.append((state['frames'],  allocations,  traced))
+            print(f"frame {state['frames']:6d}: pool allocations={allocations} traced={traced / 1024:.0f} KB peak RSS={rss_mb:.0f} MB")
+
+    runner.stop()
+
+    # Ignore the warm-up sample, after that the pool must not grow
+    steady = samples[1:]
+    assert steady[-1][1] == steady[0][1], "the frame pool kept allocating"
+    print(f"Pool allocations flat at {steady[-1][1]} buffers over {state['frames']} frames")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+from motion.gesture_kernel import GestureKernel
+from utilities.vector import Vector
+
+import json
+import math
+import time
+import numpy as np
+
+
+def vector_gestures(left_elbow, right_elbow, left_shoulder, right_shoulder):
+    # The per-call Vector maths GestureKernel replaces, kept as the reference
+    left_shoulder_to_elbow_vec = Vector(left_elbow[0] - left_shoulder[0],  left_elbow[1] - left_shoulder[1]).normalise()
+    horizVec = Vector(1.0,  0.0)
+    left_wing_roll_target = min(90,  max(-15,  left_shoulder_to_elbow_vec.angle_from_vector(horizVec) * 180.0 / math.pi + 30))
+
+    right_shoulder_to_elbow_vec = Vector(right_elbow[0] - right_shoulder[0],  right_elbow[1] - right_shoulder[1]).normalise()
+    horizVec = Vector(-1.0,  0.0)
+    right_wing_roll_target = min(90,  max(-15,  horizVec.angle_from_vector(right_shoulder_to_elbow_vec) * 180.0 / math.pi + 30))
+
+    left_elbow_to_right_elbow_vec = Vector(left_elbow[0] - right_elbow[0],  left_elbow[1] - right_elbow[1]).normalise()
+    horizVec = Vector(1.0,  0.0)
+    roll = left_elbow_to_right_elbow_vec.angle_from_vector(horizVec) * 180.0 / math.pi
+
+    return left_wing_roll_target, right_wing_roll_target, roll
+
+
+with open('models/human_pose.json', 'r') as f:
+    joint_names = json.load(f)['keypoints']
+joint_index = {name: idx for idx, name in enumerate(joint_names)}
+kernel = GestureKernel(joint_index)
+
+num_frames = 20000
+rng = np.random.default_rng(0)
+keypoints = rng.random((num_frames, len(joint_names), 2)).astype(np.float32)
+valid = np.ones((num_frames, len(joint_names)), dtype=bool)
+joints = [keypoints[:, joint_index[name]].astype(np.float64) for name in ('left_elbow', 'right_elbow', 'left_shoulder', 'right_shoulder')]
+
+t0 = time.perf_counter()
+reference = np.array([vector_gestures(joints[0][t], joints[1][t], joints[2][t], joints[3][t]) for t in range(num_frames)])
+vector_s = time.perf_counter() - t0
+
+t0 = time.perf_counter()
+per_frame = [kernel.evaluate(keypoints[t], valid[t]) for t in range(num_frames)]
+per_frame_s = time.perf_counter() - t0
+
+t0 = time.perf_counter()
+per_frame_scalar = [kernel.evaluate_one(keypoints[t], valid[t]) for t in range(num_frames)]
+scalar_s = time.perf_counter() - t0
+
+t0 = time.perf_counter()
+session = kernel.evaluate(keypoints, valid)
+session_s = time.perf_counter() - t0
+
+for column, name in enumerate(('left_wing_roll_target', 'right_wing_roll_target', 'roll')):
+    assert np.allclose(reference[:, column], session[name], atol=1e-9), f"{name} differs from the Vector reference"
+    assert np.allclose(reference[:, column], [values[name] for values in per_frame], atol=1e-9), f"{name} differs from the Vector reference"
+    assert np.allclose(reference[:, column], [values[name] for values in per_frame_scalar], atol=1e-9), f"{name} differs from the Vector reference"
+
+print(f"GestureKernel matches the Vector reference on {num_frames} skeletons")
+print(f"Vector:                {vector_s * 1e6 / num_frames:.2f} us/frame")
+print(f"GestureKernel (frame): {per_frame_s * 1e6 / num_frames:.2f} us/frame")
+print(f"GestureKernel (one):   {scalar_s * 1e6 / num_frames:.2f} us/frame, as MotionController runs it")
+print(f"GestureKernel (batch): {session_s * 1e6 / num_frames:.3f} us/frame")
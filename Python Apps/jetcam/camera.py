@@ -1,9 +1,20 @@
 import traitlets
 import threading
+import time
 import numpy as np
 
+from .frame_pool import shared_pool
+
 
 class Camera(traitlets.HasTraits):
+    """With running set, a background thread captures every frame into a pooled buffer
+    and publishes it, numbered and stamped with its capture time, as the latest frame.
+    wait_for_next() hands the latest frame over to one consumer; a frame replaced before
+    anyone took it counts as dropped, and read() returning a frame it already returned
+    counts as a duplicate. Frames are never written while a consumer holds them."""
+
+    _RETRY_WAIT_S = 0.1
+    _READ_TIMEOUT_S = 2.0
 
     value = traitlets.Any()
     width = traitlets.Integer(default_value=224)
@@ -15,32 +26,109 @@ class Camera(traitlets.HasTraits):
         super(Camera, self).__init__(*args, **kwargs)
         if self.format == 'bgr8':
             self.value = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self._pool = shared_pool((self.height, self.width, 3))
         self._running = False
+        self._cond = threading.Condition()
+        self._latest = None
+        self._latest_id = 0
+        self.num_captured = 0
+        self.num_dropped = 0
+        self.num_duplicates = 0
+        self.num_errors = 0
             
-    def _read(self):
-        """Blocking call to read frame from camera"""
+    def _read(self, out=None):
+        """Blocking call to read frame from camera into out, or into a new array if out is None"""
         raise NotImplementedError
         
     def read(self):
+        """Reads a frame. While running, returns a copy of the latest one without waiting for
+        the sensor, which is the frame read last time when no new one has arrived since"""
         if self._running:
-            raise RuntimeError('Cannot read directly while camera is running')
+            buffer = self.wait_for_next(0.0 if self._latest_id > 0 else None)
+            if buffer is None:
+                self.num_duplicates += 1
+                return self.value
+            self.value = np.copy(buffer.array)
+            buffer.release()
+            return self.value
         self.value = self._read()
         return self.value
-    
+
+    def read_buffer(self, timeout=None):
+        """Reads the next frame into a pooled FrameBuffer, the caller must release() it.
+        While running, waits up to timeout, by default _READ_TIMEOUT_S, for the capture
+        thread's next frame instead: raises when none arrives, returns None once stopped."""
+        if self._running:
+            timeout = self._READ_TIMEOUT_S if timeout is None else timeout
+            buffer = self.wait_for_next(timeout)
+            if buffer is None and self._running:
+                raise RuntimeError('No image from camera within {:.1f}s'.format(timeout))
+            return buffer
+        buffer = self._pool.acquire()
+        try:
+            self._read(buffer.array)
+        except:
+            buffer.release()
+            raise
+        buffer.timestamp = time.monotonic()
+        return buffer
+
+    def wait_for_next(self, timeout=None):
+        """The latest frame not handed over yet as a FrameBuffer to release(), waiting up to
+        timeout for one; None on timeout or when the camera stops running"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._latest is not None or not self._running, timeout):
+                return None
+            buffer = self._latest
+            self._latest = None
+        return buffer
+
     def _capture_frames(self):
-        while True:
-            if not self._running:
-                break
-            self.value = self._read()
+        while self._running:
+            buffer = self._pool.acquire()
+            try:
+                self._read(buffer.array)
+            except RuntimeError:
+                buffer.release()
+                self.num_errors += 1
+                # A camera that stopped delivering is retried, rather than spun on
+                with self._cond:
+                    self._cond.wait_for(lambda: not self._running, self._RETRY_WAIT_S)
+                continue
+            buffer.timestamp = time.monotonic()
+
+            with self._cond:
+                self._latest_id += 1
+                buffer.frame_id = self._latest_id
+                self.num_captured += 1
+                if self._latest is not None:
+                    self._latest.release()
+                    self.num_dropped += 1
+                self._latest = buffer
+                self._cond.notify_all()
+
+    def stats(self):
+        return {
+            'captured': self.num_captured,
+            'dropped': self.num_dropped,
+            'duplicates': self.num_duplicates,
+            'errors': self.num_errors,
+        }
             
     @traitlets.observe('running')
     def _on_running(self, change):
         if change['new'] and not change['old']:
             # transition from not running -> running
             self._running = True
-            self.thread = threading.Thread(target=self._capture_frames)
+            self.thread = threading.Thread(target=self._capture_frames, name='camera', daemon=True)
             self.thread.start()
         elif change['old'] and not change['new']:
             # transition from running -> not running
-            self._running = False
-            self.thread.join()
\ No newline at end of file
+            with self._cond:
+                self._running = False
+                self._cond.notify_all()
+            self.thread.join()
+            with self._cond:
+                if self._latest is not None:
+                    self._latest.release()
+                    self._latest = None
@@ -32,8 +32,9 @@ class CSICamera(Camera):
         return 'nvarguscamerasrc sensor-id=%d ! video/x-raw(memory:NVMM), width=%d, height=%d, format=(string)NV12, framerate=(fraction)%d/1 ! nvvidconv flip-method=2 ! video/x-raw, width=(int)%d, height=(int)%d, format=(string)BGRx ! videoconvert ! appsink' % (
                 self.capture_device, self.capture_width, self.capture_height, self.capture_fps, self.width, self.height)
     
-    def _read(self):
-        re, image = self.cap.read()
+    def _read(self, out=None):
+        # GStreamer already scales to width x height, so the frame is decoded straight into out
+        re, image = self.cap.read(image=out)
         if re:
             return image
         else:
@@ -0,0 +1,94 @@
+import threading
+import numpy as np
+
+
+class FrameBuffer(object):
+    """A frame borrowed from a FramePool. Call release() once nothing reads the
+    array any more so the next capture can reuse it."""
+
+    __slots__ = ('array', '_pool', 'timestamp', 'frame_id')
+
+    def __init__(self, pool, array):
+        self._pool = pool
+        self.array = array
+        # time.monotonic() when the frame was captured and its number, if the reader knows them
+        self.timestamp = None
+        self.frame_id = None
+
+    def release(self):
+        if self._pool is not None:
+            pool = self._pool
+            self._pool = None
+            pool._put(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
+
+
+class FramePool(object):
+    """Preallocated frames of one shape. acquire() only allocates when every buffer
+    is still held, so a steady-state capture loop allocates nothing."""
+
+    def __init__(self, shape, dtype=np.uint8, size=4):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._free = [np.empty(self.shape, dtype=self.dtype) for _ in range(size)]
+        self._lock = threading.Lock()
+        self.num_allocations = size
+        self.num_acquired = 0
+        self.num_in_use = 0
+
+    def acquire(self):
+        with self._lock:
+            self.num_acquired += 1
+            self.num_in_use += 1
+            if self._free:
+                return FrameBuffer(self, self._free.pop())
+
+            self.num_allocations += 1
+
+        return FrameBuffer(self, np.empty(self.shape, dtype=self.dtype))
+
+    def _put(self, buffer):
+        with self._lock:
+            self.num_in_use -= 1
+            self._free.append(buffer.array)
+        buffer.array = None
+
+    def stats(self):
+        return {
+            'shape': self.shape,
+            'allocations': self.num_allocations,
+            'acquired': self.num_acquired,
+            'in_use': self.num_in_use,
+        }
+
+
+_shared_pools = {}
+_shared_pools_lock = threading.Lock()
+
+
+def shared_pool(shape, dtype=np.uint8):
+    """The pool shared by every reader producing frames of this shape"""
+    key = (tuple(shape), np.dtype(dtype).str)
+    with _shared_pools_lock:
+        pool = _shared_pools.get(key)
+        if pool is None:
+            pool = FramePool(shape, dtype)
+            _shared_pools[key] = pool
+
+    return pool
+
+
+def shared_pool_stats():
+    with _shared_pools_lock:
+        return [pool.stats() for pool in _shared_pools.values()]
+
+
+def unpooled(array):
+    """Wraps a frame that did not come from a pool, release() does nothing"""
+    return FrameBuffer(None, array)
@@ -15,6 +15,7 @@ class USBCamera(Camera):
     
     def __init__(self, *args, **kwargs):
         super(USBCamera, self).__init__(*args, **kwargs)
+        self._capture_buffer = np.empty((self.capture_height, self.capture_width, 3), dtype=np.uint8)
         try:
             self.cap = cv2.VideoCapture(self._gst_str(), cv2.CAP_GSTREAMER)
 
@@ -32,10 +33,17 @@ class USBCamera(Camera):
     def _gst_str(self):
         return 'v4l2src device=/dev/video{} ! video/x-raw, width=(int){}, height=(int){}, framerate=(fraction){}/1 ! videoconvert !  video/x-raw, format=(string)BGR ! appsink'.format(self.capture_device, self.capture_width, self.capture_height, self.capture_fps)
     
-    def _read(self):
-        re, image = self.cap.read()
+    def _read(self, out=None):
+        # The full size capture is decoded into the same buffer every time
+        re, image = self.cap.read(image=self._capture_buffer)
         if re:
-            image_resized = cv2.resize(image,(int(self.width),int(self.height)))
-            return image_resized
+            self._capture_buffer = image
+            if image.shape[1] == self.width and image.shape[0] == self.height:
+                # Delivered at the capture resolution, so there is nothing to scale
+                if out is None:
+                    return image.copy()
+                np.copyto(out, image)
+                return out
+            return cv2.resize(self._capture_buffer, (int(self.width), int(self.height)), dst=out)
         else:
             raise RuntimeError('Could not read image from camera')
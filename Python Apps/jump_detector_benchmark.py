@@ -0,0 +1,72 @@
+from motion.jump_window import JumpWindow
+
+import random
+import time
+
+
+def legacy_is_jump(history, cur_shoulder_y, jump_threshold, window_size=10):
+    # The list based detector JumpWindow replaces, kept as the reference
+    history.append(cur_shoulder_y)
+    if len(history) > window_size:
+        history.pop(0)
+
+    peak = min(history)
+    peak_idx = history.index(peak)
+    try:
+        start_bottom = max(history[: peak_idx])
+        end_bottom = max(history[peak_idx:])
+    except Exception as _:
+        return False
+
+    if abs(peak - start_bottom) >= jump_threshold and abs(peak - end_bottom) >= jump_threshold:
+        history.clear()
+        return True
+
+    return False
+
+
+def window_is_jump(window, cur_shoulder_y, jump_threshold):
+    window.push(cur_shoulder_y)
+    extremes = window.extremes()
+    if extremes is None:
+        return False
+
+    peak, start_bottom, end_bottom = extremes
+    if abs(peak - start_bottom) >= jump_threshold and abs(peak - end_bottom) >= jump_threshold:
+        window.clear()
+        return True
+
+    return False
+
+
+def make_sequence(num_frames, seed=0):
+    # Standing still with noise and a jump every 10 seconds at 30 fps, quantised so ties happen
+    rng = random.Random(seed)
+    samples = []
+    for i in range(num_frames):
+        jump = 0.3 if i % 300 in (150, 151, 152) else 0.0
+        samples.append(round(1.6 - jump + rng.uniform(-0.05, 0.05), 2))
+
+    return samples
+
+
+num_frames = 200000
+threshold = 0.2
+samples = make_sequence(num_frames)
+
+# 10 samples is the default window, 60 and 240 match a 1 second window at 60 fps and 240 fps
+for window_size in (10, 60, 240):
+    history = []
+    t0 = time.perf_counter()
+    legacy_decisions = [legacy_is_jump(history, y, threshold, window_size) for y in samples]
+    legacy_s = time.perf_counter() - t0
+
+    window = JumpWindow(window_size)
+    t0 = time.perf_counter()
+    window_decisions = [window_is_jump(window, y, threshold) for y in samples]
+    window_s = time.perf_counter() - t0
+
+    # tests/test_jump_window.py checks the decisions match, here they are only counted
+    print(f"Window {window_size}: {sum(window_decisions)} jumps over {num_frames} frames, {sum(legacy_decisions)} with the list window")
+    print(f"  List window: {legacy_s * 1e6 / num_frames:.2f} us/frame")
+    print(f"  JumpWindow:  {window_s * 1e6 / num_frames:.2f} us/frame")
@@ -0,0 +1,98 @@
+from motion.keypoint_filter import FrameSkipPolicy
+from motion.player_tracker import PlayerTracker
+from motion.motion_controller import MotionController
+from pose_estimation.skeleton import Skeleton
+from pose_estimation.stubs import StubPoseEstimator
+
+import argparse
+
+import numpy as np
+
+
+FRAME_S = 1.0 / 30.0
+# Every MOVING_FRAMES frames the player stands still for STILL_FRAMES, where skipping pays off
+MOVING_FRAMES = 300
+STILL_FRAMES = 90
+
+
+def make_session(num_frames,  noise,  seed=0):
+    # The stub player flapping and jumping, with pauses, plus keypoint jitter like the model's
+    pose_estimator = StubPoseEstimator('models')
+    image = np.zeros((224, 224, 3),  dtype=np.uint8)
+    rng = np.random.default_rng(seed)
+    clean = []
+    noisy = []
+    for i in range(num_frames):
+        if i % (MOVING_FRAMES + STILL_FRAMES) < MOVING_FRAMES or len(clean) == 0:
+            skeleton = pose_estimator.detect(image)[0][0]
+        else:
+            skeleton = Skeleton(clean[-1].layout,  clean[-1].joints.copy(),  clean[-1].valid.copy())
+        clean.append(skeleton)
+        joints = (skeleton.joints + rng.normal(0.0,  noise,  skeleton.joints.shape)).astype(np.float32)
+        noisy.append(Skeleton(skeleton.layout,  joints,  skeleton.valid.copy()))
+
+    return clean,  noisy
+
+
+def run_controller(frames):
+    """Wing roll targets and roll per frame, and the frames a jump was detected on"""
+    motion = MotionController(jump_window_s=1.0)
+    controls = []
+    jumps = []
+    for i, objects in enumerate(frames):
+        roll,  _,  game_state,  left_wing_roll_target,  right_wing_roll_target,  _ = motion.parse_objects(objects,  i * FRAME_S)
+        controls.append((left_wing_roll_target,  right_wing_roll_target,  roll))
+        if game_state == 1:
+            jumps.append(i)
+            # Back on the ground so the next jump is counted too
+            motion._game_state = 0
+
+    return np.array(controls),  jumps
+
+
+def filter_session(noisy,  skip_interval):
+    # The same filtering and skipping main.py does, through the player tracker
+    player_tracker = PlayerTracker()
+    frame_skip = FrameSkipPolicy(skip_interval)
+    frames = []
+    inferred = []
+    for i, skeleton in enumerate(noisy):
+        timestamp = i * FRAME_S
+        inferred.append(frame_skip.should_infer(player_tracker.speed(),  player_tracker.is_tracking()))
+        if inferred[-1]:
+            players = player_tracker.update([skeleton],  timestamp)
+        else:
+            players = player_tracker.predict(timestamp)
+        frames.append([skeleton for _, skeleton in players])
+
+    return frames,  np.array(inferred)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Control error and inference load with and without the keypoint filter and frame skipping')
+    parser.add_argument('--frames',  type=int,  default=3000)
+    parser.add_argument('--noise',  type=float,  default=0.005,  help='keypoint jitter in normalised image units')
+    args = parser.parse_args()
+
+    clean,  noisy = make_session(args.frames,  args.noise)
+    reference,  reference_jumps = run_controller([[skeleton] for skeleton in clean])
+
+    runs = [('raw',  [[skeleton] for skeleton in noisy],  np.ones(len(noisy),  dtype=bool))]
+    for skip_interval in (1, 2, 3):
+        frames,  inferred = filter_session(noisy,  skip_interval)
+        runs.append((f"filtered, skip {skip_interval}",  frames,  inferred))
+
+    moving = np.arange(args.frames) % (MOVING_FRAMES + STILL_FRAMES) < MOVING_FRAMES
+    print(f"{args.frames} frames, {len(reference_jumps)} jumps without noise")
+    for name, frames, inferred in runs:
+        controls,  jumps = run_controller(frames)
+        error = np.abs(controls - reference)
+        # Frame to frame change the clean session does not have
+        jitter = np.abs(np.diff(controls,  axis=0) - np.diff(reference,  axis=0)).mean(axis=0)
+        print(f"  {name:18s} inference={inferred.mean():.2f} (flapping {inferred[moving].mean():.2f}, still {inferred[~moving].mean():.2f}) "
+              f"wing error={error[:, :2].mean():.2f}deg roll error={error[:, 2].mean():.2f}deg "
+              f"wing jitter={jitter[:2].mean():.2f}deg/frame jumps={len(jumps)}")
+
+
+if __name__ == '__main__':
+    main()
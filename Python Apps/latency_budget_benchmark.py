@@ -0,0 +1,93 @@
+from motion.keypoint_filter import FrameSkipPolicy
+from pipeline.latency_budget import LatencyBudgetController, default_levels
+
+import argparse
+
+import numpy as np
+
+
+FRAME_S = 1.0 / 30.0
+# Per-frame cost of each part on an unthrottled Jetson, in ms
+BASE_MS = 8.0
+PREVIEW_MS = 6.0
+POSE_MS = 24.0
+SSD_MS = 14.0
+
+
+def throttle(t,  duration_s):
+    # Clocks drop over the middle of the session and recover near the end
+    phase = t / duration_s
+    if phase < 0.25 or phase > 0.85:
+        return 1.0
+    if phase < 0.4:
+        return 1.0 + (phase - 0.25) / 0.15 * 0.9
+    return 1.9
+
+
+def player_speed(t):
+    # Fastest keypoint speed: standing still, flapping gently and flapping hard, in turn every 10s
+    return (0.2,  0.6,  1.5)[int(t / 10.0) % 3]
+
+
+def simulate(duration_s,  budget_ms,  controller_args,  seed=0):
+    """Frame latencies of a session where the GPU throttles, with the knobs set by a
+    LatencyBudgetController, or left at full quality when controller_args is None.
+    Inference is skipped by a FrameSkipPolicy as in main.py, which follows the player's speed."""
+    rng = np.random.default_rng(seed)
+    knobs = dict(default_levels()[0])
+    frame_skip = FrameSkipPolicy(knobs['skip_interval'],  force_skip=knobs['force_skip'])
+
+    def apply(settings):
+        knobs.update(settings)
+        frame_skip.set_skip_interval(settings['skip_interval'],  settings['force_skip'])
+
+    controller = None
+    if controller_args is not None:
+        controller = LatencyBudgetController(apply,  budget_ms=budget_ms,  **controller_args)
+
+    latencies = []
+    num_inferred = 0
+    num_frames = int(duration_s / FRAME_S)
+    for frame in range(num_frames):
+        t = frame * FRAME_S
+        cost = BASE_MS
+        if knobs['preview']:
+            cost += PREVIEW_MS
+        if frame_skip.should_infer(player_speed(t)):
+            cost += POSE_MS
+            num_inferred += 1
+        if frame % knobs['detection_interval'] == 0:
+            cost += SSD_MS
+        latency = cost * throttle(t,  duration_s) * rng.lognormal(0.0,  0.1)
+        latencies.append(latency)
+        if controller is not None:
+            controller.record(latency,  t)
+
+    latencies = np.array(latencies)
+    metrics = controller.metrics(num_frames * FRAME_S) if controller is not None else None
+    return latencies,  num_inferred / num_frames,  metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Frames over a latency budget during simulated thermal throttling, with and without LatencyBudgetController')
+    parser.add_argument('--duration',  type=float,  default=300.0,  help='simulated session length in seconds')
+    parser.add_argument('--budget-ms',  type=float,  default=50.0)
+    args = parser.parse_args()
+
+    runs = [
+        ('fixed settings',  None),
+        ('controller, no hysteresis',  {'window': 1,  'recover_ratio': 1.0,  'min_dwell_s': 0.0}),
+        ('controller',  {}),
+    ]
+    for name, controller_args in runs:
+        latencies,  inference_ratio,  metrics = simulate(args.duration,  args.budget_ms,  controller_args)
+        line = (f"{name:26s} over budget {np.mean(latencies > args.budget_ms) * 100:5.1f}% p90={np.percentile(latencies, 90):5.1f}ms "
+                f"p99={np.percentile(latencies, 99):5.1f}ms inference={inference_ratio:.2f}")
+        if metrics is not None:
+            line += f" level changes={metrics['degrades'] + metrics['recoveries']}"
+            line += " time at level=" + "/".join(f"{t:.0f}s" for t in metrics['time_at_level_s'])
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
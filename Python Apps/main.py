@@ -1,43 +1,264 @@
+# Imported first so the startup timeline starts with the process
+from utilities.startup import startup
 from socket_sender.socket_sender import  SocketSender
 from pose_estimation.openpose import OpenPose
 from video_feed.video_offline_reader import VideoOfflineReader
 from video_feed.video_csi_reader import VideoCSIReader
 from video_feed.video_usb_reader import VideoUSBReader
-from motion.motion_controller import MotionController
+from video_feed.video_process_reader import VideoProcessReader
+from video_feed.scene_change_detector import SceneChangeDetector
+from motion.keypoint_filter import FrameSkipPolicy
+from motion.player_tracker import PlayerTracker, PlayerControllers
+from pipeline.pipeline_runner import PipelineRunner, FramePacket
+from pipeline.latency_budget import LatencyBudgetController, default_levels
+from recording.skeleton_stream import SkeletonRecorder
+from jetcam.frame_pool import shared_pool_stats
 
-import cv2
+import concurrent.futures
 import numpy as np
+import time
 from utilities.stopwatch import Stopwatch
+from utilities.trace import tracer, TRACE_OFF, TRACE_FRAME, TRACE_DEBUG
+from utilities.profiler import profiler
+from utilities.preview import PreviewRenderer
 
-socket_sender = SocketSender()
-motion = MotionController()
+startup.mark('imports done')
 
-pose_estimator = OpenPose('models')
-video_reader = VideoUSBReader()
+# Per-frame gesture and send records; TRACE_OFF costs nothing, echo prints each record as it is made
+trace_level = TRACE_OFF
+trace_path = 'trace.jsonl'
+tracer.configure(level=trace_level,  capacity=10000,  echo=False)
+
+# Per-stage latency histograms printed every profile_interval_s, and every sample written to profile_csv_path
+enable_profiler = False
+profile_interval_s = 10.0
+profile_csv_path = None
+profiler.configure(enabled=enable_profiler,  report_interval_s=profile_interval_s,  csv_path=profile_csv_path)
+
+# Append every frame's skeletons and boxes to a recording that replay.py can feed to MotionController
+record_path = None
+
+# The game engine reads the legacy TCP payload; protocol_version=2 and transport='udp' need a matching receiver
+socket_sender = SocketSender(transport='tcp',  protocol_version=1)
+# Every player keeps their id across frames and gets their own MotionController; the one in view
+# longest steers the game. Jump detection looks at the last second of shoulder positions whatever the frame rate
+motion = PlayerControllers(jump_window_s=1.0)
+
+# Smooth the players' keypoints, and while they stand still or flap steadily run pose inference
+# every skip_interval frames only and predict the skeletons in between; jumps and fast moves run
+# it on every frame. skip_interval=1 never skips, the latency budget below skips more when frames run late
+use_keypoint_filter = True
+skip_interval = 2
+player_tracker = PlayerTracker(filter_keypoints=use_keypoint_filter)
+frame_skip = FrameSkipPolicy(skip_interval) if use_keypoint_filter else None
+
+# While nothing in front of the camera moves, run the models idle_fps times a second only and
+# reuse the last skeletons in between; the first frame with motion runs them again
+use_scene_gate = True
+idle_fps = 1.0
+scene_change = SceneChangeDetector(idle_fps=idle_fps) if use_scene_gate else None
+
+# Run the SSD person detector every detection_interval frames and track the boxes in between
+detection_interval = 5
+async_detection = True
+# 'tensorrt' + 'tensorflow' on the Jetson; 'onnxruntime' or 'opencv' + 'opencv' run on any CPU with inference_threads threads each
+inference_backend = 'tensorrt'
+detector_backend = 'tensorflow'
+inference_threads = None
+# Run pose inference on a crop around the players instead of the whole frame, so a child standing
+# further back still fills the model input, and skip it while nobody is in view. The camera then
+# delivers its full capture resolution for the crop to take its detail from
+crop_to_person = False
+
+
+def load_pose_estimator():
+    pose_estimator = OpenPose('models',  detection_interval=detection_interval,  async_detection=async_detection,
+                              backend=inference_backend,  detector_backend=detector_backend,  num_threads=inference_threads,
+                              crop_to_person=crop_to_person)
+    pose_estimator.warm_up()
+    return pose_estimator
+
+
+# Capture in a process of its own that hands frames over through shared memory, so neither the GIL
+# nor a stalled inference step delays capture; it is forked here, before any other thread starts
+use_capture_process = False
+capture_process = VideoProcessReader(VideoUSBReader,  True,  crop_to_person) if use_capture_process else None
+
+# The models load, side by side, and warm up on a background thread while the camera opens;
+# the timeline of it all is printed once the first control packet has been sent
+with concurrent.futures.ThreadPoolExecutor(max_workers=1,  thread_name_prefix='startup') as model_loader:
+    pose_estimator_loaded = model_loader.submit(load_pose_estimator)
+    with startup.span('open camera'):
+        video_reader = capture_process if capture_process is not None else VideoUSBReader(full_resolution=crop_to_person)
+    pose_estimator = pose_estimator_loaded.result()
+recorder = SkeletonRecorder(record_path,  pose_estimator.skeleton_layout) if record_path is not None else None
 num_frames = 0
 sw = Stopwatch()
+# Show the frames with their skeletons on a thread of its own at up to preview_fps; with
+# show_preview = False OpenCV's GUI is never touched, for headless builds
 show_preview = True
 show_annot = False
+preview_fps = 15.0
+preview = PreviewRenderer(max_fps=preview_fps) if show_preview else None
+# Run capture, inference and control on separate threads instead of one serial loop
+use_pipeline = True
+
+
+def apply_budget_settings(settings):
+    if preview is not None:
+        preview.enabled = settings['preview']
+    pose_estimator.detection_scheduler.set_interval(settings['detection_interval'])
+    if frame_skip is not None:
+        frame_skip.set_skip_interval(settings['skip_interval'],  settings['force_skip'])
+
+
+# When frames take longer than latency_budget_ms from capture to control, turn off the preview,
+# run the SSD less often and predict more frames instead of inferring them, one step at a time
+# (see pipeline.latency_budget.default_levels), and step back once there is headroom again
+use_latency_budget = True
+latency_budget_ms = 50.0
+budget_levels = default_levels(detection_interval,  skip_interval if frame_skip is not None else 1,  preview is not None)
+budget = LatencyBudgetController(apply_budget_settings,  budget_ms=latency_budget_ms,  levels=budget_levels) if use_latency_budget else None
+
+
+def capture_stage():
+    global num_frames
+    buffer = video_reader.read_frame_buffer()
+
+    if buffer is None:
+        return None
 
-while True:
-    img = video_reader.read_frame()
     num_frames += 1
-        
-    if img is None:
-        break
-
-    objects,  annot_image = pose_estimator.detect(img,  return_annotated_image=show_preview)
-    roll,  pitch,  game_state,  left_wing_roll_target,  right_wing_roll_target,  body_height = motion.parse_objects(objects)
-    socket_sender.send(int(roll),  int(pitch),  game_state,  int(left_wing_roll_target),  int(right_wing_roll_target),  int(body_height))
-    
-    elapsed_ms = max(1, sw.get())
-    if show_preview:
-        cv2.imshow("Original",  img)
-        if annot_image is not None:
-            size = annot_image.shape
-            height = size[0]
-            width = size[1]
-            if height >0 and width > 0:
-                cv2.imshow("Annotated",  annot_image)
-            
-        cv2.waitKey(1)
+    packet = FramePacket(num_frames,  buffer.array,  buffer.timestamp)
+    packet.buffer = buffer
+    return packet
+
+
+def detect_stage(packet):
+    if scene_change is not None and not scene_change.should_infer(packet.image,  packet.timestamp):
+        # The control stage reuses the skeletons of the last inferred frame
+        packet.static = True
+        return packet
+
+    if frame_skip is not None and not frame_skip.should_infer(player_tracker.speed(),  player_tracker.is_tracking()):
+        # The control stage predicts this frame's skeleton from the filter instead
+        return packet
+
+    # Only queues inference: parsing runs on the OpenPose worker while this stage submits the next frame
+    with profiler.stage('detect',  packet.frame_id):
+        packet.detection = pose_estimator.detect_async(packet.image)
+    return packet
+
+
+def control_stage(packet):
+    if packet.detection is not None:
+        with profiler.stage('detect_wait',  packet.frame_id):
+            objects,  packet.annot_image = packet.detection.result()
+        with profiler.stage('track',  packet.frame_id):
+            players = player_tracker.update(objects,  packet.timestamp)
+    elif packet.static:
+        players = player_tracker.players()
+    else:
+        players = player_tracker.predict(packet.timestamp)
+    # Oldest player first, so the skeleton steering the game is always objects[0]
+    packet.objects = [skeleton for _, skeleton in players]
+    if recorder is not None:
+        recorder.record(packet.timestamp,  packet.objects,  pose_estimator.last_detected_humans)
+    with profiler.stage('gesture',  packet.frame_id):
+        motion.parse_players(players,  packet.timestamp,  player_tracker.player_ids())
+        roll,  pitch,  game_state,  left_wing_roll_target,  right_wing_roll_target,  body_height = motion.primary_control()
+    with profiler.stage('send',  packet.frame_id):
+        socket_sender.send(int(roll),  int(pitch),  game_state,  int(left_wing_roll_target),  int(right_wing_roll_target),  int(body_height),  packet.timestamp)
+    startup.complete('first control packet')
+    packet.control = (roll,  pitch,  game_state,  left_wing_roll_target,  right_wing_roll_target,  body_height)
+    return packet
+
+
+if preview is not None:
+    preview.start()
+
+if use_pipeline:
+    runner = PipelineRunner(queue_size=1,  on_drop=FramePacket.release)
+    runner.add_source('capture',  capture_stage)
+    runner.add_stage('detect',  detect_stage)
+    runner.add_stage('control',  control_stage)
+    runner.start()
+
+    while runner.is_running():
+        packet = runner.get_output(timeout=0.1)
+        if packet is not None:
+            latency_s = time.monotonic() - packet.timestamp
+            profiler.record('end_to_end',  int(latency_s * 1e9),  packet.frame_id)
+            if budget is not None:
+                budget.record(latency_s * 1000.0)
+            if preview is not None:
+                preview.submit(packet.image,  packet.objects)
+            packet.release()
+
+        if runner.print_report_if_due():
+            stats = pose_estimator.detection_scheduler.stats()
+            print(f"[ssd] interval={stats['interval']} ratio={stats['detection_ratio']:.2f} boxes={stats['tracked_boxes']}")
+            if scene_change is not None:
+                stats = scene_change.stats()
+                print(f"[scene] idle={stats['idle']} skipped={stats['skipped']} ratio={stats['skipped_ratio']:.2f} wakeups={stats['wakeups']}")
+            if frame_skip is not None:
+                print(f"[pose] inference ratio={frame_skip.inference_ratio():.2f}")
+            print(f"[players] ids={player_tracker.player_ids()} primary={motion.primary_id}")
+            if preview is not None:
+                stats = preview.stats()
+                print(f"[preview] shown={stats['shown']} rate_limited={stats['rate_limited']}")
+            if budget is not None:
+                stats = budget.metrics()
+                print(f"[budget] level={stats['level']} p90={stats['p90_ms']:.1f}ms/{stats['budget_ms']:.0f}ms over={stats['over_budget']} "
+                      f"degrades={stats['degrades']} recoveries={stats['recoveries']} settings={stats['settings']}")
+            if capture_process is None:
+                stats = video_reader.stats()
+                print(f"[camera] captured={stats['captured']} dropped={stats['dropped']} duplicates={stats['duplicates']} errors={stats['errors']}")
+            else:
+                stats = capture_process.stats()
+                if stats:
+                    print(f"[capture] written={stats['written']} read={stats['read']} overwritten={stats['overwritten']} dropped={stats['dropped']} "
+                          f"interval={stats['interval_ms']:.1f}ms jitter={stats['jitter_ms']:.1f}ms max={stats['max_interval_ms']:.1f}ms")
+            for stats in shared_pool_stats():
+                print(f"[frames {stats['shape']}] allocations={stats['allocations']} in_use={stats['in_use']}")
+            if tracer.is_enabled():
+                tracer.dump_async(trace_path)
+
+        if profiler.print_summary_if_due():
+            profiler.export_csv()
+
+    runner.stop()
+else:
+    while True:
+        packet = capture_stage()
+
+        if packet is None:
+            break
+
+        control_stage(detect_stage(packet))
+
+        if preview is not None:
+            preview.submit(packet.image,  packet.objects)
+        packet.release()
+
+        frame_ns = sw.restart_ns()
+        profiler.record('frame',  frame_ns,  packet.frame_id)
+        if budget is not None:
+            budget.record(frame_ns / 1e6)
+        if profiler.print_summary_if_due():
+            profiler.export_csv()
+
+if preview is not None:
+    preview.stop()
+
+if capture_process is not None:
+    capture_process.close()
+
+if tracer.is_enabled():
+    tracer.dump_async(trace_path).join()
+
+if profiler.enabled:
+    profiler.export_csv()
+
+if recorder is not None:
+    recorder.close()
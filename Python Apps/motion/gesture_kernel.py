@@ -0,0 +1,90 @@
+import math
+
+import numpy as np
+
+
+class GestureKernel(object):
+    """Vectorised version of the MotionController gesture maths.
+
+    Works on keypoint arrays of shape (..., K, 2) with a matching (..., K) validity
+    mask, so one call handles a single skeleton, a stack of skeletons or a whole
+    (T, K, 2) recorded session. evaluate_one() is the same maths on plain floats, for
+    the single skeleton of each frame where numpy's per-call overhead would dominate.
+    utilities.vector.Vector stays the reference both are checked against."""
+
+    _WING_ROLL_OFFSET = 30.0
+    _MIN_WING_ROLL = -15.0
+    _MAX_WING_ROLL = 90.0
+    _MAX_BODY_HEIGHT = 8.0
+
+    def __init__(self, joint_index):
+        # Gesture joints in the order: left elbow, right elbow, left shoulder, right shoulder, nose, neck
+        self._joint_idx = np.array([joint_index[name] for name in
+                                    ('left_elbow', 'right_elbow', 'left_shoulder', 'right_shoulder', 'nose', 'neck')])
+        # Angle vectors: left shoulder to elbow, right shoulder to elbow, right elbow to left elbow
+        self._vec_heads = np.array([0, 1, 0])
+        self._vec_tails = np.array([2, 3, 1])
+        # The angle of v from a horizontal h is atan2(v x h, v . h); with h = (1, 0) for the
+        # left wing and roll and h = (-1, 0) for the right wing this reduces to atan2 of the
+        # components with x flipped for the right wing, so nothing needs normalising
+        self._x_sign = np.array([1.0, -1.0, 1.0])
+        self._angle_offset = np.array([self._WING_ROLL_OFFSET, self._WING_ROLL_OFFSET, 0.0])
+        self._angle_min = np.array([self._MIN_WING_ROLL, self._MIN_WING_ROLL, -np.inf])
+        self._angle_max = np.array([self._MAX_WING_ROLL, self._MAX_WING_ROLL, np.inf])
+
+    def evaluate(self, keypoints, valid):
+        joints = np.asarray(keypoints, dtype=np.float64)[..., self._joint_idx, :]
+        joints_valid = np.asarray(valid, dtype=bool)[..., self._joint_idx]
+
+        vecs = joints[..., self._vec_heads, :] - joints[..., self._vec_tails, :]
+        angles = np.degrees(np.arctan2(-vecs[..., 1], vecs[..., 0] * self._x_sign)) + self._angle_offset
+        angles = np.minimum(self._angle_max, np.maximum(self._angle_min, angles))
+
+        shoulder_dist = np.abs(joints[..., 3, 0] - joints[..., 2, 0])
+        nose_to_neck_vert = np.abs(joints[..., 4, 1] - joints[..., 5, 1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            body_height = np.minimum(self._MAX_BODY_HEIGHT, (nose_to_neck_vert / shoulder_dist - 0.5) * 16.0)
+
+        arms_valid = joints_valid[..., :4].all(axis=-1)
+        head_valid = joints_valid[..., 4:].all(axis=-1)
+        # Body height is NaN wherever it cannot be measured, shoulders on top of each other included
+        body_height_valid = arms_valid & head_valid & (shoulder_dist > 0)
+
+        return {
+            'arms_valid': arms_valid,
+            'head_valid': head_valid,
+            'left_wing_roll_target': angles[..., 0],
+            'right_wing_roll_target': angles[..., 1],
+            'roll': angles[..., 2],
+            'shoulder_dist': shoulder_dist,
+            'nose_to_neck_vert': nose_to_neck_vert,
+            'body_height': np.where(body_height_valid, body_height, np.nan),
+        }
+
+    def evaluate_one(self, keypoints, valid):
+        """evaluate() of one (K, 2) skeleton, returning floats and bools"""
+        (left_elbow, right_elbow, left_shoulder, right_shoulder, nose, neck) = keypoints[self._joint_idx].tolist()
+        joints_valid = valid[self._joint_idx].tolist()
+        arms_valid = all(joints_valid[:4])
+        head_valid = all(joints_valid[4:])
+
+        left_wing = math.degrees(math.atan2(left_shoulder[1] - left_elbow[1], left_elbow[0] - left_shoulder[0])) + self._WING_ROLL_OFFSET
+        right_wing = math.degrees(math.atan2(right_shoulder[1] - right_elbow[1], right_shoulder[0] - right_elbow[0])) + self._WING_ROLL_OFFSET
+        roll = math.degrees(math.atan2(right_elbow[1] - left_elbow[1], left_elbow[0] - right_elbow[0]))
+
+        shoulder_dist = abs(right_shoulder[0] - left_shoulder[0])
+        nose_to_neck_vert = abs(nose[1] - neck[1])
+        body_height = math.nan
+        if arms_valid and head_valid and shoulder_dist > 0:
+            body_height = min(self._MAX_BODY_HEIGHT, (nose_to_neck_vert / shoulder_dist - 0.5) * 16.0)
+
+        return {
+            'arms_valid': arms_valid,
+            'head_valid': head_valid,
+            'left_wing_roll_target': min(self._MAX_WING_ROLL, max(self._MIN_WING_ROLL, left_wing)),
+            'right_wing_roll_target': min(self._MAX_WING_ROLL, max(self._MIN_WING_ROLL, right_wing)),
+            'roll': roll,
+            'shoulder_dist': shoulder_dist,
+            'nose_to_neck_vert': nose_to_neck_vert,
+            'body_height': body_height,
+        }
@@ -0,0 +1,91 @@
+import collections
+
+
+class JumpWindow(object):
+    """Rolling window of vertical shoulder positions for jump detection.
+
+    The window lives in a fixed-capacity ring buffer and is trimmed by sample count
+    and optionally by age. Monotonic deques track the earliest lowest value (the
+    peak of the jump, as y grows downwards) together with the largest value before
+    the peak and the largest value from the peak onwards, so every push and query
+    costs O(1) amortised instead of rescanning the window."""
+
+    def __init__(self, max_samples=10, max_age_s=None):
+        self._capacity = max_samples
+        self._max_age_s = max_age_s
+        self._values = [0.0] * max_samples
+        self._times = [0.0] * max_samples
+        self.clear()
+
+    def clear(self):
+        self._start = 0
+        self._end = 0
+        self._peak = 0
+        self._min = collections.deque()
+        self._before_peak = collections.deque()
+        self._from_peak = collections.deque()
+
+    def __len__(self):
+        return self._end - self._start
+
+    def _value(self, idx):
+        return self._values[idx % self._capacity]
+
+    def push(self, value, timestamp=0.0):
+        if len(self) == self._capacity:
+            self._evict()
+
+        idx = self._end
+        self._values[idx % self._capacity] = value
+        self._times[idx % self._capacity] = timestamp
+        self._end += 1
+
+        # Equal values are kept so the front is always the earliest minimum
+        while self._min and self._value(self._min[-1]) > value:
+            self._min.pop()
+        self._min.append(idx)
+
+        while self._from_peak and self._value(self._from_peak[-1]) <= value:
+            self._from_peak.pop()
+        self._from_peak.append(idx)
+
+        if self._min[0] == idx:
+            self._move_peak(idx)
+
+        if self._max_age_s is not None:
+            while self._times[self._start % self._capacity] < timestamp - self._max_age_s:
+                self._evict()
+
+    def _evict(self):
+        idx = self._start
+        self._start += 1
+
+        if self._min[0] == idx:
+            self._min.popleft()
+        if self._before_peak and self._before_peak[0] == idx:
+            self._before_peak.popleft()
+        if self._from_peak[0] == idx:
+            self._from_peak.popleft()
+
+        if idx == self._peak:
+            self._move_peak(self._min[0] if self._min else self._end)
+
+    def _move_peak(self, new_peak):
+        # Samples between the old and the new peak now sit before the peak
+        for idx in range(max(self._peak, self._start), new_peak):
+            value = self._value(idx)
+            while self._before_peak and self._value(self._before_peak[-1]) <= value:
+                self._before_peak.pop()
+            self._before_peak.append(idx)
+
+        while self._from_peak and self._from_peak[0] < new_peak:
+            self._from_peak.popleft()
+
+        self._peak = new_peak
+
+    def extremes(self):
+        """Returns (peak, start_bottom, end_bottom), or None if no sample precedes the peak"""
+        if not self._before_peak:
+            return None
+
+        return self._value(self._peak), self._value(self._before_peak[0]), self._value(self._from_peak[0])
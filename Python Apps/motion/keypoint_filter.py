@@ -0,0 +1,142 @@
+import math
+
+import numpy as np
+
+from pose_estimation.skeleton import Skeleton
+
+
+class KeypointFilter(object):
+    """One Euro filter over every joint of one player's skeleton.
+
+    Slow movements are smoothed hard to remove keypoint jitter, fast ones are let
+    through with little lag. The filtered velocity of each joint is kept, so the
+    skeleton can be extrapolated to frames where inference was skipped. Joints
+    missing from a measurement keep their state but are reported invalid, as
+    before filtering."""
+
+    def __init__(self,  min_cutoff=1.0,  beta=40.0,  d_cutoff=3.0,  max_prediction_s=0.2):
+        self._min_cutoff = min_cutoff
+        self._beta = beta
+        self._d_cutoff = d_cutoff
+        self._max_prediction_s = max_prediction_s
+        self.reset()
+
+    def reset(self):
+        self._layout = None
+        self._joints = None
+        self._velocity = None
+        self._seen = None
+        self._valid = None
+        self._timestamp = None
+
+    def _alpha(self,  cutoff,  dt):
+        tau = 1.0 / (2.0 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def update(self,  skeleton,  timestamp):
+        """Folds a measured skeleton into the filter and returns the filtered copy"""
+        if self._layout is not skeleton.layout:
+            self.reset()
+            num_joints = skeleton.layout.num_joints()
+            self._layout = skeleton.layout
+            self._joints = np.zeros((num_joints, 2),  dtype=np.float32)
+            self._velocity = np.zeros((num_joints, 2),  dtype=np.float32)
+            self._seen = np.zeros(num_joints,  dtype=bool)
+
+        measured = skeleton.valid
+        # Joints seen for the first time start where they were measured, at rest
+        fresh = measured & ~self._seen
+        self._joints[fresh] = skeleton.joints[fresh]
+        self._velocity[fresh] = 0.0
+
+        tracked = measured & self._seen
+        if self._timestamp is not None and timestamp > self._timestamp and tracked.any():
+            dt = timestamp - self._timestamp
+            previous = self._joints[tracked]
+            velocity = (skeleton.joints[tracked] - previous) / dt
+            velocity = self._velocity[tracked] + self._alpha(self._d_cutoff,  dt) * (velocity - self._velocity[tracked])
+
+            # The cutoff rises with each joint's speed, so fast motion is smoothed less
+            speed = np.linalg.norm(velocity,  axis=-1,  keepdims=True)
+            cutoff = self._min_cutoff + self._beta * speed
+            alpha = self._alpha(cutoff,  dt)
+            self._joints[tracked] = previous + alpha * (skeleton.joints[tracked] - previous)
+            self._velocity[tracked] = velocity
+
+        self._seen |= measured
+        self._valid = measured.copy()
+        self._timestamp = timestamp
+
+        return Skeleton(self._layout,  self._joints.copy(),  self._valid.copy())
+
+    def predict(self,  timestamp):
+        """Extrapolates the last filtered skeleton to timestamp at constant velocity,
+        or returns None when there is nothing recent enough to extrapolate from"""
+        if self._timestamp is None:
+            return None
+
+        dt = timestamp - self._timestamp
+        if dt > self._max_prediction_s:
+            return None
+
+        joints = self._joints + self._velocity * max(0.0,  dt)
+        return Skeleton(self._layout,  joints.astype(np.float32),  self._valid.copy())
+
+    def is_tracking(self):
+        return self._valid is not None and bool(self._valid.any())
+
+    def speed(self):
+        """Fastest filtered joint speed in normalised image units per second"""
+        # Read once, the pipeline asks from the detect thread while the control thread updates
+        velocity,  valid = self._velocity,  self._valid
+        if velocity is None or valid is None or not valid.any():
+            return 0.0
+
+        return float(np.linalg.norm(velocity[valid],  axis=-1).max())
+
+
+class FrameSkipPolicy(object):
+    """Decides per frame whether to run pose inference or predict the skeleton.
+
+    While the filtered keypoints move slower than motion_threshold, in normalised
+    image units per second, the model runs on every skip_interval-th frame only.
+    Keypoint jitter on a player standing still stays below 0.3 and steady flapping
+    peaks around 0.8, which constant-velocity prediction follows well enough, while
+    a jump moves the whole body at 1.5 and up. So only faster motion switches back
+    to every frame, and stays there for hold_frames after it calms down. With
+    force_skip the model runs on every skip_interval-th frame whatever the players
+    do, for when frames run late."""
+
+    def __init__(self,  skip_interval=2,  motion_threshold=1.0,  hold_frames=15,  force_skip=False):
+        self._skip_interval = max(1,  skip_interval)
+        self._force_skip = force_skip
+        self._motion_threshold = motion_threshold
+        self._hold_frames = hold_frames
+        self._frames_since_inference = 0
+        self._frames_since_motion = hold_frames
+        self.num_frames = 0
+        self.num_inferences = 0
+
+    def set_skip_interval(self,  skip_interval,  force_skip=False):
+        self._skip_interval = max(1,  skip_interval)
+        self._force_skip = force_skip
+
+    def should_infer(self,  speed,  tracking=True):
+        self.num_frames += 1
+        self._frames_since_inference += 1
+
+        if speed >= self._motion_threshold:
+            self._frames_since_motion = 0
+        else:
+            self._frames_since_motion += 1
+
+        moving = self._frames_since_motion < self._hold_frames and not self._force_skip
+        infer = not tracking or moving or self._frames_since_inference >= self._skip_interval
+        if infer:
+            self._frames_since_inference = 0
+            self.num_inferences += 1
+
+        return infer
+
+    def inference_ratio(self):
+        return self.num_inferences / self.num_frames if self.num_frames > 0 else 1.0
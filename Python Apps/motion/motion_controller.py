@@ -1,25 +1,44 @@
 import math
+import time
 
-from utilities.vector import Vector
+from .gesture_kernel import GestureKernel
+from .jump_window import JumpWindow
+from utilities.trace import tracer, TRACE_DEBUG
+
+
+tracer.register('gesture',  ('game_state',  'roll',  'left_wing_roll_target',  'right_wing_roll_target',  'body_height'))
+tracer.register('body_height',  ('nose_to_neck',  'shoulder_dist'))
 
 
 class MotionController(object):
+
+    _JUMP_WINDOW_SAMPLES = 10
+    _MAX_JUMP_WINDOW_SAMPLES = 256
     
-    def __init__(self):
+    def __init__(self,  jump_window_s=None):
         self._roll = 0
         self._pitch = 0
         self._game_state = 0
         self._left_wing_roll_target = 0
         self._right_wing_roll_target = 0
         self._body_height = 0
-        self._shoulder_vert_pos_history = []
+        # Without jump_window_s the jump window holds the last 10 samples regardless of frame rate
+        if jump_window_s is None:
+            self._shoulder_vert_pos_history = JumpWindow(self._JUMP_WINDOW_SAMPLES)
+        else:
+            self._shoulder_vert_pos_history = JumpWindow(self._MAX_JUMP_WINDOW_SAMPLES,  jump_window_s)
         self._backface_ctr = 0
+        self._gesture_kernel = None
+        self._gesture_layout = None
         
-    def parse_objects(self,  objects):
+    def parse_objects(self,  objects,  timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+
         if len(objects) > 0:
             skeleton = objects[0]
-            left_elbow = skeleton.get_joint('left_elbow')
-            right_elbow = skeleton.get_joint('right_elbow')
+            # Wing roll targets from the delta between elbow and shoulder, roll from the delta between left and right elbow
+            gesture = self._get_gesture_kernel(skeleton).evaluate_one(skeleton.joints,  skeleton.valid)
             left_shoulder = skeleton.get_joint('left_shoulder')
             right_shoulder = skeleton.get_joint('right_shoulder')
             
@@ -30,7 +49,7 @@ class MotionController(object):
             if self._is_reset_detected(left_shoulder,  right_shoulder):
                 self._game_state = 0
 
-            if left_elbow is not None and right_elbow is not None and left_shoulder is not None and right_shoulder is not None:
+            if gesture['arms_valid']:
 #                left_elbow.x = 10.0
 #                left_elbow.y = 0.0
 #                left_shoulder.x = 20.0
@@ -42,46 +61,37 @@ class MotionController(object):
 #                right_shoulder.y = 30.0
 #                self._game_state = 0
 
-                # Calculate wing roll target from the delta between elbow and shoulder
-                left_shoulder_to_elbow_vec = Vector(left_elbow.x - left_shoulder.x,  left_elbow.y - left_shoulder.y).normalise()            
-                horizVec = Vector(1.0,  0.0)
-                self._left_wing_roll_target = min(90,  max(-15,  left_shoulder_to_elbow_vec.angle_from_vector(horizVec) * 180.0 / math.pi + 30))
-
-                right_shoulder_to_elbow_vec = Vector(right_elbow.x - right_shoulder.x,  right_elbow.y - right_shoulder.y).normalise()            
-                horizVec = Vector(-1.0,  0.0)
-                self._right_wing_roll_target = min(90,  max(-15,  horizVec.angle_from_vector(right_shoulder_to_elbow_vec) * 180.0 / math.pi + 30))
-                
-                # Calculate roll from the delta between left and right elbow
-                left_elbow_to_right_elbow_vec = Vector(left_elbow.x - right_elbow.x,  left_elbow.y - right_elbow.y).normalise()
-                horizVec = Vector(1.0,  0.0)
-                self._roll = left_elbow_to_right_elbow_vec.angle_from_vector(horizVec) * 180.0 / math.pi
+                self._left_wing_roll_target = gesture['left_wing_roll_target']
+                self._right_wing_roll_target = gesture['right_wing_roll_target']
+                self._roll = gesture['roll']
 
                 # Use the distance between left and right shoulder as a measurement threshold
-                shoulder_dist = abs(right_shoulder.x - left_shoulder.x)
+                shoulder_dist = gesture['shoulder_dist']
 
-                self._body_height = self._calc_body_height(nose,  neck,  shoulder_dist)
+                # map 2x nose to neck dist to body_height of 0-5, held while the head is not visible
+                if gesture['head_valid']:
+                    if tracer.is_enabled(TRACE_DEBUG):
+                        tracer.record('body_height',  (gesture['nose_to_neck_vert'],  shoulder_dist))
+                    if not math.isnan(gesture['body_height']):
+                        self._body_height = gesture['body_height']
                 
                 # Detect jump by measuring the vertical movement of both shoulder
                 # If detected, set game state to flying
-                if self._is_jump_detected(left_shoulder, right_shoulder,  neck,  nose,  shoulder_dist):
+                if self._is_jump_detected(left_shoulder, right_shoulder,  neck,  nose,  shoulder_dist,  timestamp):
                     self._game_state = 1
                                     
-                print(f"Jump {self._game_state} Roll {self._right_wing_roll_target} Left {self._left_wing_roll_target} Right {self._right_wing_roll_target}")
+                if tracer.is_enabled():
+                    tracer.record('gesture',  (self._game_state,  self._roll,  self._left_wing_roll_target,  self._right_wing_roll_target,  self._body_height))
             
         return self._roll,  self._pitch,  self._game_state,  self._left_wing_roll_target,  self._right_wing_roll_target,  self._body_height
 
-    def _calc_body_height(self,  nose,  neck,  shoulder_dist):
-        if nose is None or neck is None:
-            return self._body_height
-            
-        nose_to_neck_vert = abs(nose.y - neck.y)
-        # map 2x nose to neck dist to body_height of 0-5
-        max_nose_to_neck_dist = shoulder_dist
-        print(f"Nose To Neck: {nose_to_neck_vert} shoulder {max_nose_to_neck_dist}")
-        body_height = min(8, ((nose_to_neck_vert / max_nose_to_neck_dist) - 0.5) * 16.0)
-        
-        return body_height
-        
+    def _get_gesture_kernel(self,  skeleton):
+        if self._gesture_kernel is None or self._gesture_layout is not skeleton.layout:
+            self._gesture_kernel = GestureKernel(skeleton.layout.joint_index)
+            self._gesture_layout = skeleton.layout
+
+        return self._gesture_kernel
+
     def _is_reset_detected(self,  left_shoulder,  right_shoulder):
         if left_shoulder is None or right_shoulder is None:
             return False
@@ -101,7 +111,7 @@ class MotionController(object):
             
         return False
         
-    def _is_jump_detected(self,  left_shoulder,  right_shoulder,  neck,  nose,  shoulder_dist):
+    def _is_jump_detected(self,  left_shoulder,  right_shoulder,  neck,  nose,  shoulder_dist,  timestamp):
         if nose is None or neck is None:
             return False
             
@@ -112,32 +122,25 @@ class MotionController(object):
             return False
             
         cur_shoulder_y = (left_shoulder.y + right_shoulder.y) * 2
-        self._shoulder_vert_pos_history.append(cur_shoulder_y)
+        # Only keep the last 1 sec of history
+        self._shoulder_vert_pos_history.push(cur_shoulder_y,  timestamp)
         
         # Use the distance between left and right shoulder as a threshold to detect a jump
         jump_threshold = shoulder_dist * 2.0
-        
-        if len(self._shoulder_vert_pos_history) > 10:
-            # Only keep the last 1 sec of history
-            self._shoulder_vert_pos_history.pop(0)
     
-        # Find the lowest point (peak of the jump)
-        peak = min(self._shoulder_vert_pos_history)
-        peak_idx = self._shoulder_vert_pos_history.index(peak)
-        
-        # Now find the largest point at both end of the jump
-        try:
-            start_bottom = max(self._shoulder_vert_pos_history[: peak_idx])
-            end_bottom = max(self._shoulder_vert_pos_history[peak_idx:])
-        except Exception as _:
+        # Find the lowest point (peak of the jump) and the largest point at both end of the jump
+        extremes = self._shoulder_vert_pos_history.extremes()
+        if extremes is None:
             return False
+
+        peak,  start_bottom,  end_bottom = extremes
         
         # It is a jump if the delta between start_bottom and end_bottom to peak is > threshold
         start_delta = abs(peak - start_bottom)
         end_delta = abs(peak - end_bottom)
         
         if start_delta >= jump_threshold and end_delta >= jump_threshold:
-            self._shoulder_vert_pos_history = []
+            self._shoulder_vert_pos_history.clear()
             return True
                     
         return False
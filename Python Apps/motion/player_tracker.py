@@ -0,0 +1,229 @@
+import numpy as np
+
+from .keypoint_filter import KeypointFilter
+from .motion_controller import MotionController
+
+
+def linear_assignment(cost):
+    """Minimum cost assignment of the rows of cost to its columns (Hungarian method
+    with potentials, O(n^2 m) with the inner loops over columns vectorised).
+    Returns (row_indices, column_indices) sorted by row, like scipy's
+    linear_sum_assignment, pairing min(n, m) rows and columns."""
+    cost = np.asarray(cost,  dtype=np.float64)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    num_rows, num_cols = cost.shape
+    if num_rows == 0:
+        return np.zeros(0,  dtype=np.int64),  np.zeros(0,  dtype=np.int64)
+
+    # 1-based with column 0 as the virtual start column; row_of[j] is the row assigned to column j
+    u = np.zeros(num_rows + 1)
+    v = np.zeros(num_cols + 1)
+    row_of = np.zeros(num_cols + 1,  dtype=np.int64)
+    way = np.zeros(num_cols + 1,  dtype=np.int64)
+    for row in range(1,  num_rows + 1):
+        row_of[0] = row
+        col = 0
+        min_reduced = np.full(num_cols + 1,  np.inf)
+        used = np.zeros(num_cols + 1,  dtype=bool)
+        while True:
+            used[col] = True
+            current_row = row_of[col]
+            free = ~used[1:]
+            reduced = cost[current_row - 1] - u[current_row] - v[1:]
+            improved = free & (reduced < min_reduced[1:])
+            min_reduced[1:][improved] = reduced[improved]
+            way[1:][improved] = col
+
+            candidates = np.where(free,  min_reduced[1:],  np.inf)
+            next_col = int(np.argmin(candidates)) + 1
+            delta = candidates[next_col - 1]
+
+            used_cols = np.flatnonzero(used)
+            u[row_of[used_cols]] += delta
+            v[used_cols] -= delta
+            min_reduced[1:][free] -= delta
+
+            col = next_col
+            if row_of[col] == 0:
+                break
+
+        # Flip the augmenting path
+        while col != 0:
+            previous = way[col]
+            row_of[col] = row_of[previous]
+            col = previous
+
+    cols = np.flatnonzero(row_of[1:])
+    rows = row_of[1:][cols] - 1
+    if transposed:
+        rows, cols = cols, rows
+    order = np.argsort(rows)
+    return rows[order],  cols[order]
+
+
+class PlayerTrack(object):
+
+    def __init__(self,  player_id,  skeleton,  timestamp,  filter_keypoints):
+        self.player_id = player_id
+        # Index of the skeleton this track matched in the latest update
+        self.detection_index = None
+        self.missed_frames = 0
+        self.keypoint_filter = KeypointFilter() if filter_keypoints else None
+        self.skeleton = None
+        self.update(skeleton,  timestamp)
+
+    def update(self,  skeleton,  timestamp):
+        if self.keypoint_filter is not None:
+            skeleton = self.keypoint_filter.update(skeleton,  timestamp)
+        self.skeleton = skeleton
+        self.missed_frames = 0
+
+    def expected(self,  timestamp):
+        """Where the player should be at timestamp, for matching"""
+        if self.keypoint_filter is not None:
+            predicted = self.keypoint_filter.predict(timestamp)
+            if predicted is not None:
+                return predicted
+
+        return self.skeleton
+
+    def speed(self):
+        return self.keypoint_filter.speed() if self.keypoint_filter is not None else 0.0
+
+
+class PlayerTracker(object):
+    """Keeps a stable id for every player across frames, whatever order ParseObjects
+    returns the skeletons in.
+
+    Each frame the mean distance between the joints of every track and every
+    detected skeleton, as a fraction of the track's height, is computed in one
+    array operation and the pairs are matched by optimal assignment. Pairs further
+    apart than max_distance start a new track instead. Skeletons without a single
+    valid joint are ignored. A track survives max_missed_frames without a match.
+    Ids only grow, so the player who has been in view longest has the lowest id and
+    is listed first."""
+
+    _MIN_HEIGHT = 0.05
+
+    def __init__(self,  max_distance=0.5,  max_missed_frames=10,  filter_keypoints=True):
+        self._max_distance = max_distance
+        self._max_missed_frames = max_missed_frames
+        self._filter_keypoints = filter_keypoints
+        self._tracks = []
+        self._next_id = 0
+
+    def _cost(self,  skeletons,  timestamp):
+        expected = [track.expected(timestamp) for track in self._tracks]
+        track_joints = np.stack([skeleton.joints for skeleton in expected])[:, None]
+        track_valid = np.stack([skeleton.valid for skeleton in expected])[:, None]
+        joints = np.stack([skeleton.joints for skeleton in skeletons])[None]
+        valid = np.stack([skeleton.valid for skeleton in skeletons])[None]
+
+        # (tracks, skeletons, joints): distance over the joints both have, relative to
+        # each track's height so a fast jump still matches while neighbours do not
+        both = track_valid & valid
+        dist = np.linalg.norm(track_joints - joints,  axis=-1)
+        num_common = both.sum(axis=-1)
+        track_y = np.where(track_valid[:, 0],  track_joints[:, 0, :, 1],  np.nan)
+        with np.errstate(invalid='ignore'):
+            height = np.maximum(self._MIN_HEIGHT,  np.nan_to_num(np.nanmax(track_y,  axis=-1) - np.nanmin(track_y,  axis=-1)))
+            cost = np.where(both,  dist,  0.0).sum(axis=-1) / num_common / height[:, None]
+        return np.where(num_common > 0,  cost,  np.inf)
+
+    def update(self,  skeletons,  timestamp):
+        """Matches this frame's skeletons to the tracks and returns [(player_id, skeleton)]
+        for every player seen this frame, oldest player first"""
+        matched_tracks = set()
+        # Indices into skeletons, so detection_index still points at the caller's list
+        unmatched = [idx for idx, skeleton in enumerate(skeletons) if skeleton.valid.any()]
+        if len(self._tracks) > 0 and len(unmatched) > 0:
+            candidates = list(unmatched)
+            cost = self._cost([skeletons[idx] for idx in candidates],  timestamp)
+            rows, cols = linear_assignment(np.where(np.isfinite(cost),  cost,  1e6))
+            for row, col in zip(rows, cols):
+                if cost[row, col] <= self._max_distance:
+                    idx = candidates[col]
+                    self._tracks[row].update(skeletons[idx],  timestamp)
+                    self._tracks[row].detection_index = idx
+                    matched_tracks.add(row)
+                    unmatched.remove(idx)
+
+        for idx, track in enumerate(self._tracks):
+            if idx not in matched_tracks:
+                track.missed_frames += 1
+                track.detection_index = None
+        self._tracks = [track for track in self._tracks if track.missed_frames <= self._max_missed_frames]
+
+        for col in unmatched:
+            track = PlayerTrack(self._next_id,  skeletons[col],  timestamp,  self._filter_keypoints)
+            track.detection_index = col
+            self._tracks.append(track)
+            self._next_id += 1
+
+        return self.players()
+
+    def players(self):
+        """[(player_id, skeleton)] of the players seen in the latest update, as update returned them"""
+        return [(track.player_id,  track.skeleton) for track in self._tracks if track.missed_frames == 0]
+
+    def predict(self,  timestamp):
+        """[(player_id, skeleton)] extrapolated to timestamp, for frames without inference"""
+        players = []
+        for track in self._tracks:
+            if track.missed_frames == 0 and track.keypoint_filter is not None:
+                predicted = track.keypoint_filter.predict(timestamp)
+                if predicted is not None:
+                    players.append((track.player_id,  predicted))
+
+        return players
+
+    def is_tracking(self):
+        return any(track.missed_frames == 0 for track in self._tracks)
+
+    def speed(self):
+        return max([track.speed() for track in self._tracks if track.missed_frames == 0],  default=0.0)
+
+    def player_ids(self):
+        return [track.player_id for track in self._tracks]
+
+    def matches(self):
+        """[(player_id, index into the latest update's skeletons)] for the players seen in it"""
+        return [(track.player_id,  track.detection_index) for track in self._tracks if track.detection_index is not None]
+
+
+class PlayerControllers(object):
+    """One MotionController per tracked player. The game is steered by the primary
+    player, the one in view the longest, so someone walking into the frame never
+    takes over control."""
+
+    def __init__(self,  jump_window_s=None):
+        self._jump_window_s = jump_window_s
+        self._controllers = {}
+        self.primary_id = None
+        self._primary_control = (0,  0,  0,  0,  0,  0)
+
+    def parse_players(self,  players,  timestamp=None,  active_ids=None):
+        """Runs every player's MotionController and returns {player_id: control}.
+        Controllers of players the tracker has dropped, i.e. not in active_ids, are discarded."""
+        controls = {}
+        for player_id, skeleton in players:
+            if player_id not in self._controllers:
+                self._controllers[player_id] = MotionController(self._jump_window_s)
+            controls[player_id] = self._controllers[player_id].parse_objects([skeleton],  timestamp)
+
+        if active_ids is not None:
+            for player_id in set(self._controllers) - set(active_ids):
+                del self._controllers[player_id]
+
+        if self.primary_id not in self._controllers and len(self._controllers) > 0:
+            self.primary_id = min(self._controllers)
+        if self.primary_id in controls:
+            self._primary_control = controls[self.primary_id]
+
+        return controls
+
+    def primary_control(self):
+        """Control tuple of the primary player, held while nobody is in view"""
+        return self._primary_control
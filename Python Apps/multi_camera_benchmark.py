@@ -0,0 +1,128 @@
+from motion.player_tracker import PlayerTracker, PlayerControllers
+from pipeline.multi_source_runner import MultiSourceRunner, CameraSource, release_batch
+from socket_sender.socket_receiver import SocketReceiver
+from socket_sender.socket_sender import SocketSender
+from video_feed.video_offline_reader import VideoOfflineReader
+
+import argparse
+import multiprocessing
+import resource
+import time
+
+
+def create_pose_estimator(args):
+    # Model stacks are imported on demand so the stub mode runs without CUDA, TensorRT or TensorFlow
+    if args.pose == 'stub':
+        from pose_estimation.stubs import StubPoseEstimator
+        return StubPoseEstimator(args.models)
+
+    from pose_estimation.openpose import OpenPose
+    return OpenPose(args.models,  detection_interval=args.detection_interval,  backend=args.backend,
+                    detector_backend=args.detector_backend,  num_threads=args.threads,  max_batch_size=args.max_sources)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_batched(args,  num_sources,  results):
+    """Every camera in this process, batched through one set of models"""
+    pose_estimator = create_pose_estimator(args)
+    receiver = SocketReceiver(port=0,  transport='udp')
+    receiver.start()
+    sources = [CameraSource(f"camera{i}",  VideoOfflineReader(args.video),  PlayerControllers(jump_window_s=1.0),
+                            SocketSender(port=receiver.port,  transport='udp',  protocol_version=2,  send_on_change=False))
+               for i in range(num_sources)]
+    runner = MultiSourceRunner(pose_estimator,  sources)
+
+    num_frames = 0
+    start = time.perf_counter()
+    runner.start()
+    while runner.is_running():
+        batch = runner.get_output(timeout=0.1)
+        if batch is not None:
+            num_frames += len(batch)
+            release_batch(batch)
+    elapsed_s = time.perf_counter() - start
+    runner.stop()
+
+    for source in sources:
+        source.socket_sender.close()
+    receiver.stop()
+    results.put((num_frames,  elapsed_s,  peak_rss_mb()))
+
+
+def run_single(args,  results):
+    """One camera per process, as main.py runs"""
+    pose_estimator = create_pose_estimator(args)
+    receiver = SocketReceiver(port=0,  transport='udp')
+    receiver.start()
+    video_reader = VideoOfflineReader(args.video)
+    player_tracker = PlayerTracker()
+    motion = PlayerControllers(jump_window_s=1.0)
+    socket_sender = SocketSender(port=receiver.port,  transport='udp',  protocol_version=2,  send_on_change=False)
+
+    num_frames = 0
+    start = time.perf_counter()
+    while True:
+        buffer = video_reader.read_frame_buffer()
+        if buffer is None:
+            break
+
+        num_frames += 1
+        timestamp = time.monotonic()
+        objects,  _ = pose_estimator.detect(buffer.array)
+        players = player_tracker.update(objects,  timestamp)
+        motion.parse_players(players,  timestamp,  player_tracker.player_ids())
+        roll,  pitch,  game_state,  left_wing_roll_target,  right_wing_roll_target,  body_height = motion.primary_control()
+        socket_sender.send(int(roll),  int(pitch),  game_state,  int(left_wing_roll_target),  int(right_wing_roll_target),  int(body_height),  timestamp)
+        buffer.release()
+    elapsed_s = time.perf_counter() - start
+
+    socket_sender.close()
+    receiver.stop()
+    results.put((num_frames,  elapsed_s,  peak_rss_mb()))
+
+
+def measure(context,  target,  args_list):
+    """Runs target once per entry of args_list, all at the same time in fresh processes,
+    and returns the frames processed per second by all of them and their summed peak RSS"""
+    results = context.Queue()
+    processes = [context.Process(target=target,  args=args + (results,)) for args in args_list]
+    for process in processes:
+        process.start()
+    runs = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    num_frames = sum(run[0] for run in runs)
+    elapsed_s = max(run[1] for run in runs)
+    return num_frames / elapsed_s,  sum(run[2] for run in runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput and memory of N cameras batched in one process against N separate processes')
+    parser.add_argument('video',  help='video file every camera replays')
+    parser.add_argument('--models',  default='models')
+    parser.add_argument('--pose',  choices=('openpose',  'stub'),  default='openpose')
+    parser.add_argument('--backend',  choices=('tensorrt',  'onnxruntime',  'opencv'),  default='tensorrt')
+    parser.add_argument('--detector-backend',  choices=('tensorflow',  'opencv'),  default='tensorflow')
+    parser.add_argument('--threads',  type=int,  help='intra-op threads for the CPU runtimes')
+    parser.add_argument('--detection-interval',  type=int,  default=5)
+    parser.add_argument('--max-sources',  type=int,  default=4)
+    args = parser.parse_args()
+
+    # Fresh interpreters so every run pays its own model loads and peak RSS is per run
+    context = multiprocessing.get_context('spawn')
+    num_sources = 1
+    while num_sources <= args.max_sources:
+        batched_fps,  batched_rss = measure(context,  run_batched,  [(args,  num_sources)])
+        separate_fps,  separate_rss = measure(context,  run_single,  [(args,)] * num_sources)
+        print(f"{num_sources} cameras: batched {batched_fps:7.1f} fps {batched_rss:6.0f} MB, "
+              f"separate processes {separate_fps:7.1f} fps {separate_rss:6.0f} MB")
+        num_sources *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+from pose_estimation.person_crop import person_region
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+
+POSE_SIZE = (224,  224)
+# The frames the readers deliver: squashed to the model input, and at the USB and CSI cameras'
+# capture resolutions with full_resolution=True, as main.py asks for with crop_to_person
+FRAME_SIZES = [('squashed',  POSE_SIZE),  ('usb',  (640,  480)),  ('csi',  (400,  300))]
+
+
+def measure(fn,  num_frames):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(num_frames):
+        fn()
+    return (time.perf_counter() - t0) * 1e6 / num_frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detail of the player in the pose model input and preprocessing cost, squashing the whole frame against cropping to the person box')
+    parser.add_argument('--frames',  type=int,  default=1000)
+    args = parser.parse_args()
+
+    for name, (width, height) in FRAME_SIZES:
+        image = np.random.default_rng(0).integers(0,  256,  (height,  width,  3),  dtype=np.uint8)
+        squash_us = measure(lambda: cv2.resize(image,  POSE_SIZE),  args.frames)
+        print(f"{name} frame {width}x{height} -> {POSE_SIZE[0]}x{POSE_SIZE[1]}: {squash_us:.1f}us per frame")
+
+        # A player standing further and further back, feet at 90% of the frame height
+        for person_height in (0.8,  0.5,  0.3,  0.15):
+            box = [0.5 - person_height * 0.2,  0.9 - person_height,  0.5 + person_height * 0.2,  0.9]
+            region = person_region([box],  width,  height)
+            crop_us = measure(lambda: region.crop(image,  *POSE_SIZE),  args.frames)
+
+            squashed_px = person_height * POSE_SIZE[1]
+            cropped_px = person_height * height / region.size * POSE_SIZE[1]
+            # Upsampling a crop adds no detail, the model sees at most the captured pixels
+            detail_px = min(cropped_px,  person_height * height)
+            print(f"  person {person_height:.2f} of the frame: {squashed_px:5.1f}px of detail squashed, {detail_px:5.1f}px cropped "
+                  f"({detail_px / squashed_px:.1f}x) shown {cropped_px:5.1f}px tall, crop {crop_us:.1f}us per frame")
+
+    print(f"nobody in view: no crop and no pose inference")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import collections
+import threading
+
+
+class DropOldestQueue(object):
+    """Bounded queue that discards the oldest item instead of blocking the producer,
+    so a consumer always picks up the freshest data available."""
+
+    def __init__(self, maxsize=1, on_drop=None):
+        self._maxsize = max(1, maxsize)
+        self._on_drop = on_drop
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.num_put = 0
+        self.num_dropped = 0
+
+    def put(self, item):
+        dropped = None
+        with self._cond:
+            if len(self._items) >= self._maxsize:
+                dropped = self._items.popleft()
+                self.num_dropped += 1
+
+            self._items.append(item)
+            self.num_put += 1
+            self._cond.notify()
+
+        if dropped is not None and self._on_drop is not None:
+            self._on_drop(dropped)
+
+    def get(self, timeout=None):
+        # Returns None on timeout or once the queue is closed and drained
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._closed, timeout)
+            if not self._items:
+                return None
+
+            return self._items.popleft()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def is_closed(self):
+        return self._closed
+
+    def depth(self):
+        return len(self._items)
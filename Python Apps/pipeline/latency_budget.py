@@ -0,0 +1,108 @@
+import collections
+import time
+
+import numpy as np
+
+
+def default_levels(detection_interval=5, skip_interval=2, preview=True):
+    """From the configured settings to the cheapest that still send a control packet every
+    frame. Without a preview there is no step turning it off. FrameSkipPolicy only skips
+    while the players move slowly, so the steps that skip more frames also set force_skip,
+    which skips while they flap and jump too, when it is needed most."""
+    levels = [{'preview': preview, 'detection_interval': detection_interval, 'skip_interval': skip_interval,
+               'force_skip': False}]
+    if preview:
+        levels.append(dict(levels[-1], preview=False))
+    levels.append(dict(levels[-1], detection_interval=detection_interval * 2))
+    levels.append(dict(levels[-1], skip_interval=max(2, skip_interval), force_skip=True))
+    levels.append(dict(levels[-1], detection_interval=detection_interval * 3, skip_interval=max(2, skip_interval) + 1))
+    return levels
+
+
+class LatencyBudgetController(object):
+    """Keeps end-to-end frame latency within budget_ms by stepping through levels of
+    knob settings, from full quality to the cheapest.
+
+    The 90th percentile latency over the last window frames is compared with the
+    budget. Above it the controller steps one level down. Below recover_ratio of
+    the budget it steps one level back up. A level is held for at least
+    min_dwell_s and the window starts over after every change, so the latency
+    measured belongs to the new settings and the levels do not oscillate.
+    apply(settings) is called with the level's settings on every change; levels[0]
+    are the settings in effect to begin with, so nothing is applied before that."""
+
+    def __init__(self, apply, budget_ms=50.0, levels=None, window=30, recover_ratio=0.7, min_dwell_s=2.0):
+        self._apply = apply
+        self._budget_ms = budget_ms
+        self._levels = levels if levels is not None else default_levels()
+        self._window = window
+        self._recover_ratio = recover_ratio
+        self._min_dwell_s = min_dwell_s
+        self._latencies = collections.deque(maxlen=window)
+        self._changed_at = None
+        self._time_at_level = [0.0] * len(self._levels)
+        self._level_since = None
+        self.level = 0
+        self.num_frames = 0
+        self.num_over_budget = 0
+        self.num_degrades = 0
+        self.num_recoveries = 0
+        self.p90_ms = 0.0
+
+    def settings(self):
+        return self._levels[self.level]
+
+    def record(self, latency_ms, now=None):
+        """Adds a frame's latency; returns the new settings when the level changed, else None"""
+        now = time.monotonic() if now is None else now
+        if self._changed_at is None:
+            self._changed_at = now
+            self._level_since = now
+
+        self.num_frames += 1
+        if latency_ms > self._budget_ms:
+            self.num_over_budget += 1
+        self._latencies.append(latency_ms)
+        if len(self._latencies) < self._window:
+            return None
+
+        self.p90_ms = float(np.percentile(self._latencies, 90))
+        if now - self._changed_at < self._min_dwell_s:
+            return None
+
+        if self.p90_ms > self._budget_ms and self.level < len(self._levels) - 1:
+            self.num_degrades += 1
+            return self._change(self.level + 1, now)
+        if self.p90_ms < self._budget_ms * self._recover_ratio and self.level > 0:
+            self.num_recoveries += 1
+            return self._change(self.level - 1, now)
+
+        return None
+
+    def _change(self, level, now):
+        self._time_at_level[self.level] += now - self._level_since
+        self._level_since = now
+        self._changed_at = now
+        self._latencies.clear()
+        self.level = level
+        settings = self._levels[level]
+        self._apply(settings)
+        return settings
+
+    def metrics(self, now=None):
+        now = time.monotonic() if now is None else now
+        time_at_level = list(self._time_at_level)
+        if self._level_since is not None:
+            time_at_level[self.level] += now - self._level_since
+
+        return {
+            'budget_ms': self._budget_ms,
+            'level': self.level,
+            'settings': self.settings(),
+            'p90_ms': self.p90_ms,
+            'frames': self.num_frames,
+            'over_budget': self.num_over_budget,
+            'degrades': self.num_degrades,
+            'recoveries': self.num_recoveries,
+            'time_at_level_s': time_at_level,
+        }
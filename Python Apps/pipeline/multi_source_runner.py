@@ -0,0 +1,173 @@
+import threading
+import time
+
+from .drop_oldest_queue import DropOldestQueue
+from .pipeline_runner import PipelineRunner, FramePacket
+from motion.player_tracker import PlayerTracker
+
+
+def release_batch(batch):
+    for _, packet in batch:
+        packet.release()
+
+
+class CameraSource(object):
+    """One camera served by a MultiSourceRunner, with the PlayerTracker, PlayerControllers
+    and SocketSender its results are routed to, as main.py routes its single camera's"""
+
+    def __init__(self,  name,  video_reader,  motion,  socket_sender,  player_tracker=None):
+        self.name = name
+        self.video_reader = video_reader
+        self.motion = motion
+        self.socket_sender = socket_sender
+        self.player_tracker = player_tracker if player_tracker is not None else PlayerTracker()
+        self.num_frames = 0
+        # Latest captured frame not yet picked up for a batch
+        self.latest = DropOldestQueue(1,  FramePacket.release)
+
+
+class MultiSourceRunner(object):
+    """Serves several cameras from one process with one set of models.
+
+    Each camera is read on its own thread. The gather stage takes the newest frame
+    of every camera, waiting up to gather_timeout_s for the slower ones once the
+    first has arrived, and the whole batch goes through a single forward pass of
+    the pose model and the person detector. The results are routed back to each
+    camera's own player tracker, controllers and SocketSender. Items passing through the
+    stages are lists of (source, packet)."""
+
+    _GET_TIMEOUT_S = 0.1
+
+    def __init__(self,  pose_estimator,  sources,  queue_size=1,  report_interval_s=5.0,
+                 return_annotated_image=False,  gather_timeout_s=0.01):
+        self.sources = sources
+        self._pose_estimator = pose_estimator
+        self._return_annotated_image = return_annotated_image
+        self._gather_timeout_s = gather_timeout_s
+        self._frame_ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._capture_threads = []
+        self.num_batches = 0
+        self.num_batched_frames = 0
+
+        self._runner = PipelineRunner(queue_size=queue_size,  report_interval_s=report_interval_s,  on_drop=release_batch)
+        self._runner.add_source('gather',  self._gather_stage)
+        self._runner.add_stage('detect',  self._detect_stage)
+        self._runner.add_stage('control',  self._control_stage)
+
+    def _capture(self,  source):
+        try:
+            while not self._stop_event.is_set():
+                buffer = source.video_reader.read_frame_buffer()
+                if buffer is None:
+                    break
+
+                source.num_frames += 1
+                packet = FramePacket(source.num_frames,  buffer.array,  buffer.timestamp)
+                packet.buffer = buffer
+                source.latest.put(packet)
+                self._frame_ready.set()
+        finally:
+            source.latest.close()
+            self._frame_ready.set()
+
+    def _gather_stage(self):
+        # Returns None once every camera is closed and drained
+        deadline = None
+        batch = []
+        pending = list(self.sources)
+        while not self._stop_event.is_set():
+            self._frame_ready.clear()
+            for source in list(pending):
+                packet = source.latest.get(0)
+                if packet is not None:
+                    batch.append((source,  packet))
+                    pending.remove(source)
+                elif source.latest.is_closed():
+                    pending.remove(source)
+
+            if len(pending) == 0:
+                break
+
+            now = time.monotonic()
+            if len(batch) > 0:
+                if deadline is None:
+                    deadline = now + self._gather_timeout_s
+                if now >= deadline:
+                    break
+                self._frame_ready.wait(deadline - now)
+            else:
+                self._frame_ready.wait(self._GET_TIMEOUT_S)
+
+        if len(batch) == 0:
+            return None
+
+        self.num_batches += 1
+        self.num_batched_frames += len(batch)
+        return batch
+
+    def _detect_stage(self,  batch):
+        detection = self._pose_estimator.detect_batch_async([packet.image for _, packet in batch],
+                                                            return_annotated_image=self._return_annotated_image)
+        # Every packet holds on to its pooled frame until the batch has been inferred
+        for _, packet in batch:
+            packet.detection = detection
+        return batch
+
+    def _control_stage(self,  batch):
+        results = batch[0][1].detection.result()
+        for (source, packet), (objects, annot_image) in zip(batch,  results):
+            packet.annot_image = annot_image
+            players = source.player_tracker.update(objects,  packet.timestamp)
+            # Oldest player first, so the skeleton steering the game is always objects[0]
+            packet.objects = [skeleton for _, skeleton in players]
+            source.motion.parse_players(players,  packet.timestamp,  source.player_tracker.player_ids())
+            roll, pitch, game_state, left_wing_roll_target, right_wing_roll_target, body_height = source.motion.primary_control()
+            source.socket_sender.send(int(roll),  int(pitch),  game_state,  int(left_wing_roll_target),  int(right_wing_roll_target),
+                                      int(body_height),  packet.timestamp)
+            packet.control = (roll,  pitch,  game_state,  left_wing_roll_target,  right_wing_roll_target,  body_height)
+
+        return batch
+
+    def start(self):
+        self._stop_event.clear()
+        for source in self.sources:
+            thread = threading.Thread(target=self._capture,  args=(source,),  name=f"capture-{source.name}",  daemon=True)
+            self._capture_threads.append(thread)
+            thread.start()
+
+        self._runner.start()
+
+    def is_running(self):
+        return self._runner.is_running()
+
+    def get_output(self,  timeout=None):
+        """Returns the latest [(source, packet)] that went through every stage, or None.
+        Hand it to release_batch once done."""
+        return self._runner.get_output(timeout)
+
+    def stop(self):
+        self._stop_event.set()
+        for thread in self._capture_threads:
+            thread.join()
+        self._capture_threads = []
+
+        # Hand back the frames no batch picked up
+        for source in self.sources:
+            packet = source.latest.get(0)
+            while packet is not None:
+                packet.release()
+                packet = source.latest.get(0)
+
+        self._runner.stop()
+
+    def print_report_if_due(self):
+        if not self._runner.print_report_if_due():
+            return False
+
+        mean_batch = self.num_batched_frames / self.num_batches if self.num_batches > 0 else 0.0
+        print(f"[batch] mean size={mean_batch:.2f} of {len(self.sources)} cameras")
+        for source in self.sources:
+            print(f"[{source.name}] frames={source.num_frames} dropped={source.latest.num_dropped}")
+
+        return True
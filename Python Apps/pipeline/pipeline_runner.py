@@ -0,0 +1,196 @@
+import threading
+import time
+
+from .drop_oldest_queue import DropOldestQueue
+
+
+class FramePacket(object):
+
+    def __init__(self, frame_id, image, timestamp=None):
+        self.frame_id = frame_id
+        self.timestamp = time.monotonic() if timestamp is None else timestamp
+        self.image = image
+        self.objects = []
+        self.annot_image = None
+        self.control = None
+        self.buffer = None
+        # Future of an asynchronous detection still reading the image
+        self.detection = None
+        # Set when inference was skipped because nothing in the scene moved
+        self.static = False
+
+    def release(self):
+        # Hands a pooled frame back once no stage needs the image any more
+        if self.detection is not None and not self.detection.done():
+            self.detection.add_done_callback(lambda _: self.release())
+            return
+
+        if self.buffer is not None:
+            self.buffer.release()
+            self.buffer = None
+
+
+class StageStats(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.num_processed = 0
+        self.busy_s = 0.0
+        self._window_start = time.monotonic()
+        self._window_processed = 0
+        self._window_busy_s = 0.0
+
+    def record(self, duration_s):
+        self.num_processed += 1
+        self.busy_s += duration_s
+        self._window_processed += 1
+        self._window_busy_s += duration_s
+
+    def snapshot(self):
+        # Throughput and latency over the window since the previous snapshot
+        now = time.monotonic()
+        elapsed = max(1e-6, now - self._window_start)
+        fps = self._window_processed / elapsed
+        latency_ms = self._window_busy_s * 1000.0 / self._window_processed if self._window_processed > 0 else 0.0
+
+        self._window_start = now
+        self._window_processed = 0
+        self._window_busy_s = 0.0
+
+        return fps, latency_ms
+
+
+class PipelineStage(object):
+
+    def __init__(self, name, fn, in_queue, out_queue):
+        self.name = name
+        self.stats = StageStats(name)
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self._fn = fn
+
+    def process(self, item):
+        t0 = time.perf_counter()
+        if self.in_queue is None:
+            result = self._fn()
+        else:
+            result = self._fn(item)
+        self.stats.record(time.perf_counter() - t0)
+
+        return result
+
+
+class PipelineRunner(object):
+    """Runs each stage on its own worker thread. Stages are connected by bounded
+    drop-oldest queues so a slow stage always works on the freshest frame while
+    the stages before it keep running. on_drop is called with every item that is
+    discarded, by a full queue or a stage returning None, so it can be released."""
+
+    _GET_TIMEOUT_S = 0.1
+
+    def __init__(self, queue_size=1, report_interval_s=5.0, on_drop=None):
+        self._queue_size = queue_size
+        self._on_drop = on_drop
+        self._report_interval_s = report_interval_s
+        self._stages = []
+        self._threads = []
+        self._output_queue = None
+        self._stop_event = threading.Event()
+        self._last_report = time.monotonic()
+        self.error = None
+
+    def add_source(self, name, fn):
+        # fn() returns the next item, or None once the source is exhausted
+        if len(self._stages) > 0:
+            raise RuntimeError('The source must be the first stage')
+
+        self._add(name, fn, None)
+
+    def add_stage(self, name, fn):
+        # fn(item) returns the item to pass on, or None to drop it
+        if len(self._stages) == 0:
+            raise RuntimeError('A source must be added before any other stage')
+
+        self._add(name, fn, self._stages[-1].out_queue)
+
+    def _add(self, name, fn, in_queue):
+        out_queue = DropOldestQueue(self._queue_size, self._on_drop)
+        self._stages.append(PipelineStage(name, fn, in_queue, out_queue))
+        self._output_queue = out_queue
+
+    def start(self):
+        self._stop_event.clear()
+        self._last_report = time.monotonic()
+        for stage in self._stages:
+            thread = threading.Thread(target=self._run_stage, args=(stage,), name=f"pipeline-{stage.name}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _run_stage(self, stage):
+        try:
+            while not self._stop_event.is_set():
+                if stage.in_queue is None:
+                    item = None
+                else:
+                    item = stage.in_queue.get(self._GET_TIMEOUT_S)
+                    if item is None:
+                        if stage.in_queue.is_closed():
+                            break
+                        continue
+
+                result = stage.process(item)
+                if result is not None:
+                    stage.out_queue.put(result)
+                elif stage.in_queue is None:
+                    # Source exhausted
+                    break
+                elif self._on_drop is not None:
+                    self._on_drop(item)
+        except Exception as e:
+            self.error = e
+            self._stop_event.set()
+        finally:
+            stage.out_queue.close()
+
+    def is_running(self):
+        return not self._stop_event.is_set() and not (self._output_queue.is_closed() and self._output_queue.depth() == 0)
+
+    def get_output(self, timeout=None):
+        """Returns the latest item that went through every stage, or None"""
+        return self._output_queue.get(timeout)
+
+    def stop(self):
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        if self.error is not None:
+            raise self.error
+
+    def report(self):
+        report = []
+        for stage in self._stages:
+            fps, latency_ms = stage.stats.snapshot()
+            report.append({
+                'name': stage.name,
+                'fps': fps,
+                'latency_ms': latency_ms,
+                'processed': stage.stats.num_processed,
+                'queue_depth': stage.out_queue.depth(),
+                'dropped': stage.out_queue.num_dropped,
+            })
+
+        return report
+
+    def print_report_if_due(self):
+        now = time.monotonic()
+        if now - self._last_report < self._report_interval_s:
+            return False
+
+        self._last_report = now
+        for entry in self.report():
+            print(f"[{entry['name']}] fps={entry['fps']:.1f} latency={entry['latency_ms']:.1f}ms "
+                  f"queue={entry['queue_depth']} dropped={entry['dropped']}")
+
+        return True
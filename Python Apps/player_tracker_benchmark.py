@@ -0,0 +1,84 @@
+from motion.player_tracker import PlayerTracker, PlayerControllers
+from pose_estimation.skeleton import Skeleton
+from pose_estimation.stubs import StubPoseEstimator
+
+import argparse
+import time
+
+import numpy as np
+
+
+FRAME_S = 1.0 / 30.0
+
+
+def make_players(num_players,  num_frames,  seed=0):
+    """Per frame the skeletons of num_players people side by side, each drifting and
+    jittering, in shuffled order, with every player hidden for a few frames now and
+    then. Returns the frames and the true identity of each skeleton."""
+    rng = np.random.default_rng(seed)
+    pose_estimator = StubPoseEstimator('models')
+    image = np.zeros((224, 224, 3),  dtype=np.uint8)
+    scale = min(1.0,  0.8 / num_players)
+    lanes = (np.arange(num_players) + 0.5) / num_players
+    drift = np.zeros(num_players)
+    frames = []
+    identities = []
+    for frame in range(num_frames):
+        pose = pose_estimator.detect(image)[0][0]
+        # Everyone wanders about their own spot without walking through each other
+        drift = np.clip(drift + rng.normal(0.0,  0.001,  num_players),  -0.25 / num_players,  0.25 / num_players)
+        centres = lanes + drift
+        order = rng.permutation(num_players)
+        skeletons = []
+        visible = []
+        for player in order:
+            if (frame + 37 * player) % 200 < 4:
+                continue
+            joints = pose.joints.copy()
+            joints[:, 0] = centres[player] + (joints[:, 0] - 0.5) * scale
+            joints += rng.normal(0.0,  0.003,  joints.shape)
+            skeletons.append(Skeleton(pose.layout,  joints.astype(np.float32),  pose.valid.copy()))
+            visible.append(player)
+        frames.append(skeletons)
+        identities.append(visible)
+
+    return frames,  identities
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-frame cost and id stability of PlayerTracker against the number of people in view')
+    parser.add_argument('--frames',  type=int,  default=1000)
+    args = parser.parse_args()
+
+    for num_players in (1, 2, 4, 8, 16):
+        frames,  identities = make_players(num_players,  args.frames)
+        tracker = PlayerTracker()
+        controllers = PlayerControllers(jump_window_s=1.0)
+
+        track_ns = 0
+        control_ns = 0
+        id_of = {}
+        all_ids = set()
+        num_switches = 0
+        for frame, skeletons in enumerate(frames):
+            t0 = time.perf_counter_ns()
+            players = tracker.update(skeletons,  frame * FRAME_S)
+            t1 = time.perf_counter_ns()
+            controllers.parse_players(players,  frame * FRAME_S,  tracker.player_ids())
+            t2 = time.perf_counter_ns()
+            track_ns += t1 - t0
+            control_ns += t2 - t1
+
+            for player_id, col in tracker.matches():
+                player = identities[frame][col]
+                if player in id_of and id_of[player] != player_id:
+                    num_switches += 1
+                id_of[player] = player_id
+                all_ids.add(player_id)
+
+        print(f"{num_players:2d} players: track {track_ns / 1000 / args.frames:7.1f}us control {control_ns / 1000 / args.frames:7.1f}us per frame, "
+              f"{num_switches} id switches, {len(all_ids)} ids for {num_players} players")
+
+
+if __name__ == '__main__':
+    main()
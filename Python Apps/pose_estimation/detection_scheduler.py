@@ -0,0 +1,165 @@
+import concurrent.futures
+import threading
+
+import numpy as np
+
+
+class DetectionScheduler(object):
+    """Runs the human detector every N frames, or sooner when tracking is lost,
+    and carries the person boxes forward in between by re-fitting them to the
+    extents of the skeleton joints found inside each box. The joints are looked for
+    in the box moved on by how far it moved at the previous re-fit and widened by
+    search_margin of its size, so a player moving sideways is not cut off.
+
+    Frames are pipelined: begin_frame for the next frame may run while the current
+    one is still parsed on another thread. So begin_frame hands back the frame's own
+    detection, a future of (boxes, scores) or None when none was due, and the frame
+    is later finished with boxes_for(detection) and track(skeletons), in frame order.
+    Only those two move the tracked boxes on; the state is guarded by a lock."""
+
+    def __init__(self, detector, interval=5, min_score=0.6, min_joints=4, box_padding=0.1,
+                 redetect_when_empty=True, async_detection=False, search_margin=0.25):
+        self._detector = detector
+        self._interval = max(1, interval)
+        self._min_score = min_score
+        self._min_joints = min_joints
+        self._box_padding = box_padding
+        self._search_margin = search_margin
+        self._redetect_when_empty = redetect_when_empty
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1) if async_detection else None
+        self._lock = threading.RLock()
+        self._pending = None
+        self._boxes = []
+        # Per box, how far its centre moved at the last re-fit, None for a box just detected
+        self._velocities = []
+        self._force_detection = True
+        self._frames_since_detection = 0
+        self.num_frames = 0
+        self.num_detections = 0
+
+    def set_interval(self, interval):
+        with self._lock:
+            self._interval = max(1, interval)
+
+    def begin_frame(self, image):
+        """Counts a frame and starts its detection when one is due, before pose
+        inference so that an asynchronous detection overlaps with it. Returns the
+        frame's detection, to be passed to boxes_for() when the frame is parsed."""
+        with self._lock:
+            if not self.claim_detection():
+                return None
+
+            if self._executor is not None:
+                self._pending = self._executor.submit(self._detector.detect_with_scores, image)
+                return self._pending
+
+        detection = concurrent.futures.Future()
+        detection.set_result(self._detector.detect_with_scores(image))
+        return detection
+
+    def claim_detection(self):
+        """Counts a frame and returns whether a detection is due for it. A caller that
+        runs the detector itself, e.g. batched over several cameras, passes a future
+        of the frame's result to boxes_for()."""
+        with self._lock:
+            self.num_frames += 1
+            self._frames_since_detection += 1
+
+            if not self._should_detect():
+                return False
+
+            self._frames_since_detection = 0
+            self._force_detection = False
+            self.num_detections += 1
+            return True
+
+    def current_boxes(self, detection=None):
+        """The boxes a frame will be parsed with, without adopting anything: its own
+        detection's, or else the boxes tracked so far, which lag a frame behind while
+        the previous frame is still being parsed."""
+        if detection is not None:
+            return detection.result()[0]
+
+        with self._lock:
+            return self._boxes
+
+    def boxes_for(self, detection):
+        """The boxes of the frame begin_frame returned detection for. Its own detection
+        is waited for and adopted; without one, the boxes tracked up to the previous
+        frame are carried forward. Call in frame order, each followed by track()."""
+        if detection is not None:
+            # Waited on outside the lock so begin_frame for the next frame is never held up
+            detections = detection.result()
+            with self._lock:
+                self._adopt(detections)
+                if self._pending is detection:
+                    self._pending = None
+
+        with self._lock:
+            return self._boxes
+
+    def track(self, skeletons):
+        """Re-fits every box to the joints inside it. A box that no longer holds
+        enough joints is dropped and a fresh detection is requested."""
+        points = [skeleton.joints[skeleton.valid] for skeleton in skeletons]
+        points = np.concatenate(points) if len(points) > 0 else np.zeros((0, 2), dtype=np.float32)
+
+        with self._lock:
+            self._boxes, self._velocities = self._refit(self._boxes, self._velocities, points)
+
+    def _refit(self, boxes, velocities, points):
+        tracked_boxes = []
+        tracked_velocities = []
+        for box, velocity in zip(boxes, velocities):
+            vx, vy = velocity if velocity is not None else (0.0, 0.0)
+            margin_x = (box[2] - box[0]) * self._search_margin
+            margin_y = (box[3] - box[1]) * self._search_margin
+            x_min, x_max = box[0] + vx - margin_x, box[2] + vx + margin_x
+            y_min, y_max = box[1] + vy - margin_y, box[3] + vy + margin_y
+            inside = points[(x_min <= points[:, 0]) & (points[:, 0] <= x_max) & (y_min <= points[:, 1]) & (points[:, 1] <= y_max)]
+            if len(inside) < self._min_joints:
+                self._force_detection = True
+                continue
+
+            x1, y1 = inside.min(axis=0)
+            x2, y2 = inside.max(axis=0)
+            pad_x = (x2 - x1) * self._box_padding
+            pad_y = (y2 - y1) * self._box_padding
+            tracked_box = [max(0.0, float(x1 - pad_x)), max(0.0, float(y1 - pad_y)),
+                           min(1.0, float(x2 + pad_x)), min(1.0, float(y2 + pad_y))]
+            tracked_boxes.append(tracked_box)
+            if velocity is None:
+                # A detector box is shaped differently from a fitted one, so its move is not motion
+                tracked_velocities.append((0.0, 0.0))
+            else:
+                tracked_velocities.append(((tracked_box[0] + tracked_box[2] - box[0] - box[2]) / 2.0,
+                                           (tracked_box[1] + tracked_box[3] - box[1] - box[3]) / 2.0))
+
+        return tracked_boxes, tracked_velocities
+
+    def _should_detect(self):
+        if self._pending is not None:
+            return False
+
+        if self._force_detection or self._frames_since_detection >= self._interval:
+            return True
+
+        return self._redetect_when_empty and len(self._boxes) == 0
+
+    def _adopt(self, detections):
+        boxes, scores = detections
+        self._boxes = boxes
+        self._velocities = [None] * len(boxes)
+        # A weak detection is re-checked on the next frame instead of being carried for N frames
+        if len(scores) > 0 and min(scores) < self._min_score:
+            self._force_detection = True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'interval': self._interval,
+                'frames': self.num_frames,
+                'detections': self.num_detections,
+                'detection_ratio': self.num_detections / self.num_frames if self.num_frames > 0 else 0.0,
+                'tracked_boxes': len(self._boxes),
+            }
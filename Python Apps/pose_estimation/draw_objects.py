@@ -1,43 +1,14 @@
-import cv2
+from .skeleton import build_skeletons, draw_skeletons
 
 
 class DrawObjects(object):
-    
-    def __init__(self, topology):
-        self.topology = topology
-        
-    def __call__(self, image, object_counts, objects, normalized_peaks):
-        topology = self.topology['topology']
-        topology_names = self.topology['segment_names']
-        topology_colours = self.topology['segment_colours']
-        
-        height = image.shape[0]
-        width = image.shape[1]
-        
-        K = topology.shape[0]
-        count = int(object_counts[0])
-        for i in range(count):
-            color = (0, 255, 0)
-            obj = objects[0][i]
-            C = obj.shape[0]
-            for j in range(C):
-                k = int(obj[j])
-                if k >= 0:
-                    peak = normalized_peaks[0][j][k]
-                    x = round(float(peak[1]) * width)
-                    y = round(float(peak[0]) * height)
-                    color = (0,  255,  0)
-                    cv2.circle(image, (x, y), 3, color, 2)
+    """Draws the raw ParseObjects output, every part found of every object,
+    the same way as draw_skeletons"""
+
+    _WHOLE_FRAME = [[0.0, 0.0, 1.0, 1.0]]
 
-            for k in range(K):
-                c_a = topology[k][2]
-                c_b = topology[k][3]
-                if obj[c_a] >= 0 and obj[c_b] >= 0:
-                    peak0 = normalized_peaks[0][c_a][obj[c_a]]
-                    peak1 = normalized_peaks[0][c_b][obj[c_b]]
-                    x0 = round(float(peak0[1]) * width)
-                    y0 = round(float(peak0[0]) * height)
-                    x1 = round(float(peak1[1]) * width)
-                    y1 = round(float(peak1[0]) * height)
-                    color = topology_colours[k]
-                    cv2.line(image, (x0, y0), (x1, y1), color, 2)
+    def __init__(self, layout):
+        self.layout = layout
+
+    def __call__(self, image, object_counts, objects, normalized_peaks):
+        draw_skeletons(image, build_skeletons(self.layout, object_counts, objects, normalized_peaks, self._WHOLE_FRAME))
@@ -1,34 +1,38 @@
-import tensorflow as tf
-from PIL import Image
-from numpy import asarray
+from .inference_backends import create_detector_backend
+from .preprocessing import as_preprocessed
 
 
 class HumanDetection(object):
     _HUMAN_CLASS_ID = 1
     _MIN_ACCEPTABLE_SCORE = 0.5
 
-    def __init__(self):
-        self._model = tf.saved_model.load(
-            "models/ssd", tags=None, options=None
-        )
-        self._infer = self._model.signatures["serving_default"]
-
-    def detect(self, image):
-        x = asarray(image)
-        x = x.reshape([1, x.shape[0], x.shape[1], x.shape[2]])
-        result = self._infer(tf.constant(x))
-        num_detection = int(result['num_detections'][0].numpy())
+    def __init__(self,  backend='tensorflow',  model_path='models/ssd',  num_threads=None):
+        self._backend = create_detector_backend(backend,  model_path,  num_threads)
+
+    def detect(self,  image):
+        boxes, _ = self.detect_with_scores(image)
+        return boxes
+
+    def detect_with_scores(self,  image):
+        # The input tensor is built once per frame and shared with anything else that needs it
+        frame = as_preprocessed(image)
+        return self._filter(*self._backend.infer(frame))
+
+    def detect_batch_with_scores(self,  images):
+        """detect_with_scores for several frames in one backend call"""
+        frames = [as_preprocessed(image) for image in images]
+        return [self._filter(*detections) for detections in self._backend.infer_batch(frames)]
+
+    def _filter(self,  detection_classes,  detection_scores,  detection_boxes):
         response_list = []
-        for i in range(num_detection):
-            class_id = int(result['detection_classes'].numpy()[0][i])
-            score = result['detection_scores'].numpy()[0][i]
+        score_list = []
+        for i in range(len(detection_scores)):
+            class_id = int(detection_classes[i])
+            score = detection_scores[i]
 
             if class_id == self._HUMAN_CLASS_ID and score > self._MIN_ACCEPTABLE_SCORE:
-                y1 = result['detection_boxes'].numpy()[0][i][0]
-                x1 = result['detection_boxes'].numpy()[0][i][1]
-                y2 = result['detection_boxes'].numpy()[0][i][2]
-                x2 = result['detection_boxes'].numpy()[0][i][3]
-
-                response_list.append([x1, y1, x2, y2])
+                x1, y1, x2, y2 = detection_boxes[i]
+                response_list.append([float(x1), float(y1), float(x2), float(y2)])
+                score_list.append(float(score))
 
-        return response_list
+        return response_list, score_list
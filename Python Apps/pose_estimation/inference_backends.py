@@ -0,0 +1,404 @@
+import os
+
+import numpy as np
+
+from .model_cache import ModelArtifactCache
+from utilities.profiler import profiler
+
+
+# Each backend imports its own runtime when it is created, so a machine only needs
+# the stack of the backend it actually runs: TensorRT + torch2trt on the Jetson,
+# ONNX Runtime or OpenCV DNN on any x86 or ARM CPU.
+
+POSE_IMAGE_WIDTH = 224
+POSE_IMAGE_HEIGHT = 224
+POSE_WEIGHTS_NAME = 'resnet18_baseline_att_224x224_A_epoch_249.pth'
+POSE_ONNX_NAME = 'resnet18_baseline_att_224x224_A_epoch_249.onnx'
+# Engines shipped next to the model, for installs without the weights to fingerprint
+POSE_TRT_NAME = 'resnet18_baseline_att_224x224_A_epoch_249_trt.pth'
+POSE_TRT_BATCH_NAME = 'resnet18_baseline_att_224x224_A_epoch_249_trt_b{}.pth'
+POSE_ONNX_OPSET = 11
+# Engines and exports built from the weights, under model_folder. Engines are cached as a kind
+# per batch size, so each size keeps its own most recent engines and loads only its own
+MODEL_CACHE_DIR = 'cache'
+POSE_TRT_KIND = 'pose_trt_b{}'
+
+# ImageNet normalisation the pose model was trained with, (x / 255 - mean) / std
+# folded into one multiply and subtract
+_POSE_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+_POSE_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+_POSE_INPUT_SCALE = 1.0 / (255.0 * _POSE_STD)
+_POSE_INPUT_OFFSET = _POSE_MEAN / _POSE_STD
+
+
+def load_pose_model(model_folder,  num_parts,  num_links,  device='cpu'):
+    import torch
+    import trt_pose.models
+
+    model = trt_pose.models.resnet18_baseline_att(num_parts,  2 * num_links).to(device).eval()
+    model.load_state_dict(torch.load(os.path.join(model_folder,  POSE_WEIGHTS_NAME),  map_location=device))
+    return model
+
+
+def export_pose_onnx(model_folder,  num_parts,  num_links,  onnx_path):
+    import torch
+
+    print("Exporting Torch OpenPose model to ONNX")
+    model = load_pose_model(model_folder,  num_parts,  num_links)
+    data = torch.zeros((1, 3, POSE_IMAGE_HEIGHT, POSE_IMAGE_WIDTH))
+    # A dynamic batch axis lets one session serve several cameras per call
+    dynamic_axes = {'input': {0: 'batch'},  'cmap': {0: 'batch'},  'paf': {0: 'batch'}}
+    torch.onnx.export(model,  data,  onnx_path,  input_names=['input'],  output_names=['cmap',  'paf'],
+                      dynamic_axes=dynamic_axes,  opset_version=POSE_ONNX_OPSET)
+
+
+def cached_pose_onnx(model_folder,  num_parts,  num_links):
+    """Path of the pose model exported to ONNX, exported again whenever the weights change"""
+    cache = ModelArtifactCache(os.path.join(model_folder,  MODEL_CACHE_DIR))
+    weights_path = os.path.join(model_folder,  POSE_WEIGHTS_NAME)
+    if not os.path.exists(weights_path):
+        # CPU only installs may ship the exported model without the weights and torch
+        onnx_path = cache.latest('pose_onnx',  '.onnx')
+        if onnx_path is None and os.path.exists(os.path.join(model_folder,  POSE_ONNX_NAME)):
+            onnx_path = os.path.join(model_folder,  POSE_ONNX_NAME)
+        if onnx_path is None:
+            raise FileNotFoundError(f"Neither {POSE_WEIGHTS_NAME} nor an exported ONNX model found in {model_folder}")
+        return onnx_path
+
+    fingerprint = cache.fingerprint([weights_path],  num_parts=num_parts,  num_links=num_links,
+                                    input_shape=['batch', 3, POSE_IMAGE_HEIGHT, POSE_IMAGE_WIDTH],  opset=POSE_ONNX_OPSET)
+    return cache.build('pose_onnx',  fingerprint,  '.onnx',
+                       lambda tmp_path: export_pose_onnx(model_folder,  num_parts,  num_links,  tmp_path))
+
+
+def stack_inputs(frames,  build):
+    """The (B, 3, H, W) model input for a batch of frames, each frame's part built once by build"""
+    inputs = [frame.get('pose_input',  build) for frame in frames]
+    return inputs[0] if len(inputs) == 1 else np.concatenate(inputs)
+
+
+def preprocess_pose_on_host(frame):
+    """The normalised (1, 3, H, W) float32 model input built on the CPU"""
+    # Made planar while still uint8, transposing the float copy costs several times more
+    image = np.ascontiguousarray(frame.resized(POSE_IMAGE_WIDTH,  POSE_IMAGE_HEIGHT).transpose(2, 0, 1),  dtype=np.float32)
+    image *= _POSE_INPUT_SCALE[:, None, None]
+    image -= _POSE_INPUT_OFFSET[:, None, None]
+    return image[np.newaxis, ...]
+
+
+class CompletedInference(object):
+    """The output of a backend that finished inference inside submit()"""
+
+    def __init__(self,  cmap,  paf):
+        self._outputs = (cmap,  paf)
+
+    def wait(self):
+        return self._outputs
+
+
+class PendingTransfer(object):
+    """GPU output being copied into pinned host buffers; wait() blocks until the copy lands"""
+
+    def __init__(self,  event,  cmap,  paf):
+        self._event = event
+        self._outputs = (cmap,  paf)
+
+    def wait(self):
+        self._event.synchronize()
+        return self._outputs
+
+
+class TensorRTPoseBackend(object):
+    """The pose model compiled with torch2trt and run on the GPU. Engines are cached
+    under a fingerprint of the weights, batch size, precision and the torch,
+    TensorRT and GPU they were built with. Until the engine for the current
+    fingerprint has been built in the background, the plain PyTorch model serves
+    the frames on the GPU, slower but from the start. Without the weights, an engine
+    shipped in model_folder, or else the latest cached one for max_batch_size, is
+    loaded as it is."""
+
+    _MAX_WORKSPACE_SIZE = 1 << 25
+    _FP16 = True
+
+    def __init__(self,  model_folder,  num_parts,  num_links,  num_threads=None,  max_batch_size=1):
+        import tensorrt
+        import torch
+        import torch2trt
+
+        self._torch = torch
+        self._device = torch.device('cuda')
+
+        cache = ModelArtifactCache(os.path.join(model_folder,  MODEL_CACHE_DIR))
+        self._input_scale = torch.from_numpy(_POSE_INPUT_SCALE).to(self._device)[:, None, None]
+        self._input_offset = torch.from_numpy(_POSE_INPUT_OFFSET).to(self._device)[:, None, None]
+        # Pinned (cmap, paf) host buffers per in-flight slot and batch size, allocated on first use
+        self._host_buffers = {}
+        self.engine_build = None
+
+        if not os.path.exists(os.path.join(model_folder,  POSE_WEIGHTS_NAME)):
+            # Installs may ship a serialized engine without the weights it was built from
+            self._model = self._load_engine(self._shipped_engine(cache,  model_folder,  max_batch_size))
+            return
+
+        fingerprint = cache.fingerprint([os.path.join(model_folder,  POSE_WEIGHTS_NAME)],  num_parts=num_parts,  num_links=num_links,
+                                        input_shape=[max_batch_size, 3, POSE_IMAGE_HEIGHT, POSE_IMAGE_WIDTH],  fp16=self._FP16,
+                                        max_workspace_size=self._MAX_WORKSPACE_SIZE,  torch=torch.__version__,  tensorrt=tensorrt.__version__,
+                                        torch2trt=getattr(torch2trt,  '__version__',  None),  gpu=torch.cuda.get_device_name())
+        kind = POSE_TRT_KIND.format(max_batch_size)
+        engine_path = cache.get(kind,  fingerprint,  '.pth')
+        # Whichever model serves frames; replaced by the engine once a background build finishes
+        self._model = None
+        if engine_path is not None:
+            self._model = self._load_engine(engine_path)
+        else:
+            print("No TensorRT engine for these weights yet, serving with PyTorch while it is built")
+            self._model = load_pose_model(model_folder,  num_parts,  num_links,  self._device)
+            self.engine_build = cache.build_async(kind,  fingerprint,  '.pth',
+                                                  lambda tmp_path: self._convert(model_folder,  num_parts,  num_links,  max_batch_size,  tmp_path))
+            self.engine_build.add_done_callback(self._on_engine_built)
+
+    def _shipped_engine(self,  cache,  model_folder,  max_batch_size):
+        name = POSE_TRT_BATCH_NAME.format(max_batch_size) if max_batch_size > 1 else POSE_TRT_NAME
+        engine_path = os.path.join(model_folder,  name)
+        if not os.path.exists(engine_path):
+            # Never one built for another batch size, which would fail on larger batches
+            engine_path = cache.latest(POSE_TRT_KIND.format(max_batch_size),  '.pth')
+        if engine_path is None:
+            raise FileNotFoundError(f"Neither {POSE_WEIGHTS_NAME} nor a TensorRT engine for batch size {max_batch_size} found in {model_folder}")
+        return engine_path
+
+    def _convert(self,  model_folder,  num_parts,  num_links,  max_batch_size,  engine_path):
+        import torch2trt
+
+        print("Converting Torch OpenPose model to TFRT")
+        # A model of its own, the serving one may be running on another thread
+        model = load_pose_model(model_folder,  num_parts,  num_links,  self._device)
+        data = self._torch.zeros((1, 3, POSE_IMAGE_HEIGHT, POSE_IMAGE_WIDTH)).to(self._device)
+        model_trt = torch2trt.torch2trt(model,  [data],  fp16_mode=self._FP16,  max_workspace_size=self._MAX_WORKSPACE_SIZE,
+                                        max_batch_size=max_batch_size)
+        self._torch.save(model_trt.state_dict(),  engine_path)
+
+    def _load_engine(self,  engine_path):
+        from torch2trt import TRTModule
+
+        print("Loading TFRT OpenPose model")
+        model_trt = TRTModule()
+        model_trt.load_state_dict(self._torch.load(engine_path))
+        return model_trt
+
+    def _on_engine_built(self,  build):
+        if build.exception() is not None:
+            print(f"TensorRT engine build failed, staying on PyTorch: {build.exception()}")
+            return
+
+        self._model = self._load_engine(build.result())
+
+    def _forward(self,  data):
+        with self._torch.no_grad():
+            return self._model(data)
+
+    def _preprocess(self,  frame):
+        # Uploads the 224x224 uint8 image, a quarter of the bytes of a float tensor,
+        # and converts and normalises it on the GPU
+        image = np.ascontiguousarray(frame.resized(POSE_IMAGE_WIDTH,  POSE_IMAGE_HEIGHT))
+        data = self._torch.from_numpy(image).to(self._device).permute(2, 0, 1).float()
+        data.mul_(self._input_scale).sub_(self._input_offset)
+        return data[None, ...]
+
+    def infer(self,  frame):
+        with profiler.stage('preprocess'):
+            data = frame.get('pose_input',  self._preprocess)
+        with profiler.stage('trt_forward'):
+            cmap, paf = self._forward(data)
+            if profiler.enabled:
+                # Kernels run asynchronously, wait for them so the copy below is timed on its own
+                self._torch.cuda.current_stream().synchronize()
+        with profiler.stage('device_to_host'):
+            return cmap.detach().cpu().numpy(), paf.detach().cpu().numpy()
+
+    def submit(self,  frames,  slot):
+        """Queues one forward pass over the batch of frames and the copy of its output
+        into the pinned buffers of slot, and returns without waiting for either. The
+        slot must not be reused until the returned transfer has been waited on and
+        its arrays consumed."""
+        with profiler.stage('preprocess'):
+            inputs = [frame.get('pose_input',  self._preprocess) for frame in frames]
+            data = inputs[0] if len(inputs) == 1 else self._torch.cat(inputs)
+        with profiler.stage('trt_forward'):
+            cmap, paf = self._forward(data)
+            if profiler.enabled:
+                self._torch.cuda.current_stream().synchronize()
+
+        key = (slot,  len(frames))
+        if key not in self._host_buffers:
+            self._host_buffers[key] = (self._torch.empty(cmap.shape,  dtype=cmap.dtype,  pin_memory=True),
+                                       self._torch.empty(paf.shape,  dtype=paf.dtype,  pin_memory=True))
+        host_cmap, host_paf = self._host_buffers[key]
+        host_cmap.copy_(cmap.detach(),  non_blocking=True)
+        host_paf.copy_(paf.detach(),  non_blocking=True)
+        event = self._torch.cuda.Event()
+        event.record()
+        return PendingTransfer(event,  host_cmap.numpy(),  host_paf.numpy())
+
+
+class OnnxRuntimePoseBackend(object):
+    """The pose model exported to ONNX and run by ONNX Runtime on the CPU, any batch size"""
+
+    def __init__(self,  model_folder,  num_parts,  num_links,  num_threads=None,  max_batch_size=None):
+        import onnxruntime
+
+        onnx_path = cached_pose_onnx(model_folder,  num_parts,  num_links)
+
+        print("Loading ONNX OpenPose model")
+        options = onnxruntime.SessionOptions()
+        if num_threads is not None:
+            options.intra_op_num_threads = num_threads
+        self._session = onnxruntime.InferenceSession(onnx_path,  options,  providers=['CPUExecutionProvider'])
+        self._input_name = self._session.get_inputs()[0].name
+        # Preallocated (cmap, paf) output arrays bound per in-flight slot and batch size, made on first use
+        self._bindings = {}
+
+    def infer(self,  frame):
+        with profiler.stage('preprocess'):
+            data = frame.get('pose_input',  preprocess_pose_on_host)
+        with profiler.stage('forward'):
+            cmap, paf = self._session.run(None,  {self._input_name: data})
+        return cmap, paf
+
+    def _binding(self,  slot,  batch_size):
+        key = (slot,  batch_size)
+        if key not in self._bindings:
+            binding = self._session.io_binding()
+            outputs = []
+            for output in self._session.get_outputs():
+                array = np.empty([batch_size] + list(output.shape[1:]),  dtype=np.float32)
+                binding.bind_output(output.name,  'cpu',  0,  np.float32,  array.shape,  array.ctypes.data)
+                outputs.append(array)
+            self._bindings[key] = (binding,  outputs)
+
+        return self._bindings[key]
+
+    def submit(self,  frames,  slot):
+        """Runs one forward pass over the batch of frames straight into the output arrays
+        of slot, so like the GPU path nothing is allocated per call and a slot's arrays
+        stay valid until it is reused"""
+        binding, outputs = self._binding(slot,  len(frames))
+        with profiler.stage('preprocess'):
+            binding.bind_cpu_input(self._input_name,  stack_inputs(frames,  preprocess_pose_on_host))
+        with profiler.stage('forward'):
+            self._session.run_with_iobinding(binding)
+        return CompletedInference(*outputs)
+
+
+class OpenCVPoseBackend(object):
+    """The pose model exported to ONNX and run by OpenCV DNN on the CPU, any batch size"""
+
+    def __init__(self,  model_folder,  num_parts,  num_links,  num_threads=None,  max_batch_size=None):
+        import cv2
+
+        onnx_path = cached_pose_onnx(model_folder,  num_parts,  num_links)
+
+        print("Loading OpenCV DNN OpenPose model")
+        if num_threads is not None:
+            cv2.setNumThreads(num_threads)
+        self._net = cv2.dnn.readNetFromONNX(onnx_path)
+        self._output_names = self._net.getUnconnectedOutLayersNames()
+        self._num_parts = num_parts
+
+    def infer(self,  frame):
+        return self.submit([frame],  None).wait()
+
+    def submit(self,  frames,  slot):
+        with profiler.stage('preprocess'):
+            data = stack_inputs(frames,  preprocess_pose_on_host)
+        with profiler.stage('forward'):
+            self._net.setInput(data)
+            outputs = self._net.forward(self._output_names)
+        # OpenCV does not keep the ONNX output order, the part confidence map is the one with a channel per joint
+        cmap, paf = sorted(outputs,  key=lambda output: output.shape[1] != self._num_parts)
+        return CompletedInference(cmap,  paf)
+
+
+class TensorFlowDetectorBackend(object):
+    """The SSD MobileNet SavedModel run by TensorFlow"""
+
+    def __init__(self,  model_path='models/ssd',  num_threads=None):
+        import tensorflow as tf
+
+        if num_threads is not None:
+            tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+        self._tf = tf
+        self._model = tf.saved_model.load(model_path,  tags=None,  options=None)
+        self._infer = self._model.signatures["serving_default"]
+
+    def infer(self,  frame):
+        """Returns the class ids, scores and normalised (x1, y1, x2, y2) boxes of every detection"""
+        result = self._infer(frame.get('ssd_input',  lambda frame: self._tf.constant(frame.batched())))
+        num_detection = int(result['num_detections'][0].numpy())
+        detection_classes = result['detection_classes'].numpy()[0][:num_detection]
+        detection_scores = result['detection_scores'].numpy()[0][:num_detection]
+        # The model gives (y1, x1, y2, x2)
+        detection_boxes = result['detection_boxes'].numpy()[0][:num_detection][:, [1, 0, 3, 2]]
+        return detection_classes, detection_scores, detection_boxes
+
+    def infer_batch(self,  frames):
+        # The detection zoo SavedModels take a batch of one, so frames go through one by one
+        return [self.infer(frame) for frame in frames]
+
+
+class OpenCVDetectorBackend(object):
+    """An SSD MobileNet frozen graph run by OpenCV DNN on the CPU. model_path holds
+    frozen_inference_graph.pb and the graph.pbtxt made for it by OpenCV's
+    tf_text_graph_ssd.py."""
+
+    def __init__(self,  model_path='models/ssd',  num_threads=None,  input_size=(300, 300)):
+        import cv2
+
+        if num_threads is not None:
+            cv2.setNumThreads(num_threads)
+        self._cv2 = cv2
+        self._input_size = input_size
+        self._net = cv2.dnn.readNetFromTensorflow(os.path.join(model_path,  'frozen_inference_graph.pb'),
+                                                  os.path.join(model_path,  'graph.pbtxt'))
+
+    def infer(self,  frame):
+        """Returns the class ids, scores and normalised (x1, y1, x2, y2) boxes of every detection"""
+        return self.infer_batch([frame])[0]
+
+    def infer_batch(self,  frames):
+        # Fed in the same channel order as the TensorFlow backend so both find the same people
+        blobs = [frame.get('ssd_blob',  lambda frame: self._cv2.dnn.blobFromImage(frame.image,  size=self._input_size)) for frame in frames]
+        self._net.setInput(blobs[0] if len(blobs) == 1 else np.concatenate(blobs))
+        # One row per detection over the whole batch: image id, class id, score, x1, y1, x2, y2
+        detections = self._net.forward()[0, 0]
+        results = []
+        for idx in range(len(frames)):
+            rows = detections[detections[:, 0] == idx]
+            results.append((rows[:, 1],  rows[:, 2],  rows[:, 3:7]))
+        return results
+
+
+POSE_BACKENDS = {
+    'tensorrt': TensorRTPoseBackend,
+    'onnxruntime': OnnxRuntimePoseBackend,
+    'opencv': OpenCVPoseBackend,
+}
+
+DETECTOR_BACKENDS = {
+    'tensorflow': TensorFlowDetectorBackend,
+    'opencv': OpenCVDetectorBackend,
+}
+
+
+def create_pose_backend(name,  model_folder,  num_parts,  num_links,  num_threads=None,  max_batch_size=1):
+    if name not in POSE_BACKENDS:
+        raise ValueError(f"Unknown pose backend '{name}', expected one of {sorted(POSE_BACKENDS)}")
+
+    return POSE_BACKENDS[name](model_folder,  num_parts,  num_links,  num_threads,  max_batch_size)
+
+
+def create_detector_backend(name,  model_path='models/ssd',  num_threads=None):
+    if name not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend '{name}', expected one of {sorted(DETECTOR_BACKENDS)}")
+
+    return DETECTOR_BACKENDS[name](model_path,  num_threads)
@@ -0,0 +1,163 @@
+import concurrent.futures
+import glob
+import hashlib
+import json
+import os
+import threading
+
+
+class ModelArtifactCache(object):
+    """Files derived from model weights, like TensorRT engines and ONNX exports,
+    stored under a fingerprint of everything they were built from.
+
+    A fingerprint covers the contents of the source files and any parameters the
+    build depends on (input shape, precision, runtime versions), so a changed
+    input never picks up a stale artifact. Artifacts are written to a temporary
+    file and renamed into place, so a crash mid-build never leaves a broken file
+    behind, and only the max_per_kind most recently used of each kind are kept.
+    Builds run one at a time on daemon threads, so quitting never waits for a
+    TensorRT build to finish; its temporary file is cleared on the next start."""
+
+    _HASHES_NAME = 'source_hashes.json'
+    _CHUNK_SIZE = 1 << 20
+
+    def __init__(self, cache_dir, max_per_kind=2):
+        self._cache_dir = cache_dir
+        self._max_per_kind = max_per_kind
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._builds = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._remove_stale_files()
+
+    def _remove_stale_files(self):
+        # Left behind by builds of processes that quit or crashed mid-build
+        for tmp_path in glob.glob(os.path.join(self._cache_dir, '*.tmp-*')):
+            try:
+                pid = int(tmp_path.rsplit('.tmp-', 1)[1].split('-')[0])
+            except ValueError:
+                continue
+            if not _is_running(pid):
+                os.remove(tmp_path)
+
+    def _source_hash(self, path):
+        # Hashing the weights takes a while, so the hash is kept until their size or mtime changes
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        hashes_path = os.path.join(self._cache_dir, self._HASHES_NAME)
+        with self._lock:
+            try:
+                with open(hashes_path, 'r') as f:
+                    hashes = json.load(f)
+            except (OSError, ValueError):
+                hashes = {}
+
+        if key not in hashes:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(self._CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            with self._lock:
+                hashes = {name: value for name, value in hashes.items() if not name.startswith(f"{os.path.abspath(path)}:")}
+                hashes[key] = digest.hexdigest()
+                self._write_atomic(hashes_path, lambda tmp_path: _write_json(tmp_path, hashes))
+
+        return hashes[key]
+
+    def fingerprint(self, source_paths, **params):
+        """Hash of the contents of source_paths and of params, which must be JSON serialisable"""
+        digest = hashlib.sha256()
+        for path in source_paths:
+            digest.update(self._source_hash(path).encode())
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()[:16]
+
+    def path(self, kind, fingerprint, extension):
+        return os.path.join(self._cache_dir, f"{kind}-{fingerprint}{extension}")
+
+    def get(self, kind, fingerprint, extension):
+        """Path of the artifact, or None when it has not been built yet"""
+        path = self.path(kind, fingerprint, extension)
+        if not os.path.exists(path):
+            return None
+
+        # Marks it as recently used for eviction
+        os.utime(path)
+        return path
+
+    def latest(self, kind, extension):
+        """Most recently used artifact of kind, for when its sources are not available to fingerprint"""
+        paths = self._artifacts(kind, extension)
+        return paths[-1] if len(paths) > 0 else None
+
+    def build(self, kind, fingerprint, extension, build):
+        """Returns the artifact's path, calling build(tmp_path) to write it first if it
+        is not cached. Concurrent builds of the same artifact run only once."""
+        path = self.get(kind, fingerprint, extension)
+        if path is not None:
+            return path
+
+        return self.build_async(kind, fingerprint, extension, build).result()
+
+    def build_async(self, kind, fingerprint, extension, build):
+        """build() on a background thread; returns a future of the path"""
+        path = self.path(kind, fingerprint, extension)
+        with self._lock:
+            future = self._builds.get(path)
+            if future is None:
+                future = concurrent.futures.Future()
+                self._builds[path] = future
+                threading.Thread(target=self._build, args=(future, kind, extension, path, build),
+                                 name='model-cache', daemon=True).start()
+
+        return future
+
+    def _build(self, future, kind, extension, path, build):
+        try:
+            with self._build_lock:
+                if not os.path.exists(path):
+                    self._write_atomic(path, build)
+                self.evict(kind, extension)
+            future.set_result(path)
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._builds[path]
+
+    def _write_atomic(self, path, write):
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            write(tmp_path)
+            with open(tmp_path, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _artifacts(self, kind, extension):
+        paths = glob.glob(os.path.join(self._cache_dir, f"{kind}-*{extension}"))
+        return sorted(paths, key=os.path.getmtime)
+
+    def evict(self, kind, extension):
+        """Deletes all but the max_per_kind most recently used artifacts of kind"""
+        paths = self._artifacts(kind, extension)
+        for path in paths[:max(0, len(paths) - self._max_per_kind)]:
+            print(f"Evicting cached model {os.path.basename(path)}")
+            os.remove(path)
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _write_json(path, value):
+    with open(path, 'w') as f:
+        json.dump(value, f)
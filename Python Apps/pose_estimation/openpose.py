@@ -1,269 +1,284 @@
+import concurrent.futures
 import json
 import os
+import queue
 import time
-import cv2
 import numpy as np
-from PIL import Image
 
-import torch
-import trt_pose.models
-import torch2trt
-from torch2trt import TRTModule
-import torchvision.transforms as transforms
 from .draw_objects import DrawObjects
-from trt_pose.parse_objects import ParseObjects
 from .human_detection import HumanDetection
+from .detection_scheduler import DetectionScheduler
+from .inference_backends import POSE_IMAGE_WIDTH, POSE_IMAGE_HEIGHT, create_pose_backend
+from .person_crop import person_region
+from .preprocessing import PreprocessedFrame, as_preprocessed
+from .skeleton import Skeleton, SkeletonJoint, SkeletonLayout, SkeletonSegment, build_layout, build_skeletons, draw_skeletons
+from utilities.profiler import profiler
+from utilities.startup import startup
+
+# torch and trt_pose take seconds to import, so they are imported when an OpenPose is
+# created, on the thread that loads the pose model while the SSD loads on another
 
 
-class SkeletonSegment(object):
-    
-    def __init__(self,  x1,  y1,  x2,  y2,  joint_idx_1,  joint_idx_2,  colour,  name):
-        self.x1 = x1
-        self.y1 = y1
-        self.x2 = x2
-        self.y2 = y2
-        self.joint_idx_1 = joint_idx_1
-        self.joint_idx_2 = joint_idx_2
-        self.colour = colour
-        self.name = name
-        
-    
-class SkeletonJoint(object):
-    
-    def __init__(self,  x,  y,  name):
-        self.x = x
-        self.y = y
-        self.name = name
-        
-        
-class Skeleton(object):
-    
-    def __init__(self):
-        self._segments = []
-        self._joints = []
-        
-    def add_joint(self,  joint):
-        self._joints.append(joint)
-        
-    def add_segment(self, segment):
-        self._segments.append(segment)
-        
-    def get_joint(self,  name):
-        for joint in self._joints:
-            if joint is not None and joint.name == name:
-                return joint
-                
-    def draw(self, image):
-        height = image.shape[0]
-        width = image.shape[1]
-
-        for joint in self._joints:
-            if joint is None:
-                continue
-                
-            color = (0, 255, 0)
-            x = round(joint.x * width)
-            y = round(joint.y * height)
-            cv2.circle(image, (x, y), 3, color, 2)
-
-        for segment in self._segments:
-            if segment is None:
-                continue
-                
-            joint1 = self._joints[segment.joint_idx_1]
-            joint2 = self._joints[segment.joint_idx_2]
-            
-            x1 = round(joint1.x * width)
-            y1 = round(joint1.y * height)
-            x2 = round(joint2.x * width)
-            y2 = round(joint2.y * height)
-            cv2.line(image, (x1, y1), (x2, y2), segment.colour, 2)        
-        
-        
 def build_topology(coco_category):
     """Gets topology tensor from a COCO category
     """
-    skeleton = coco_category['skeleton']
-    keypoints = coco_category['keypoints']
-    K = len(skeleton)
+    import torch
+
+    layout = build_layout(coco_category)
+    K = len(layout.segment_names)
     topology_obj = {}
     
     topology = torch.zeros((K, 4)).int()
-    topology_names = []
-    topology_colors = []
-    color_r = 0
-    color_g = 0
-    color_b = 0
-    color_res = 100
     for k in range(K):
         topology[k][0] = 2 * k
         topology[k][1] = 2 * k + 1
-        topology[k][2] = skeleton[k][0] - 1
-        topology[k][3] = skeleton[k][1] - 1
-        
-        color_b += color_res
-        if color_b >= 255:
-            color_b = 0
-            color_g += color_res
-            if color_g >= 255:
-                color_g = 0
-                color_b = 0
-                color_r += color_res
-        topology_colors.append((color_r,  color_g,  color_b))
-        topology_names.append(f"{keypoints[topology[k][2]]}-{keypoints[topology[k][3]]}")
+        topology[k][2] = int(layout.segment_joints[k][0])
+        topology[k][3] = int(layout.segment_joints[k][1])
 
     topology_obj['topology'] = topology
-    topology_obj['segment_names'] = topology_names
-    topology_obj['segment_colours'] = topology_colors
+    topology_obj['segment_names'] = layout.segment_names
+    topology_obj['segment_colours'] = layout.segment_colours
     
-    topology_obj['joint_names'] = keypoints
+    topology_obj['joint_names'] = layout.joint_names
     
     return topology_obj
 
+def _split_batch(batch,  count):
+    """One future per item of the list the future batch resolves to"""
+    futures = [concurrent.futures.Future() for _ in range(count)]
+
+    def done(batch):
+        try:
+            results = batch.result()
+        except BaseException as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future, result in zip(futures,  results):
+            future.set_result(result)
+
+    batch.add_done_callback(done)
+    return futures
+
 class OpenPose():
     
-    _OPTIMIZED_MODEL_NAME = 'resnet18_baseline_att_224x224_A_epoch_249_trt.pth'
-    _IMAGE_WIDTH = 224
-    _IMAGE_HEIGHT = 224
-    
-    mean = torch.Tensor([0.485, 0.456, 0.406]).cuda()
-    std = torch.Tensor([0.229, 0.224, 0.225]).cuda()
-    device = torch.device('cuda')
+    _IMAGE_WIDTH = POSE_IMAGE_WIDTH
+    _IMAGE_HEIGHT = POSE_IMAGE_HEIGHT
+    _MAX_IN_FLIGHT = 2
+    # Margin around the person boxes, per side, when cropping to them
+    _CROP_PADDING = 0.15
+
+    def __init__(self,  model_folder,  detection_interval=1,  async_detection=False,  human_detector=None,
+                 backend='tensorrt',  detector_backend='tensorflow',  num_threads=None,  max_batch_size=1,
+                 crop_to_person=False):
+        """backend runs the pose model: 'tensorrt' on the Jetson GPU, 'onnxruntime' or 'opencv'
+        on the CPU. detector_backend runs the SSD: 'tensorflow' or 'opencv'. num_threads caps
+        the intra-op threads of the CPU runtimes. max_batch_size is the most cameras
+        detect_batch is called with; TensorRT builds its engine for it.
 
-    def __init__(self,  model_folder):
+        crop_to_person runs the model on a padded square crop around the tracked
+        people instead of the whole squashed frame, and skips it on frames with
+        nobody in them. The SSD then looks for people every detection_interval
+        frames while the frame is empty instead of every frame."""
         human_pose_path = os.path.join(model_folder,  'human_pose.json')
         with open(human_pose_path, 'r') as f:
             self._human_pose = json.load(f)
 
-            self._topology = build_topology(self._human_pose)
-            num_parts = len(self._human_pose['keypoints'])
-            num_links = len(self._human_pose['skeleton'])
-
-            model = trt_pose.models.resnet18_baseline_att(num_parts, 2 * num_links).cuda().eval()
-            MODEL_WEIGHTS = os.path.join(model_folder, 'resnet18_baseline_att_224x224_A_epoch_249.pth')
-
-            optimized_model_path = os.path.join(model_folder,  self._OPTIMIZED_MODEL_NAME)
-            if not os.path.exists(optimized_model_path):
-                print("Converting Torch OpenPose model to TFRT")
-                model.load_state_dict(torch.load(MODEL_WEIGHTS))    
-                
-                data = torch.zeros((1, 3, self._IMAGE_HEIGHT, self._IMAGE_WIDTH)).cuda()
-                model_trt = torch2trt.torch2trt(model, [data], fp16_mode=True, max_workspace_size=1<<25)
-                torch.save(model_trt.state_dict(), optimized_model_path)
-                
-            print("Loading TFRT OpenPose model")
-
-            self._model_trt = TRTModule()
-            self._model_trt.load_state_dict(torch.load(optimized_model_path))
-            
-            self._parse_objects = ParseObjects(self._topology['topology'])
-            self._draw_objects = DrawObjects(self._topology)
-
-            self._human_detector = HumanDetection()
-            
-    def _preprocess(self,  image):
-        global device
-        device = torch.device('cuda')
-        image = transforms.functional.to_tensor(image).to(device)
-        image.sub_(self.mean[:, None, None]).div_(self.std[:, None, None])
-        return image[None, ...]
-        
+            self.skeleton_layout = build_layout(self._human_pose)
+            self._draw_objects = DrawObjects(self.skeleton_layout)
+
+            # The pose model and the SSD do not depend on each other, so they load side by side
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2,  thread_name_prefix='model-loader') as loader:
+                pose_loaded = loader.submit(self._load_pose_model,  backend,  model_folder,  num_threads,  max_batch_size)
+                if human_detector is None:
+                    human_detector = loader.submit(self._load_human_detector,  detector_backend,  model_folder,  num_threads).result()
+                pose_loaded.result()
+            self._human_detector = human_detector
+            self.last_detected_humans = []
+            self._crop_to_person = crop_to_person
+            self.detection_scheduler = DetectionScheduler(self._human_detector,  interval=detection_interval,  async_detection=async_detection,
+                                                          redetect_when_empty=not crop_to_person)
+            # detect_batch tracks each camera's boxes separately and runs their detections together
+            self._detection_interval = detection_interval
+            self._source_schedulers = []
+            self._batch_detection_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1) if async_detection else None
+
+            # Output buffer slots of the frames in flight, and the worker that parses them in order
+            self._free_slots = queue.Queue()
+            for slot in range(self._MAX_IN_FLIGHT):
+                self._free_slots.put(slot)
+            self._parse_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def _load_pose_model(self,  backend,  model_folder,  num_threads,  max_batch_size):
+        with startup.span('import torch'):
+            import torch
+            from trt_pose.parse_objects import ParseObjects
+
+        self._torch = torch
+        self._topology = build_topology(self._human_pose)
+        self._parse_objects = ParseObjects(self._topology['topology'])
+
+        num_parts = len(self._human_pose['keypoints'])
+        num_links = len(self._human_pose['skeleton'])
+        with startup.span(f"load pose model ({backend})"):
+            self._backend = create_pose_backend(backend,  model_folder,  num_parts,  num_links,  num_threads,  max_batch_size)
+
+    def _load_human_detector(self,  detector_backend,  model_folder,  num_threads):
+        with startup.span(f"load person detector ({detector_backend})"):
+            return HumanDetection(detector_backend,  os.path.join(model_folder,  'ssd'),  num_threads)
+
+    def warm_up(self):
+        """Runs a blank frame through the pose model and the SSD, so CUDA kernels,
+        TensorRT and TensorFlow's lazy set up and the host buffers are ready
+        before the first camera frame. The trackers are left untouched."""
+        with startup.span('warm up models'):
+            frame = PreprocessedFrame(np.zeros((self._IMAGE_HEIGHT, self._IMAGE_WIDTH, 3), dtype=np.uint8))
+            slot = self._free_slots.get()
+            try:
+                self._backend.submit([frame],  slot).wait()
+            finally:
+                self._free_slots.put(slot)
+            self._human_detector.detect_with_scores(frame)
+
     def benchmark(self):
-        data = torch.zeros((1, 3, self._IMAGE_HEIGHT, self._IMAGE_WIDTH)).cuda()        
+        image = np.zeros((self._IMAGE_HEIGHT, self._IMAGE_WIDTH, 3), dtype=np.uint8)
+        self._backend.infer(PreprocessedFrame(image))
         t0 = time.time()
-        torch.cuda.current_stream().synchronize()
         for i in range(50):
-            y = self._model_trt(data)
-            
-        torch.cuda.current_stream().synchronize()
+            self._backend.infer(PreprocessedFrame(image))
         t1 = time.time()
 
         print(f"OpenPose FPS={50.0 / (t1 - t0)}")
 
-    def _in_detected_humans(self, x, y, detected_humans):
-        for entry in detected_humans:
-            x1 = entry[0]
-            y1 = entry[1]
-            x2 = entry[2]
-            y2 = entry[3]
-            if x1 <= x <= x2 and y1 <= y <= y2:
-                return True
-
-        return False
-
-    def _construct_skeletons(self, object_counts, objects, normalized_peaks, detected_humans):
-        topology = self._topology['topology']
-        topology_segment_names = self._topology['segment_names']
-        topology_joint_names = self._topology['joint_names']
-        topology_segment_colours = self._topology['segment_colours']        
-
-        skeletons = []
-        K = topology.shape[0]
-        count = int(object_counts[0])
-        for i in range(count):
-            obj = objects[0][i]
-            skeleton = Skeleton()
-            skeletons.append(skeleton)
-            
-            C = obj.shape[0]
-            for j in range(C):
-                k = int(obj[j])
-                if k >= 0:
-                    peak = normalized_peaks[0][j][k]
-                    x = float(peak[1])
-                    y = float(peak[0])
-                    if self._in_detected_humans(x, y, detected_humans):
-                        joint = SkeletonJoint(x,  y,  topology_joint_names[j])
-                        skeleton.add_joint(joint)
-                    else:
-                        skeleton.add_joint(None)
-                else:
-                    skeleton.add_joint(None)
-                    
-            for k in range(K):
-                c_a = topology[k][2]
-                c_b = topology[k][3]
-                if obj[c_a] >= 0 and obj[c_b] >= 0:
-                    peak0 = normalized_peaks[0][c_a][obj[c_a]]
-                    peak1 = normalized_peaks[0][c_b][obj[c_b]]
-                    x0 = float(peak0[1])
-                    y0 = float(peak0[0])
-                    x1 = float(peak1[1])
-                    y1 = float(peak1[0])
-                    if self._in_detected_humans(x0, y0, detected_humans) and self._in_detected_humans(x1, y1, detected_humans):
-                        color = topology_segment_colours[k]
-                        segment = SkeletonSegment(x0,  y0,  x1,  y1,  c_a,  c_b,  color,  topology_segment_names[k])
-                        skeleton.add_segment(segment)
-                    else:
-                        skeleton.add_segment(None)
-                else:
-                    skeleton.add_segment(None)
-        
-        return skeletons
+    def _construct_skeletons(self, object_counts, objects, normalized_peaks, detected_humans, region=None):
+        return build_skeletons(self.skeleton_layout, object_counts, objects, normalized_peaks, detected_humans, region)
         
     def detect(self,  image,  return_annotated_image=False):
-        np_img = cv2.resize(image,  (self._IMAGE_WIDTH,  self._IMAGE_HEIGHT))
-        
+        """image is a BGR frame or a PreprocessedFrame shared with other consumers"""
+        return self.detect_async(image,  return_annotated_image).result()
+
+    def detect_async(self,  image,  return_annotated_image=False):
+        """Queues inference for image and returns a future of (skeletons, annot_image).
+
+        The device-to-host copy, ParseObjects and skeleton building run on a worker
+        thread, so the caller can submit the next frame while this one is parsed.
+        Two frames are in flight at most; a third submit waits for a free slot.
+        The frame must stay valid until the future is done."""
+        frame = as_preprocessed(image)
+
+        # Kick off the SSD first so it can run alongside pose inference when asynchronous
+        with profiler.stage('ssd'):
+            detection = self.detection_scheduler.begin_frame(frame)
+
         # Block 15% from each side
         #block_width = int(self._IMAGE_WIDTH * 0.15)
-        
+
         #cv2.rectangle(np_img,  (0,  0),  (block_width,  self._IMAGE_HEIGHT),  (0,  0,  0),  cv2.FILLED)
         #cv2.rectangle(np_img,  (self._IMAGE_WIDTH - block_width,  0),  (self._IMAGE_WIDTH,  self._IMAGE_HEIGHT),  (0,  0,  0),  cv2.FILLED)
-        
-        data = self._preprocess(np_img)
-        cmap, paf = self._model_trt(data)
-        cmap, paf = cmap.detach().cpu(), paf.detach().cpu()
-        counts, objects, peaks = self._parse_objects(cmap, paf)#, cmap_threshold=0.15, link_threshold=0.15)
-                
-        detected_humans = self._human_detector.detect(image)
-        skeletons = self._construct_skeletons(counts, objects, peaks, detected_humans)
-
-        annot_image = None
-
-        if return_annotated_image:
-            for skeleton in skeletons:
-                annot_image = cv2.resize(image,  (224,  224))
-                skeleton.draw(annot_image)
-                    
-        return skeletons, annot_image
 
+        return self._submit([frame],  [self.detection_scheduler],  [detection],  return_annotated_image,  single=True)
+
+    def detect_batch(self,  images,  return_annotated_image=False):
+        return self.detect_batch_async(images,  return_annotated_image).result()
+
+    def detect_batch_async(self,  images,  return_annotated_image=False):
+        """detect_async for one frame from each of several cameras, in a single forward
+        pass of the pose model and a single detector call for the cameras due a
+        detection. Image i always belongs to camera i, whose person boxes are tracked
+        by their own scheduler. Returns a future of [(skeletons, annot_image)]."""
+        frames = [as_preprocessed(image) for image in images]
+        while len(self._source_schedulers) < len(frames):
+            self._source_schedulers.append(DetectionScheduler(self._human_detector,  interval=self._detection_interval,
+                                                              redetect_when_empty=not self._crop_to_person))
+        schedulers = self._source_schedulers[:len(frames)]
+
+        with profiler.stage('ssd'):
+            due = [idx for idx, scheduler in enumerate(schedulers) if scheduler.claim_detection()]
+            detections = [None] * len(frames)
+            if len(due) > 0:
+                due_frames = [frames[idx] for idx in due]
+                if self._batch_detection_executor is not None:
+                    batch = self._batch_detection_executor.submit(self._human_detector.detect_batch_with_scores,  due_frames)
+                else:
+                    batch = concurrent.futures.Future()
+                    batch.set_result(self._human_detector.detect_batch_with_scores(due_frames))
+                for idx, detection in zip(due,  _split_batch(batch,  len(due))):
+                    detections[idx] = detection
+
+        return self._submit(frames,  schedulers,  detections,  return_annotated_image)
+
+    def _submit(self,  frames,  schedulers,  detections,  return_annotated_image,  single=False):
+        """detections holds each frame's own detection from its scheduler, a future or
+        None, which _parse adopts in frame order before tracking the frame's skeletons"""
+        regions = [None] * len(frames)
+        inferred = list(range(len(frames)))
+        if self._crop_to_person:
+            # The crops need the boxes before inference, so a frame's own detection cannot
+            # overlap it here. Nothing is adopted yet, that is left to _parse
+            with profiler.stage('ssd_wait'):
+                boxes = [scheduler.current_boxes(detection) for scheduler, detection in zip(schedulers,  detections)]
+            regions = [person_region(frame_boxes,  frame.image.shape[1],  frame.image.shape[0],  self._CROP_PADDING)
+                       for frame, frame_boxes in zip(frames,  boxes)]
+            # Frames with nobody in them skip the model altogether
+            inferred = [idx for idx, region in enumerate(regions) if region is not None]
+
+        slot = None
+        output = None
+        if len(inferred) > 0:
+            with profiler.stage('resize'):
+                inputs = [self._model_input(frames[idx],  regions[idx]) for idx in inferred]
+            slot = self._free_slots.get()
+            try:
+                output = self._backend.submit(inputs,  slot)
+            except:
+                self._free_slots.put(slot)
+                raise
+
+        args = (frames,  schedulers,  detections,  regions,  inferred,  slot,  output,  return_annotated_image)
+        if single:
+            return self._parse_executor.submit(lambda: self._parse(*args)[0])
+        return self._parse_executor.submit(self._parse,  *args)
+
+    def _model_input(self,  frame,  region):
+        if region is None:
+            frame.resized(self._IMAGE_WIDTH,  self._IMAGE_HEIGHT)
+            return frame
+
+        return PreprocessedFrame(region.crop(frame.image,  self._IMAGE_WIDTH,  self._IMAGE_HEIGHT))
+
+    def _parse(self,  frames,  schedulers,  detections,  regions,  inferred,  slot,  output,  return_annotated_image):
+        parsed = {}
+        if output is not None:
+            try:
+                with profiler.stage('device_to_host'):
+                    cmap, paf = output.wait()
+                with profiler.stage('parse_objects'):
+                    for row, idx in enumerate(inferred):
+                        parsed[idx] = self._parse_objects(self._torch.from_numpy(cmap[row:row + 1]), self._torch.from_numpy(paf[row:row + 1]))#, cmap_threshold=0.15, link_threshold=0.15)
+            finally:
+                # ParseObjects copies what it needs, the slot's host buffers can take the next frame
+                self._free_slots.put(slot)
+
+        results = []
+        for idx, (frame, scheduler, detection) in enumerate(zip(frames,  schedulers,  detections)):
+            with profiler.stage('ssd_wait'):
+                # This frame's own detection, or the boxes tracked up to the frame before it
+                detected_humans = scheduler.boxes_for(detection)
+                self.last_detected_humans = detected_humans
+            with profiler.stage('skeleton_build'):
+                skeletons = []
+                if idx in parsed:
+                    counts, objects, peaks = parsed[idx]
+                    skeletons = self._construct_skeletons(counts, objects, peaks, detected_humans, regions[idx])
+                scheduler.track(skeletons)
+
+            annot_image = None
+
+            if return_annotated_image:
+                # Drawn on a copy of the model input so the frame itself stays untouched
+                annot_image = frame.resized(self._IMAGE_WIDTH,  self._IMAGE_HEIGHT).copy()
+                draw_skeletons(annot_image,  skeletons)
+
+            results.append((skeletons,  annot_image))
+
+        return results
@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+
+
+class CropRegion(object):
+    """A square part of the frame, in whole pixels, that is scaled to the model
+    input. It may reach past the frame edges, which are filled with black."""
+
+    def __init__(self,  x1,  y1,  size,  frame_width,  frame_height):
+        self.x1 = x1
+        self.y1 = y1
+        self.size = size
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+
+    def crop(self,  image,  width,  height):
+        """The region of image scaled to width x height without the aspect ratio
+        of the person changing. Only the part inside the frame is resized, the
+        rest is left black."""
+        x1, y1 = max(0,  self.x1),  max(0,  self.y1)
+        x2, y2 = min(self.frame_width,  self.x1 + self.size),  min(self.frame_height,  self.y1 + self.size)
+        if x1 == self.x1 and y1 == self.y1 and x2 - x1 == self.size and y2 - y1 == self.size:
+            return cv2.resize(image[y1:y2, x1:x2],  (width,  height))
+
+        scale_x = width / self.size
+        scale_y = height / self.size
+        left, top = int(round((x1 - self.x1) * scale_x)),  int(round((y1 - self.y1) * scale_y))
+        inner_width = min(width - left,  int(round((x2 - x1) * scale_x)))
+        inner_height = min(height - top,  int(round((y2 - y1) * scale_y)))
+        crop = np.zeros((height,  width) + image.shape[2:],  dtype=image.dtype)
+        crop[top:top + inner_height, left:left + inner_width] = cv2.resize(image[y1:y2, x1:x2],  (inner_width,  inner_height))
+        return crop
+
+    def to_frame(self,  points):
+        """Maps normalised (x, y) points of the crop to normalised frame coordinates"""
+        points = np.asarray(points,  dtype=np.float32)
+        origin = np.array([self.x1 / self.frame_width,  self.y1 / self.frame_height],  dtype=np.float32)
+        scale = np.array([self.size / self.frame_width,  self.size / self.frame_height],  dtype=np.float32)
+        return points * scale + origin
+
+    def box(self):
+        """The region as a normalised (x1, y1, x2, y2) box"""
+        return [self.x1 / self.frame_width,  self.y1 / self.frame_height,
+                (self.x1 + self.size) / self.frame_width,  (self.y1 + self.size) / self.frame_height]
+
+
+def person_region(boxes,  frame_width,  frame_height,  padding=0.15,  min_size=0.25):
+    """The square region around every normalised person box plus padding on each
+    side, or None when there are no boxes. It is kept inside the frame where it
+    fits, never smaller than min_size of the frame's shorter side so a distant
+    child is not blown up past what the model was trained on, and never larger
+    than the frame's longer side."""
+    if len(boxes) == 0:
+        return None
+
+    boxes = np.asarray(boxes,  dtype=np.float32).reshape(-1, 4) * (frame_width,  frame_height,  frame_width,  frame_height)
+    x1, y1 = boxes[:, :2].min(axis=0)
+    x2, y2 = boxes[:, 2:].max(axis=0)
+
+    size = max(x2 - x1,  y2 - y1) * (1.0 + 2.0 * padding)
+    size = int(round(np.clip(size,  min_size * min(frame_width,  frame_height),  max(frame_width,  frame_height))))
+
+    def place(centre,  extent):
+        # Shifted back inside the frame, or centred on it when it is wider than the frame
+        if size > extent:
+            return (extent - size) // 2
+        return min(max(0,  int(round(centre - size / 2.0))),  extent - size)
+
+    return CropRegion(place((x1 + x2) / 2.0,  frame_width),  place((y1 + y2) / 2.0,  frame_height),  size,
+                      frame_width,  frame_height)
@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+
+
+class PreprocessedFrame(object):
+    """One captured frame plus every representation derived from it.
+
+    Each representation is built the first time a consumer asks for it and then
+    shared, so OpenPose, the SSD and the preview never resize or convert the same
+    frame twice. Consumers running on other threads only ever ask for different
+    representations, so no locking is needed."""
+
+    def __init__(self,  image):
+        self.image = image
+        self._cache = {}
+        self.num_built = 0
+        self.num_reused = 0
+
+    def get(self,  name,  build):
+        """Returns the representation called name, building it with build(self) on first use"""
+        value = self._cache.get(name)
+        if value is None:
+            value = build(self)
+            self._cache[name] = value
+            self.num_built += 1
+        else:
+            self.num_reused += 1
+
+        return value
+
+    def resized(self,  width,  height):
+        """The frame at width x height. Frames already at that size, like the 224x224
+        USB camera output, are returned as they are."""
+        if self.image.shape[1] == width and self.image.shape[0] == height:
+            return self.image
+
+        return self.get(('resized',  width,  height),
+                        lambda frame: cv2.resize(frame.image,  (width,  height)))
+
+    def batched(self):
+        """The full frame as a (1, H, W, 3) view for detectors that take a batch"""
+        return self.get('batched',  lambda frame: frame.image[np.newaxis, ...])
+
+
+def as_preprocessed(image):
+    return image if isinstance(image,  PreprocessedFrame) else PreprocessedFrame(image)
@@ -0,0 +1,224 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+
+class SkeletonLayout(object):
+    """Joint and segment tables shared by every Skeleton built from the same topology"""
+
+    def __init__(self,  joint_names,  segment_joints,  segment_names,  segment_colours):
+        self.joint_names = list(joint_names)
+        self.joint_index = {name: idx for idx, name in enumerate(self.joint_names)}
+        self.segment_joints = np.asarray(segment_joints,  dtype=np.int32).reshape(-1, 2)
+        self.segment_names = list(segment_names)
+        self.segment_colours = list(segment_colours)
+        # Segments sharing a colour, so they are drawn with a single polylines call
+        colours = {}
+        for idx, colour in enumerate(self.segment_colours):
+            colours.setdefault(tuple(colour),  []).append(idx)
+        self.colour_groups = [(colour,  np.array(indices)) for colour, indices in colours.items()]
+
+    def num_joints(self):
+        return len(self.joint_names)
+
+
+class SkeletonJoint(object):
+    """Attribute view onto one row of a Skeleton's joint array"""
+
+    __slots__ = ('_skeleton',  '_idx')
+
+    def __init__(self,  skeleton,  idx):
+        self._skeleton = skeleton
+        self._idx = idx
+
+    @property
+    def x(self):
+        return float(self._skeleton.joints[self._idx, 0])
+
+    @x.setter
+    def x(self,  value):
+        self._skeleton.joints[self._idx, 0] = value
+
+    @property
+    def y(self):
+        return float(self._skeleton.joints[self._idx, 1])
+
+    @y.setter
+    def y(self,  value):
+        self._skeleton.joints[self._idx, 1] = value
+
+    @property
+    def name(self):
+        return self._skeleton.layout.joint_names[self._idx]
+
+
+class SkeletonSegment(object):
+    """Attribute view onto one segment of a Skeleton"""
+
+    __slots__ = ('_skeleton',  '_idx')
+
+    def __init__(self,  skeleton,  idx):
+        self._skeleton = skeleton
+        self._idx = idx
+
+    @property
+    def joint_idx_1(self):
+        return int(self._skeleton.layout.segment_joints[self._idx, 0])
+
+    @property
+    def joint_idx_2(self):
+        return int(self._skeleton.layout.segment_joints[self._idx, 1])
+
+    @property
+    def x1(self):
+        return float(self._skeleton.joints[self.joint_idx_1, 0])
+
+    @property
+    def y1(self):
+        return float(self._skeleton.joints[self.joint_idx_1, 1])
+
+    @property
+    def x2(self):
+        return float(self._skeleton.joints[self.joint_idx_2, 0])
+
+    @property
+    def y2(self):
+        return float(self._skeleton.joints[self.joint_idx_2, 1])
+
+    @property
+    def colour(self):
+        return self._skeleton.layout.segment_colours[self._idx]
+
+    @property
+    def name(self):
+        return self._skeleton.layout.segment_names[self._idx]
+
+
+class Skeleton(object):
+    """One person's joints as a (K, 2) float32 array of normalised (x, y) and a
+    validity mask, both indexed by the shared SkeletonLayout"""
+
+    def __init__(self,  layout,  joints=None,  valid=None):
+        self.layout = layout
+        num_joints = layout.num_joints()
+        self.joints = np.zeros((num_joints, 2),  dtype=np.float32) if joints is None else joints
+        self.valid = np.zeros(num_joints,  dtype=bool) if valid is None else valid
+
+    def joint_index(self,  name):
+        return self.layout.joint_index[name]
+
+    def get_joint(self,  name):
+        idx = self.layout.joint_index.get(name)
+        if idx is None or not self.valid[idx]:
+            return None
+
+        return SkeletonJoint(self,  idx)
+
+    def get_joints(self):
+        return [SkeletonJoint(self,  idx) for idx in np.flatnonzero(self.valid)]
+
+    def segment_valid(self):
+        segment_joints = self.layout.segment_joints
+        return self.valid[segment_joints[:, 0]] & self.valid[segment_joints[:, 1]]
+
+    def get_segments(self):
+        return [SkeletonSegment(self,  idx) for idx in np.flatnonzero(self.segment_valid())]
+
+    def draw(self, image):
+        draw_skeletons(image,  [self])
+
+
+JOINT_COLOUR = (0, 255, 0)
+
+
+def draw_skeletons(image,  skeletons):
+    """Draws every skeleton onto image with one cv2.polylines call for all the
+    joints and one per segment colour, however many people there are"""
+    if len(skeletons) == 0:
+        return
+
+    layout = skeletons[0].layout
+    height = image.shape[0]
+    width = image.shape[1]
+    points = np.rint(np.stack([skeleton.joints for skeleton in skeletons]) * (width, height)).astype(np.int32)
+    valid = np.stack([skeleton.valid for skeleton in skeletons])
+
+    # Joints as zero length lines, which polylines draws as round dots
+    dots = points[valid]
+    if len(dots) > 0:
+        cv2.polylines(image,  list(np.repeat(dots[:, None], 2, axis=1)),  False,  JOINT_COLOUR,  6)
+
+    segment_joints = layout.segment_joints
+    lines = points[:, segment_joints]
+    segment_valid = valid[:, segment_joints[:, 0]] & valid[:, segment_joints[:, 1]]
+    for colour, indices in layout.colour_groups:
+        segments = lines[:, indices][segment_valid[:, indices]]
+        if len(segments) > 0:
+            cv2.polylines(image,  list(segments),  False,  colour,  2)
+
+
+def build_layout(coco_category):
+    """Gets the joint and segment tables from a COCO category
+    """
+    skeleton = coco_category['skeleton']
+    keypoints = coco_category['keypoints']
+    K = len(skeleton)
+
+    segment_joints = []
+    segment_names = []
+    segment_colours = []
+    color_r = 0
+    color_g = 0
+    color_b = 0
+    color_res = 100
+    for k in range(K):
+        joint_a = skeleton[k][0] - 1
+        joint_b = skeleton[k][1] - 1
+        segment_joints.append((joint_a,  joint_b))
+
+        color_b += color_res
+        if color_b >= 255:
+            color_b = 0
+            color_g += color_res
+            if color_g >= 255:
+                color_g = 0
+                color_b = 0
+                color_r += color_res
+        segment_colours.append((color_r,  color_g,  color_b))
+        segment_names.append(f"{keypoints[joint_a]}-{keypoints[joint_b]}")
+
+    return SkeletonLayout(keypoints,  segment_joints,  segment_names,  segment_colours)
+
+
+def load_layout(model_folder):
+    with open(os.path.join(model_folder,  'human_pose.json'),  'r') as f:
+        return build_layout(json.load(f))
+
+
+def build_skeletons(layout,  object_counts,  objects,  normalized_peaks,  detected_humans,  region=None):
+    """Builds skeletons from the ParseObjects output in one pass. A joint is only
+    valid when it lies inside at least one detected human box. When the model ran
+    on a CropRegion of the frame the joints are mapped back to the whole frame."""
+    count = int(object_counts[0])
+    if count == 0:
+        return []
+
+    obj = np.asarray(objects[0])[:count].astype(np.int64)
+    peaks = np.asarray(normalized_peaks[0])
+    present = obj >= 0
+
+    # Gather the (y, x) peak of every part of every object, then swap to (x, y)
+    part_idx = np.arange(obj.shape[1])[None, :]
+    points = peaks[part_idx, np.where(present, obj, 0)][..., ::-1].astype(np.float32)
+    if region is not None:
+        points = region.to_frame(points)
+
+    boxes = np.asarray(detected_humans,  dtype=np.float32).reshape(-1, 4)
+    x = points[..., 0, None]
+    y = points[..., 1, None]
+    in_box = (boxes[:, 0] <= x) & (x <= boxes[:, 2]) & (boxes[:, 1] <= y) & (y <= boxes[:, 3])
+    valid = present & in_box.any(axis=-1)
+
+    return [Skeleton(layout,  points[i],  valid[i]) for i in range(count)]
@@ -0,0 +1,95 @@
+import concurrent.futures
+import math
+
+import numpy as np
+
+from .preprocessing import as_preprocessed
+from .skeleton import Skeleton, load_layout
+from recording.skeleton_stream import SkeletonReader
+
+
+class StubHumanDetection(object):
+    """Stands in for HumanDetection without TensorFlow: one box covering the whole frame"""
+
+    def detect(self, image):
+        boxes, _ = self.detect_with_scores(image)
+        return boxes
+
+    def detect_with_scores(self, image):
+        return [[0.0, 0.0, 1.0, 1.0]], [1.0]
+
+    def detect_batch_with_scores(self, images):
+        return [self.detect_with_scores(image) for image in images]
+
+
+class StubPoseEstimator(object):
+    """Stands in for OpenPose on machines without CUDA. Does the same resize as the
+    real model input, then returns a synthetic player flapping their arms and
+    jumping, so MotionController and the send path get realistic input."""
+
+    _IMAGE_WIDTH = 224
+    _IMAGE_HEIGHT = 224
+    _FLAP_PERIOD_FRAMES = 30
+    _JUMP_PERIOD_FRAMES = 150
+    _JUMP_FRAMES = 6
+    _STANDING_POSE = {
+        'nose': (0.50, 0.20), 'left_eye': (0.52, 0.18), 'right_eye': (0.48, 0.18),
+        'left_ear': (0.54, 0.19), 'right_ear': (0.46, 0.19), 'neck': (0.50, 0.30),
+        'left_shoulder': (0.58, 0.30), 'right_shoulder': (0.42, 0.30),
+        'left_elbow': (0.68, 0.32), 'right_elbow': (0.32, 0.32),
+        'left_wrist': (0.78, 0.34), 'right_wrist': (0.22, 0.34),
+        'left_hip': (0.55, 0.55), 'right_hip': (0.45, 0.55),
+        'left_knee': (0.55, 0.72), 'right_knee': (0.45, 0.72),
+        'left_ankle': (0.55, 0.90), 'right_ankle': (0.45, 0.90),
+    }
+
+    def __init__(self, model_folder):
+        self._layout = load_layout(model_folder)
+        self._standing = np.array([self._STANDING_POSE[name] for name in self._layout.joint_names], dtype=np.float32)
+        self._arms = np.array([self._layout.joint_index[name] for name in ('left_elbow', 'left_wrist')])
+        self._mirrored_arms = np.array([self._layout.joint_index[name] for name in ('right_elbow', 'right_wrist')])
+        self._num_frames = 0
+
+    def detect(self, image, return_annotated_image=False):
+        frame = as_preprocessed(image)
+        np_img = frame.resized(self._IMAGE_WIDTH, self._IMAGE_HEIGHT)
+        self._num_frames += 1
+
+        joints = self._standing.copy()
+        flap = 0.1 * math.sin(2.0 * math.pi * self._num_frames / self._FLAP_PERIOD_FRAMES)
+        joints[self._arms, 1] += flap
+        joints[self._mirrored_arms, 1] += flap
+        if self._num_frames % self._JUMP_PERIOD_FRAMES < self._JUMP_FRAMES:
+            joints[:, 1] -= 0.15
+
+        skeleton = Skeleton(self._layout, joints, np.ones(len(joints), dtype=bool))
+
+        annot_image = None
+        if return_annotated_image:
+            annot_image = np_img.copy()
+            skeleton.draw(annot_image)
+
+        return [skeleton], annot_image
+
+    def detect_batch(self, images, return_annotated_image=False):
+        return [self.detect(image, return_annotated_image) for image in images]
+
+    def detect_batch_async(self, images, return_annotated_image=False):
+        future = concurrent.futures.Future()
+        future.set_result(self.detect_batch(images, return_annotated_image))
+        return future
+
+
+class RecordedPoseEstimator(object):
+    """Replays skeletons saved by a SkeletonRecorder, looping at the end, so the
+    rest of the pipeline can be measured on recorded model output"""
+
+    def __init__(self, path):
+        self._reader = SkeletonReader(path)
+        self._num_frames = 0
+
+    def detect(self, image, return_annotated_image=False):
+        frame = self._num_frames % len(self._reader)
+        self._num_frames += 1
+
+        return self._reader.skeletons(frame), None
@@ -0,0 +1,78 @@
+from pose_estimation.inference_backends import preprocess_pose_on_host
+from pose_estimation.preprocessing import PreprocessedFrame
+
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+
+POSE_SIZE = (224,  224)
+MEAN = np.array([0.485,  0.456,  0.406],  dtype=np.float32)
+STD = np.array([0.229,  0.224,  0.225],  dtype=np.float32)
+
+
+def legacy_preprocess(image):
+    # Work per frame before the shared cache: OpenPose resized the frame, to_tensor
+    # made a float CHW copy of it and the mean and std were applied in two passes,
+    # the SSD copied the whole frame into tf.constant and the preview resized the
+    # frame again
+    np_img = cv2.resize(image,  POSE_SIZE)
+    pose_input = np.ascontiguousarray(np_img.transpose(2, 0, 1),  dtype=np.float32) / 255.0
+    pose_input -= MEAN[:, None, None]
+    pose_input /= STD[:, None, None]
+    ssd_input = np.array(np.asarray(image).reshape([1, image.shape[0], image.shape[1], image.shape[2]]))
+    annot_image = cv2.resize(image,  POSE_SIZE)
+    return pose_input[None, ...],  ssd_input,  annot_image
+
+
+def shared_preprocess(image):
+    # The same consumers and the same normalised float input through one PreprocessedFrame:
+    # one resize, one folded multiply-subtract and the preview copies the resized frame.
+    # On the Jetson the normalisation runs on the GPU instead; it is counted here on the
+    # host so both sides do the same work
+    frame = PreprocessedFrame(image)
+    pose_input = frame.get('pose_input',  preprocess_pose_on_host)
+    ssd_input = frame.get('ssd_input',  lambda frame: np.array(frame.batched()))
+    annot_image = frame.resized(*POSE_SIZE).copy()
+    return pose_input,  ssd_input,  annot_image
+
+
+def measure(preprocess,  image,  num_frames):
+    preprocess(image)
+    t0 = time.perf_counter()
+    for _ in range(num_frames):
+        preprocess(image)
+    elapsed_s = time.perf_counter() - t0
+
+    tracemalloc.start()
+    preprocess(image)
+    _,  peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed_s * 1e6 / num_frames,  peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares per-frame preprocessing before and after the shared PreprocessedFrame cache')
+    parser.add_argument('--frames',  type=int,  default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # The USB camera already delivers 224x224, offline videos arrive at full size
+    for width, height in ((224, 224), (640, 480)):
+        image = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        legacy_us,  legacy_bytes = measure(legacy_preprocess,  image,  args.frames)
+        shared_us,  shared_bytes = measure(shared_preprocess,  image,  args.frames)
+        print(f"{width}x{height}: legacy {legacy_us:.0f}us {legacy_bytes / 1024:.0f} KB, "
+              f"shared {shared_us:.0f}us {shared_bytes / 1024:.0f} KB per frame "
+              f"({legacy_us / shared_us:.1f}x faster, {(shared_bytes - legacy_bytes) / 1024:+.0f} KB)")
+
+    # What the TensorRT backend uploads per frame: the legacy float tensor, or the uint8 image it normalises on the GPU
+    print(f"GPU upload: legacy {POSE_SIZE[0] * POSE_SIZE[1] * 3 * 4 / 1024:.0f} KB float32, shared {POSE_SIZE[0] * POSE_SIZE[1] * 3 / 1024:.0f} KB uint8 per frame")
+
+
+if __name__ == '__main__':
+    main()
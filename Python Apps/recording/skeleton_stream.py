@@ -0,0 +1,125 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from pose_estimation.skeleton import Skeleton, build_layout
+
+
+_MAGIC = b'GSKL'
+_VERSION = 1
+# magic, version, max skeletons, max boxes, layout JSON length
+_HEADER = struct.Struct('<4sHHHI')
+
+
+def _record_dtype(num_joints, max_skeletons, max_boxes):
+    return np.dtype([
+        ('timestamp', '<f8'),
+        ('num_skeletons', 'u1'),
+        ('num_boxes', 'u1'),
+        ('joints', '<f4', (max_skeletons, num_joints, 2)),
+        ('valid', '?', (max_skeletons, num_joints)),
+        ('boxes', '<f4', (max_boxes, 4)),
+    ])
+
+
+class SkeletonRecorder(object):
+    """Appends each frame's skeletons, validity masks, timestamp and detection boxes
+    to a binary file of fixed-size records, so SkeletonReader can memory-map it.
+    Frames with more skeletons or boxes than the file was created for are truncated."""
+
+    def __init__(self, path, layout, max_skeletons=4, max_boxes=4):
+        self._layout = layout
+        self._max_skeletons = max_skeletons
+        self._max_boxes = max_boxes
+        self._dtype = _record_dtype(layout.num_joints(), max_skeletons, max_boxes)
+        self._record = np.zeros(1, dtype=self._dtype)
+        self.num_frames = 0
+
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not is_new:
+            reader = SkeletonReader(path)
+            if reader.dtype != self._dtype or reader.layout.joint_names != layout.joint_names:
+                raise RuntimeError(f"{path} was recorded with a different layout")
+
+        self._f = open(path, 'ab')
+        if is_new:
+            # The COCO category is stored so the reader can rebuild the same layout
+            category = json.dumps({
+                'keypoints': layout.joint_names,
+                'skeleton': (layout.segment_joints + 1).tolist(),
+            }).encode()
+            self._f.write(_HEADER.pack(_MAGIC, _VERSION, max_skeletons, max_boxes, len(category)) + category)
+
+    def record(self, timestamp, skeletons, boxes=()):
+        record = self._record[0]
+        record['timestamp'] = timestamp
+        num_skeletons = min(len(skeletons), self._max_skeletons)
+        record['num_skeletons'] = num_skeletons
+        record['joints'] = 0.0
+        record['valid'] = False
+        for i in range(num_skeletons):
+            record['joints'][i] = skeletons[i].joints
+            record['valid'][i] = skeletons[i].valid
+
+        num_boxes = min(len(boxes), self._max_boxes)
+        record['num_boxes'] = num_boxes
+        record['boxes'] = 0.0
+        if num_boxes > 0:
+            record['boxes'][:num_boxes] = np.asarray(boxes[:num_boxes], dtype=np.float32)
+
+        self._f.write(self._record.tobytes())
+        self.num_frames += 1
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+class SkeletonReader(object):
+    """Memory-mapped view of a file written by SkeletonRecorder. A partly written
+    last record, from a recorder still running or killed, is ignored."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, version, max_skeletons, max_boxes, category_len = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC or version != _VERSION:
+                raise RuntimeError(f"{path} is not a skeleton recording")
+            self.layout = build_layout(json.loads(f.read(category_len).decode()))
+
+        self.dtype = _record_dtype(self.layout.num_joints(), max_skeletons, max_boxes)
+        offset = _HEADER.size + category_len
+        num_frames = (os.path.getsize(path) - offset) // self.dtype.itemsize
+        if num_frames > 0:
+            # A plain ndarray view of the map indexes much faster than the memmap subclass
+            self._records = np.memmap(path, dtype=self.dtype, mode='r', offset=offset, shape=(num_frames,)).view(np.ndarray)
+        else:
+            self._records = np.zeros(0, dtype=self.dtype)
+
+        self.timestamps = self._records['timestamp']
+        self.counts = self._records['num_skeletons']
+        self.joints = self._records['joints']
+        self.valid = self._records['valid']
+
+    def __len__(self):
+        return len(self._records)
+
+    def skeletons(self, frame):
+        """Skeletons of one frame as read-only views onto the mapped file"""
+        return [Skeleton(self.layout, self.joints[frame, i], self.valid[frame, i])
+                for i in range(self.counts[frame])]
+
+    def boxes(self, frame):
+        return self._records['boxes'][frame, :self._records['num_boxes'][frame]].tolist()
+
+
+def replay(reader, motion_controller):
+    """Feeds every recorded frame to motion_controller.parse_objects and returns the outputs"""
+    outputs = []
+    for frame in range(len(reader)):
+        outputs.append(motion_controller.parse_objects(reader.skeletons(frame), float(reader.timestamps[frame])))
+
+    return outputs
@@ -0,0 +1,28 @@
+from motion.motion_controller import MotionController
+from recording.skeleton_stream import SkeletonReader, replay
+from utilities.stopwatch import Stopwatch
+
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replays a skeleton recording through MotionController')
+    parser.add_argument('recording')
+    parser.add_argument('--jump-window-s',  type=float,  default=1.0,  help='jump window in seconds, 0 for the 10 sample window')
+    args = parser.parse_args()
+
+    reader = SkeletonReader(args.recording)
+    motion = MotionController(jump_window_s=args.jump_window_s if args.jump_window_s > 0 else None)
+
+    sw = Stopwatch()
+    outputs = replay(reader,  motion)
+    elapsed_s = sw.get_ns() / 1e9
+
+    game_states = [output[2] for output in outputs]
+    jumps = sum(1 for prev, cur in zip([0] + game_states, game_states) if prev == 0 and cur == 1)
+    resets = sum(1 for prev, cur in zip([0] + game_states, game_states) if prev == 1 and cur == 0)
+    print(f"{len(reader)} frames in {elapsed_s:.3f}s ({len(reader) / max(elapsed_s, 1e-9):.0f} fps): {jumps} jumps, {resets} resets")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+from ctypes import *
+
+
+PROTOCOL_MAGIC = 0x4746
+PROTOCOL_VERSION_LEGACY = 1
+PROTOCOL_VERSION = 2
+
+
+""" Version 1: the bare control values, as read by the game engine's SocketServer """
+class Payload(Structure):
+    _fields_ = [("target_roll", c_int32),
+                ("target_pitch", c_int32), 
+                ("game_state",  c_int32), 
+                ("lwing_angle",  c_int32), 
+                ("rwing_angle",  c_int32), 
+                ("body_height",  c_int32)
+                ]
+
+
+""" Version 2: the control values behind a header carrying a sequence number and the capture timestamp """
+class PayloadV2(Structure):
+    _pack_ = 1
+    _fields_ = [("magic", c_uint16),
+                ("version", c_uint8),
+                ("flags", c_uint8),
+                ("sequence", c_uint32),
+                ("timestamp_us", c_uint64),
+                ("target_roll", c_int32),
+                ("target_pitch", c_int32),
+                ("game_state",  c_int32),
+                ("lwing_angle",  c_int32),
+                ("rwing_angle",  c_int32),
+                ("body_height",  c_int32)
+                ]
+
+
+class ControlPacket(object):
+
+    def __init__(self,  version,  sequence,  timestamp_us,  values):
+        self.version = version
+        self.sequence = sequence
+        self.timestamp_us = timestamp_us
+        self.values = values
+
+
+def encode(version,  sequence,  timestamp_us,  values):
+    if version == PROTOCOL_VERSION_LEGACY:
+        return bytes(Payload(*values))
+
+    return bytes(PayloadV2(PROTOCOL_MAGIC,  PROTOCOL_VERSION,  0,  sequence & 0xFFFFFFFF,  timestamp_us,  *values))
+
+
+def packet_size(data):
+    """Size of the packet at the start of data, telling the versions apart by the magic"""
+    if len(data) >= 3 and c_uint16.from_buffer_copy(data[:2]).value == PROTOCOL_MAGIC and data[2] == PROTOCOL_VERSION:
+        return sizeof(PayloadV2)
+
+    return sizeof(Payload)
+
+
+def decode(data):
+    if packet_size(data) == sizeof(PayloadV2):
+        p = PayloadV2.from_buffer_copy(data[:sizeof(PayloadV2)])
+        return ControlPacket(p.version,  p.sequence,  p.timestamp_us,
+                             (p.target_roll,  p.target_pitch,  p.game_state,  p.lwing_angle,  p.rwing_angle,  p.body_height))
+
+    p = Payload.from_buffer_copy(data[:sizeof(Payload)])
+    return ControlPacket(PROTOCOL_VERSION_LEGACY,  None,  None,
+                         (p.target_roll,  p.target_pitch,  p.game_state,  p.lwing_angle,  p.rwing_angle,  p.body_height))
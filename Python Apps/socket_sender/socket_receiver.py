@@ -0,0 +1,101 @@
+import socket
+import threading
+import time
+
+from .protocol import packet_size, decode
+
+
+class SocketReceiver(object):
+    """Pure Python stand-in for the game's SocketServer. Accepts both wire format
+    versions over TCP or UDP, keeps the latest control values and counts packets,
+    sequence gaps and the age of each packet on arrival."""
+
+    _BUFFER_SIZE = 512
+    _POLL_TIMEOUT_S = 0.1
+
+    def __init__(self,  host='localhost',  port=2300,  transport='tcp'):
+        self._transport = transport
+        if transport == 'udp':
+            self._s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        else:
+            self._s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._s.bind((host,  port))
+        self._s.settimeout(self._POLL_TIMEOUT_S)
+        if transport != 'udp':
+            self._s.listen(1)
+        self.port = self._s.getsockname()[1]
+
+        self._running = False
+        self._thread = None
+        self.latest = None
+        self.num_packets = 0
+        self.num_lost = 0
+        self.last_latency_ms = None
+        self._last_sequence = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._serve,  daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._thread.join()
+        self._s.close()
+
+    def _serve(self):
+        if self._transport == 'udp':
+            while self._running:
+                try:
+                    data = self._s.recv(self._BUFFER_SIZE)
+                except socket.timeout:
+                    continue
+                self._on_packet(data)
+            return
+
+        while self._running:
+            try:
+                conn,  _ = self._s.accept()
+            except socket.timeout:
+                continue
+            conn.settimeout(self._POLL_TIMEOUT_S)
+            self._serve_stream(conn)
+
+    def _serve_stream(self,  conn):
+        buffer = b''
+        with conn:
+            while self._running:
+                try:
+                    data = conn.recv(self._BUFFER_SIZE)
+                except socket.timeout:
+                    continue
+                if not data:
+                    return
+
+                buffer += data
+                while len(buffer) >= 3 and len(buffer) >= packet_size(buffer):
+                    size = packet_size(buffer)
+                    self._on_packet(buffer[:size])
+                    buffer = buffer[size:]
+
+    def _on_packet(self,  data):
+        packet = decode(data)
+        self.num_packets += 1
+        if packet.sequence is not None:
+            if self._last_sequence is not None and packet.sequence > self._last_sequence + 1:
+                self.num_lost += packet.sequence - self._last_sequence - 1
+            self._last_sequence = packet.sequence
+            # Sender and receiver share the monotonic clock when running on the same machine
+            self.last_latency_ms = time.monotonic() * 1000.0 - packet.timestamp_us / 1000.0
+        self.latest = packet
+
+
+if __name__ == '__main__':
+    receiver = SocketReceiver()
+    receiver.start()
+    print(f"Listening on port {receiver.port}")
+    while True:
+        time.sleep(1)
+        if receiver.latest is not None:
+            print(f"Received {receiver.num_packets} packets, lost {receiver.num_lost}, latest {receiver.latest.values} latency {receiver.last_latency_ms}ms")
@@ -1,41 +1,199 @@
+import errno
+import select
 import socket
-import sys
-import random
-from ctypes import *
-
-
-""" This class defines a C-like struct """
-class Payload(Structure):
-    _fields_ = [("target_roll", c_int32),
-                ("target_pitch", c_int32), 
-                ("game_state",  c_int32), 
-                ("lwing_angle",  c_int32), 
-                ("rwing_angle",  c_int32), 
-                ("body_height",  c_int32)
-                ]
-                
+import time
+
+from .protocol import Payload, PROTOCOL_VERSION_LEGACY, encode
+from utilities.trace import tracer
+
+
+tracer.register('send',  ('sequence',  'bytes_sent',  'dropped'))
+
+
 class SocketSender(object):
-    
-    def __init__(self):
-        server_addr = ('localhost', 2300)
-        self._s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        
+    """Sends control packets to the game without ever blocking the caller.
+
+    Over TCP Nagle is disabled and the socket is non-blocking: when the game reads
+    slower than we send, only the newest packet waits behind the one already on the
+    wire, so stale control never queues up. Over UDP every packet is one datagram
+    and a full send buffer simply drops it. A lost or refused connection is retried
+    with exponential backoff, connecting without blocking: each send() only checks
+    whether the connect has completed. Unchanged values are only re-sent as a heartbeat."""
+
+    _CONNECT_TIMEOUT_S = 0.2
+    _RECONNECT_MIN_S = 0.5
+    _RECONNECT_MAX_S = 8.0
+
+    def __init__(self,  host='localhost',  port=2300,  transport='tcp',  protocol_version=PROTOCOL_VERSION_LEGACY,
+                 send_on_change=True,  heartbeat_s=0.5):
+        self._server_addr = (host,  port)
+        self._transport = transport
+        self._protocol_version = protocol_version
+        self._send_on_change = send_on_change
+        self._heartbeat_s = heartbeat_s
+
+        self._s = None
+        self._connecting = None
+        self._connect_deadline = 0.0
+        self._pending = b''
+        self._latest = None
+        self._sequence = 0
+        self._last_values = None
+        self._last_send_time = 0.0
+        self._backoff_s = self._RECONNECT_MIN_S
+        self._next_connect_time = 0.0
+
+        self.num_packets = 0
+        self.num_skipped = 0
+        self.num_dropped = 0
+        self.num_reconnects = 0
+        self.bytes_sent = 0
+
+        self._connect()
+
+    def _connect(self):
+        if self._transport == 'udp':
+            self._s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._s.setblocking(False)
+            self._s.connect(self._server_addr)
+            print(f"Sending datagrams to {repr(self._server_addr)}")
+            return
+
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        s.setblocking(False)
+        error = s.connect_ex(self._server_addr)
+        if error in (errno.EINPROGRESS,  errno.EWOULDBLOCK):
+            # Completes in the background, _poll_connect() picks it up on a later send
+            self._connecting = s
+            self._connect_deadline = time.monotonic() + self._CONNECT_TIMEOUT_S
+        elif error == 0:
+            self._on_connected(s)
+        else:
+            self._on_connect_failed(s)
+
+    def _poll_connect(self):
+        s = self._connecting
+        _, writable, _ = select.select([],  [s],  [],  0)
+        if not writable:
+            if time.monotonic() >= self._connect_deadline:
+                self._connecting = None
+                self._on_connect_failed(s)
+            return
+
+        self._connecting = None
+        if s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) != 0:
+            self._on_connect_failed(s)
+        else:
+            self._on_connected(s)
+
+    def _on_connect_failed(self,  s):
+        s.close()
+        print(f"ERROR: Connection to {repr(self._server_addr)} refused, retrying in {self._backoff_s:.1f}s")
+        self._next_connect_time = time.monotonic() + self._backoff_s
+        self._backoff_s = min(self._RECONNECT_MAX_S,  self._backoff_s * 2)
+
+    def _on_connected(self,  s):
+        self._s = s
+        self._backoff_s = self._RECONNECT_MIN_S
+        self.num_reconnects += 1
+        print(f"Connected to {repr(self._server_addr)}")
+
+    def _disconnect(self):
+        print(f"ERROR: Connection to {repr(self._server_addr)} lost")
+        self._s.close()
+        self._s = None
+        # A new stream starts on a packet boundary, so the unsent tail is discarded
+        self._pending = b''
+        self._latest = None
+        self._next_connect_time = time.monotonic() + self._backoff_s
+
+    def close(self):
+        if self._connecting is not None:
+            self._connecting.close()
+            self._connecting = None
+        if self._s is not None:
+            self._s.close()
+            self._s = None
+
+    def is_connected(self):
+        return self._s is not None
+
+    def send(self,  roll,  pitch,  game_state,  lwing_angle,  rwing_angle,  body_height,  timestamp=None):
+        """Returns the number of bytes written by this call"""
+        values = (roll,  pitch,  game_state,  lwing_angle,  rwing_angle,  body_height)
+        now = time.monotonic()
+        if self._send_on_change and values == self._last_values and now - self._last_send_time < self._heartbeat_s:
+            self.num_skipped += 1
+            return 0
+
         if self._s is None:
-            print("Error creating socket")
+            if self._connecting is not None:
+                self._poll_connect()
+            elif now >= self._next_connect_time:
+                self._connect()
+            if self._s is None:
+                self.num_dropped += 1
+                return 0
 
-        try:
-            self._s.connect(server_addr)
-            print(f"Connected to {repr(server_addr)}")
-        except:
-            print(f"ERROR: Connection to {repr(server_addr)} refused")
+        if timestamp is None:
+            timestamp = now
+        self._sequence += 1
+        data = encode(self._protocol_version,  self._sequence,  int(timestamp * 1e6),  values)
+
+        bytes_before = self.bytes_sent
+        if self._transport == 'udp':
+            self._send_datagram(data)
+        else:
+            self._send_stream(data)
 
-    def send(self,  roll,  pitch,  game_state,  lwing_angle,  rwing_angle,  body_height):
+        self.num_packets += 1
+        self._last_values = values
+        self._last_send_time = now
+
+        nsent = self.bytes_sent - bytes_before
+        if tracer.is_enabled():
+            tracer.record('send',  (self._sequence,  nsent,  self.num_dropped))
+
+        return nsent
+
+    def _send_datagram(self,  data):
         try:
-            payload_out = Payload(roll,  pitch,  game_state,  lwing_angle,  rwing_angle,  body_height)
-            print(f"Sending roll={payload_out.target_roll} pitch={payload_out.target_pitch}")
-            nsent = self._s.send(payload_out)
-            # Alternative: s.sendall(...): coontinues to send data until either
-            # all data has been sent or an error occurs. No return value.
-            print(f"Sent {nsent} bytes")
-        finally:
-            pass
+            self.bytes_sent += self._s.send(data)
+        except OSError:
+            # Nobody listening yet, the buffer is full or the network is down; the next packet supersedes this one anyway
+            self.num_dropped += 1
+
+    def _send_stream(self,  data):
+        if self._pending:
+            self._flush()
+            if self._s is None:
+                # The connection was lost while flushing, this packet goes with it
+                self.num_dropped += 1
+                return
+
+        if self._pending:
+            # The game is reading slower than we send: keep only the newest packet
+            if self._latest is not None:
+                self.num_dropped += 1
+            self._latest = data
+            return
+
+        self._pending = data
+        self._flush()
+
+    def _flush(self):
+        while self._pending and self._s is not None:
+            try:
+                nsent = self._s.send(self._pending)
+            except BlockingIOError:
+                return
+            except OSError:
+                self._disconnect()
+                return
+
+            self.bytes_sent += nsent
+            self._pending = self._pending[nsent:]
+            if not self._pending and self._latest is not None:
+                self._pending = self._latest
+                self._latest = None
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The packages live next to this folder and are imported by the scripts from the working directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
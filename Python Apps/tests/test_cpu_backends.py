@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+import pytest
+
+from pose_estimation.inference_backends import POSE_ONNX_NAME, POSE_WEIGHTS_NAME
+
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+
+# Skeletons are parsed by trt_pose's ParseObjects whatever runs the model, so the CPU
+# path needs CPU builds of torch and trt_pose as well as the ONNX model and the SSD graph
+pytest.importorskip('torch')
+pytest.importorskip('trt_pose.parse_objects')
+if not any(os.path.exists(os.path.join(MODELS_DIR, name)) for name in (POSE_WEIGHTS_NAME, POSE_ONNX_NAME)):
+    pytest.skip(f"needs {POSE_WEIGHTS_NAME} or {POSE_ONNX_NAME} in models/", allow_module_level=True)
+if not os.path.exists(os.path.join(MODELS_DIR, 'ssd', 'graph.pbtxt')):
+    pytest.skip("needs the OpenCV SSD graph in models/ssd/", allow_module_level=True)
+
+
+@pytest.fixture(scope='module')
+def pose_estimator():
+    from pose_estimation.openpose import OpenPose
+
+    pose_estimator = OpenPose(MODELS_DIR, backend='opencv', detector_backend='opencv', num_threads=2, max_batch_size=2)
+    pose_estimator.warm_up()
+    return pose_estimator
+
+
+def test_opencv_backends_run_a_frame_on_the_cpu(pose_estimator):
+    skeletons, annot_image = pose_estimator.detect(np.zeros((480, 640, 3), dtype=np.uint8), return_annotated_image=True)
+
+    assert skeletons == []
+    assert annot_image.shape == (224, 224, 3)
+
+
+def test_opencv_backends_run_a_batch_on_the_cpu(pose_estimator):
+    frames = [np.zeros((480, 640, 3), dtype=np.uint8), np.full((224, 224, 3), 128, dtype=np.uint8)]
+    results = pose_estimator.detect_batch(frames)
+
+    assert [skeletons for skeletons, _ in results] == [[], []]
@@ -0,0 +1,88 @@
+import threading
+
+import numpy as np
+
+from pose_estimation.detection_scheduler import DetectionScheduler
+from pose_estimation.skeleton import Skeleton, SkeletonLayout
+
+
+LAYOUT = SkeletonLayout(['joint_%d' % idx for idx in range(6)], [], [], [])
+
+
+class FrameDetector(object):
+    """Finds one box per frame, with the frame number in its left edge, so a box
+    can be traced back to the frame it was detected on"""
+
+    def __init__(self, release=None):
+        self._release = release
+
+    def detect_with_scores(self, frame):
+        if self._release is not None:
+            self._release.wait()
+        return [[frame / 100.0, 0.0, 1.0, 1.0]], [1.0]
+
+
+def skeleton_in(box):
+    x1, y1, x2, y2 = box
+    joints = np.stack([np.linspace(x1 + 0.01, x2 - 0.01, 6), np.linspace(y1 + 0.01, y2 - 0.01, 6)], axis=1)
+    return Skeleton(LAYOUT, joints.astype(np.float32), np.ones(6, dtype=bool))
+
+
+def test_frame_is_parsed_with_its_own_detection_while_the_next_one_begins():
+    scheduler = DetectionScheduler(FrameDetector(), interval=1)
+    detections = [scheduler.begin_frame(0)]
+    for frame in range(1, 5):
+        # The next frame is under way before this one is parsed, as with detect_async
+        detections.append(scheduler.begin_frame(frame))
+        boxes = scheduler.boxes_for(detections[frame - 1])
+        assert boxes[0][0] == (frame - 1) / 100.0
+        scheduler.track([skeleton_in(boxes[0])])
+
+
+def test_asynchronous_detection_is_only_waited_for_by_its_own_frame():
+    release = threading.Event()
+    scheduler = DetectionScheduler(FrameDetector(release), interval=2, async_detection=True)
+    release.set()
+    first = scheduler.begin_frame(0)
+    boxes = scheduler.boxes_for(first)
+    scheduler.track([skeleton_in(boxes[0])])
+
+    # Frame 1 tracks the boxes forward while frame 2's detection is still running
+    release.clear()
+    tracked = scheduler.begin_frame(1)
+    pending = scheduler.begin_frame(2)
+    assert tracked is None and pending is not None
+    assert not pending.done()
+    assert scheduler.boxes_for(tracked)[0][0] >= 0.0
+    scheduler.track([skeleton_in(boxes[0])])
+
+    release.set()
+    assert scheduler.boxes_for(pending)[0][0] == 0.02
+
+
+def test_tracked_boxes_follow_the_skeletons_between_detections():
+    scheduler = DetectionScheduler(FrameDetector(), interval=10)
+    boxes = scheduler.boxes_for(scheduler.begin_frame(0))
+    scheduler.track([skeleton_in([0.1, 0.1, 0.5, 0.9])])
+
+    assert scheduler.begin_frame(1) is None
+    x1, y1, x2, y2 = scheduler.boxes_for(None)[0]
+    assert boxes[0] != [x1, y1, x2, y2]
+    assert 0.05 < x1 < 0.11 and 0.49 < x2 < 0.55
+
+
+def test_tracked_box_follows_a_player_moving_sideways():
+    scheduler = DetectionScheduler(FrameDetector(), interval=100)
+    scheduler.boxes_for(scheduler.begin_frame(0))
+    scheduler.track([skeleton_in([0.1, 0.1, 0.3, 0.9])])
+
+    # Each frame the player moves a third of their width right, well past the box padding
+    for frame in range(1, 11):
+        assert scheduler.begin_frame(frame) is None
+        scheduler.boxes_for(None)
+        x1 = 0.1 + frame * 0.07
+        scheduler.track([skeleton_in([x1, 0.1, x1 + 0.2, 0.9])])
+
+    assert scheduler.num_detections == 1
+    x1, _, x2, _ = scheduler.current_boxes()[0]
+    assert 0.78 < x1 < 0.8 and 0.99 < x2 <= 1.0
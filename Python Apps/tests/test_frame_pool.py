@@ -0,0 +1,93 @@
+import time
+
+import numpy as np
+
+from jetcam.frame_pool import FramePool
+from pipeline.pipeline_runner import PipelineRunner, FramePacket
+
+
+NUM_FRAMES = 5000
+SHAPE = (48, 64, 3)
+
+
+class SyntheticReader(object):
+    """Decodes a numbered frame into a pooled buffer, as VideoOfflineReader does"""
+
+    def __init__(self, pool, num_frames):
+        self._pool = pool
+        self._num_frames = num_frames
+        self.num_read = 0
+
+    def read_frame_buffer(self):
+        if self.num_read >= self._num_frames:
+            return None
+
+        buffer = self._pool.acquire()
+        buffer.array.fill(self.num_read % 256)
+        self.num_read += 1
+        return buffer
+
+
+def test_steady_capture_loop_never_allocates():
+    pool = FramePool(SHAPE, size=4)
+    reader = SyntheticReader(pool, NUM_FRAMES)
+    held = []
+    buffer = reader.read_frame_buffer()
+    while buffer is not None:
+        # Up to three frames held at once, like capture, inference and the preview
+        held.append(buffer)
+        if len(held) == 3:
+            held.pop(0).release()
+        buffer = reader.read_frame_buffer()
+    for buffer in held:
+        buffer.release()
+
+    assert pool.stats() == {'shape': SHAPE, 'allocations': 4, 'acquired': NUM_FRAMES, 'in_use': 0}
+
+
+def test_pipeline_with_dropped_frames_keeps_allocations_flat():
+    pool = FramePool(SHAPE, size=4)
+    reader = SyntheticReader(pool, NUM_FRAMES)
+
+    def capture_stage():
+        buffer = reader.read_frame_buffer()
+        if buffer is None:
+            return None
+
+        packet = FramePacket(reader.num_read, buffer.array)
+        packet.buffer = buffer
+        return packet
+
+    def detect_stage(packet):
+        # Slower than capture now and then, so the queues drop frames
+        if packet.frame_id % 50 == 0:
+            time.sleep(0.001)
+        assert packet.image[0, 0, 0] == (packet.frame_id - 1) % 256
+        return packet
+
+    runner = PipelineRunner(queue_size=1, on_drop=FramePacket.release)
+    runner.add_source('capture', capture_stage)
+    runner.add_stage('detect', detect_stage)
+    runner.start()
+
+    allocations = []
+    num_output = 0
+    while runner.is_running():
+        packet = runner.get_output(timeout=0.1)
+        if packet is not None:
+            packet.release()
+            num_output += 1
+            allocations.append(pool.num_allocations)
+    runner.stop()
+    packet = runner.get_output(timeout=0.1)
+    while packet is not None:
+        packet.release()
+        packet = runner.get_output(timeout=0.1)
+
+    assert reader.num_read == NUM_FRAMES
+    assert sum(entry['dropped'] for entry in runner.report()) > 0
+    assert num_output >= 20
+    # Past warm-up the pool never grows, however many frames went through or were dropped
+    assert allocations[-1] == allocations[10]
+    assert pool.num_allocations <= 8
+    assert pool.num_in_use == 0
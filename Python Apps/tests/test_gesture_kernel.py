@@ -0,0 +1,110 @@
+import math
+import os
+
+import numpy as np
+import pytest
+
+from motion.gesture_kernel import GestureKernel
+from motion.motion_controller import MotionController
+from pose_estimation.skeleton import Skeleton, load_layout
+from utilities.vector import Vector
+
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+GESTURE_JOINTS = ('left_elbow', 'right_elbow', 'left_shoulder', 'right_shoulder', 'nose', 'neck')
+
+
+def reference_gestures(joints, valid):
+    """The per-call Vector and scalar maths MotionController ran before GestureKernel"""
+    left_elbow, right_elbow, left_shoulder, right_shoulder, nose, neck = [[float(v) for v in joint] for joint in joints]
+    left_wing = Vector(left_elbow[0] - left_shoulder[0], left_elbow[1] - left_shoulder[1]).normalise()
+    right_wing = Vector(right_elbow[0] - right_shoulder[0], right_elbow[1] - right_shoulder[1]).normalise()
+    elbows = Vector(left_elbow[0] - right_elbow[0], left_elbow[1] - right_elbow[1]).normalise()
+
+    shoulder_dist = abs(right_shoulder[0] - left_shoulder[0])
+    nose_to_neck_vert = abs(nose[1] - neck[1])
+    arms_valid = all(valid[:4])
+    head_valid = all(valid[4:])
+    body_height = math.nan
+    if arms_valid and head_valid and shoulder_dist > 0:
+        body_height = min(8, ((nose_to_neck_vert / shoulder_dist) - 0.5) * 16.0)
+
+    return {
+        'arms_valid': arms_valid,
+        'head_valid': head_valid,
+        'left_wing_roll_target': min(90, max(-15, left_wing.angle_from_vector(Vector(1.0, 0.0)) * 180.0 / math.pi + 30)),
+        'right_wing_roll_target': min(90, max(-15, Vector(-1.0, 0.0).angle_from_vector(right_wing) * 180.0 / math.pi + 30)),
+        'roll': elbows.angle_from_vector(Vector(1.0, 0.0)) * 180.0 / math.pi,
+        'shoulder_dist': shoulder_dist,
+        'nose_to_neck_vert': nose_to_neck_vert,
+        'body_height': body_height,
+    }
+
+
+@pytest.fixture(scope='module')
+def layout():
+    return load_layout(MODELS_DIR)
+
+
+@pytest.fixture(scope='module')
+def session(layout):
+    rng = np.random.default_rng(0)
+    num_frames = 500
+    keypoints = rng.random((num_frames, layout.num_joints(), 2)).astype(np.float32)
+    valid = rng.random((num_frames, layout.num_joints())) > 0.1
+    # A few frames with the shoulders on top of each other, where body height cannot be measured
+    keypoints[:5, layout.joint_index['right_shoulder'], 0] = keypoints[:5, layout.joint_index['left_shoulder'], 0]
+    valid[:5] = True
+    return keypoints, valid
+
+
+def references(layout, keypoints, valid):
+    idx = [layout.joint_index[name] for name in GESTURE_JOINTS]
+    return [reference_gestures(keypoints[t, idx], valid[t, idx]) for t in range(len(keypoints))]
+
+
+def assert_matches(expected, actual):
+    for name in ('arms_valid', 'head_valid'):
+        assert bool(actual[name]) == expected[name], name
+    for name in ('left_wing_roll_target', 'right_wing_roll_target', 'roll', 'shoulder_dist', 'nose_to_neck_vert', 'body_height'):
+        np.testing.assert_allclose(actual[name], expected[name], atol=1e-9, err_msg=name)
+
+
+def test_evaluate_one_matches_reference(layout, session):
+    kernel = GestureKernel(layout.joint_index)
+    keypoints, valid = session
+    for t, expected in enumerate(references(layout, keypoints, valid)):
+        assert_matches(expected, kernel.evaluate_one(keypoints[t], valid[t]))
+
+
+def test_evaluate_matches_reference_per_frame_and_batched(layout, session):
+    kernel = GestureKernel(layout.joint_index)
+    keypoints, valid = session
+    batched = kernel.evaluate(keypoints, valid)
+    for t, expected in enumerate(references(layout, keypoints, valid)):
+        assert_matches(expected, kernel.evaluate(keypoints[t], valid[t]))
+        assert_matches(expected, {name: values[t] for name, values in batched.items()})
+
+
+def test_body_height_is_nan_without_shoulder_width(layout, session):
+    kernel = GestureKernel(layout.joint_index)
+    keypoints, valid = session
+    assert np.isnan(kernel.evaluate(keypoints[:5], valid[:5])['body_height']).all()
+    assert math.isnan(kernel.evaluate_one(keypoints[0], valid[0])['body_height'])
+
+
+def test_motion_controller_holds_body_height_without_head(layout):
+    joints = np.zeros((layout.num_joints(), 2), dtype=np.float32)
+    for name, point in (('left_elbow', (0.3, 0.4)), ('right_elbow', (0.7, 0.4)), ('left_shoulder', (0.4, 0.3)),
+                        ('right_shoulder', (0.6, 0.3)), ('nose', (0.5, 0.1)), ('neck', (0.5, 0.3))):
+        joints[layout.joint_index[name]] = point
+    valid = np.zeros(layout.num_joints(), dtype=bool)
+    valid[[layout.joint_index[name] for name in GESTURE_JOINTS]] = True
+
+    controller = MotionController()
+    body_height = controller.parse_objects([Skeleton(layout, joints, valid)], 0.0)[5]
+    assert body_height == pytest.approx(min(8, (0.2 / 0.2 - 0.5) * 16.0))
+
+    valid[layout.joint_index['nose']] = False
+    joints[layout.joint_index['right_shoulder'], 0] = 0.9
+    assert controller.parse_objects([Skeleton(layout, joints, valid)], 0.1)[5] == body_height
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+from motion.jump_window import JumpWindow
+
+
+THRESHOLD = 0.2
+
+
+def legacy_is_jump(history, cur_shoulder_y, jump_threshold, window_size=10, timestamp=0.0, max_age_s=None):
+    """The list based detector JumpWindow replaced, trimmed by age as well when max_age_s is set"""
+    history.append((timestamp, cur_shoulder_y))
+    if len(history) > window_size:
+        history.pop(0)
+    if max_age_s is not None:
+        while history[0][0] < timestamp - max_age_s:
+            history.pop(0)
+
+    values = [value for _, value in history]
+    peak = min(values)
+    peak_idx = values.index(peak)
+    try:
+        start_bottom = max(values[: peak_idx])
+        end_bottom = max(values[peak_idx:])
+    except Exception as _:
+        return False
+
+    if abs(peak - start_bottom) >= jump_threshold and abs(peak - end_bottom) >= jump_threshold:
+        history.clear()
+        return True
+
+    return False
+
+
+def window_is_jump(window, cur_shoulder_y, jump_threshold, timestamp=0.0):
+    # The decision MotionController makes from a JumpWindow
+    window.push(cur_shoulder_y, timestamp)
+    extremes = window.extremes()
+    if extremes is None:
+        return False
+
+    peak, start_bottom, end_bottom = extremes
+    if abs(peak - start_bottom) >= jump_threshold and abs(peak - end_bottom) >= jump_threshold:
+        window.clear()
+        return True
+
+    return False
+
+
+def make_session(num_frames, seed, variable_rate=False):
+    """Shoulder heights of a player standing, with noise, and jumping now and then with
+    jumps of different heights and lengths, quantised so that ties happen. With
+    variable_rate the frames arrive between 20 and 60 times a second."""
+    rng = random.Random(seed)
+    samples = []
+    timestamp = 0.0
+    jump_left = 0
+    jump_height = 0.0
+    for _ in range(num_frames):
+        if jump_left == 0 and rng.random() < 0.02:
+            jump_left = rng.randint(1, 8)
+            jump_height = rng.uniform(0.1, 0.4)
+        jump = jump_height if jump_left > 0 else 0.0
+        jump_left = max(0, jump_left - 1)
+        samples.append((timestamp, round(1.6 - jump + rng.uniform(-0.05, 0.05), 2)))
+        timestamp += rng.uniform(1.0 / 60.0, 1.0 / 20.0) if variable_rate else 1.0 / 30.0
+
+    return samples
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('window_size', [3, 10, 60])
+def test_same_decisions_as_list_window(seed, window_size):
+    history = []
+    window = JumpWindow(window_size)
+    decisions = []
+    for _, y in make_session(5000, seed):
+        expected = legacy_is_jump(history, y, THRESHOLD, window_size)
+        assert window_is_jump(window, y, THRESHOLD) == expected
+        decisions.append(expected)
+
+    assert any(decisions)
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('max_age_s', [0.2, 0.5, 1.0])
+def test_same_decisions_as_list_window_trimmed_by_age(seed, max_age_s):
+    # Capacity as MotionController sizes it, so the age limit is what trims the window
+    window_size = 256
+    history = []
+    window = JumpWindow(window_size, max_age_s)
+    decisions = []
+    for timestamp, y in make_session(5000, seed, variable_rate=True):
+        expected = legacy_is_jump(history, y, THRESHOLD, window_size, timestamp, max_age_s)
+        assert window_is_jump(window, y, THRESHOLD, timestamp) == expected
+        assert len(window) == len(history)
+        decisions.append(expected)
+
+    assert any(decisions)
@@ -0,0 +1,41 @@
+import os
+import time
+
+from pose_estimation.inference_backends import POSE_TRT_KIND
+from pose_estimation.model_cache import ModelArtifactCache
+
+
+def write(content):
+    def build(tmp_path):
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+    return build
+
+
+def test_engines_of_each_batch_size_are_kept_and_found_apart(tmp_path):
+    cache = ModelArtifactCache(str(tmp_path), max_per_kind=2)
+    single, batched = POSE_TRT_KIND.format(1), POSE_TRT_KIND.format(4)
+
+    cache.build(single, 'a', '.pth', write('b1 a'))
+    cache.build(single, 'b', '.pth', write('b1 b'))
+    # Built last, but for another batch size
+    for fingerprint in ('c', 'd', 'e'):
+        time.sleep(0.01)
+        cache.build(batched, fingerprint, '.pth', write('b4 ' + fingerprint))
+
+    assert cache.get(single, 'a', '.pth') is not None
+    assert cache.get(single, 'b', '.pth') is not None
+    assert cache.get(batched, 'c', '.pth') is None
+    with open(cache.latest(batched, '.pth')) as f:
+        assert f.read() == 'b4 e'
+    with open(cache.latest(single, '.pth')) as f:
+        assert f.read() == 'b1 b'
+
+
+def test_latest_of_a_batch_size_never_built_is_none(tmp_path):
+    cache = ModelArtifactCache(str(tmp_path))
+    cache.build(POSE_TRT_KIND.format(1), 'a', '.pth', write('b1'))
+
+    assert cache.latest(POSE_TRT_KIND.format(4), '.pth') is None
+    assert cache.latest(POSE_TRT_KIND.format(10), '.pth') is None
+    assert sorted(os.listdir(str(tmp_path))) == [POSE_TRT_KIND.format(1) + '-a.pth']
@@ -0,0 +1,49 @@
+import json
+import threading
+
+from utilities.trace import Tracer, TRACE_FRAME
+
+
+def test_drain_while_recording_from_another_thread():
+    tracer = Tracer(TRACE_FRAME, capacity=1000000)
+    tracer.register('frame', ('frame_id',))
+    stop = threading.Event()
+
+    def record():
+        frame_id = 0
+        while not stop.is_set():
+            tracer.record('frame', (frame_id,))
+            frame_id += 1
+
+    thread = threading.Thread(target=record)
+    thread.start()
+    drained = []
+    try:
+        for _ in range(200):
+            drained.extend(tracer.drain())
+    finally:
+        stop.set()
+        thread.join()
+    drained.extend(tracer.drain())
+
+    # Every record exactly once, in order
+    assert [values[0] for _, _, values in drained] == list(range(len(drained)))
+
+
+def test_overlapping_dumps_are_written_whole_and_in_order(tmp_path):
+    path = str(tmp_path / 'trace.jsonl')
+    tracer = Tracer(TRACE_FRAME, capacity=100000)
+    tracer.register('frame', ('frame_id', 'latency_ms'))
+    threads = []
+    frame_id = 0
+    for _ in range(20):
+        for _ in range(2000):
+            tracer.record('frame', (frame_id, 1.5))
+            frame_id += 1
+        threads.append(tracer.dump_async(path))
+    for thread in threads:
+        thread.join()
+
+    with open(path) as f:
+        entries = [json.loads(line) for line in f]
+    assert [entry['frame_id'] for entry in entries] == list(range(frame_id))
@@ -0,0 +1,102 @@
+import threading
+import time
+
+import cv2
+
+from pose_estimation.skeleton import draw_skeletons
+from utilities.profiler import profiler
+
+
+class PreviewRenderer(object):
+    """Shows the latest frame with its skeletons drawn over it, on a thread of its
+    own at no more than max_fps.
+
+    submit() only keeps a snapshot, and does not even copy the frame when the
+    preview has been updated within the last 1/max_fps, so the control loop is
+    never held up by drawing or by the GUI. Every OpenCV GUI call is made on the
+    preview thread, and none at all unless a renderer is started, so a headless
+    OpenCV build runs with the preview turned off."""
+
+    _IDLE_WAIT_S = 0.05
+
+    def __init__(self, window_name='Preview', max_fps=15.0):
+        self._window_name = window_name
+        self._interval_s = 1.0 / max_fps
+        self._next_submit = 0.0
+        self._snapshot = None
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = None
+        self._disabled = False
+        # Cleared to pause the preview, e.g. when frame time runs over budget
+        self.enabled = True
+        self.num_submitted = 0
+        self.num_rate_limited = 0
+        self.num_shown = 0
+
+    def start(self):
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name='preview', daemon=True)
+        self._thread.start()
+
+    def submit(self, image, skeletons):
+        """Hands over a frame and its skeletons; returns False when it was skipped to keep to max_fps"""
+        if self._disabled or not self.enabled:
+            return False
+
+        now = time.monotonic()
+        if now < self._next_submit:
+            self.num_rate_limited += 1
+            return False
+
+        self._next_submit = now + self._interval_s
+        # The frame goes back to its pool once the caller is done, so the preview keeps its own copy
+        snapshot = (image.copy(), list(skeletons))
+        with self._cond:
+            self._snapshot = snapshot
+            self._cond.notify()
+        self.num_submitted += 1
+        return True
+
+    def _run(self):
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._snapshot is not None or self._stop, self._IDLE_WAIT_S)
+                    if self._stop:
+                        break
+                    snapshot = self._snapshot
+                    self._snapshot = None
+
+                if snapshot is not None:
+                    image, skeletons = snapshot
+                    with profiler.stage('preview'):
+                        draw_skeletons(image, skeletons)
+                        cv2.imshow(self._window_name, image)
+                    self.num_shown += 1
+
+                # Also keeps the window responsive while no frames arrive
+                cv2.waitKey(1)
+        except cv2.error:
+            self._disabled = True
+            print("Preview disabled, this OpenCV build has no GUI support")
+        finally:
+            try:
+                cv2.destroyWindow(self._window_name)
+            except cv2.error:
+                pass
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {
+            'submitted': self.num_submitted,
+            'rate_limited': self.num_rate_limited,
+            'shown': self.num_shown,
+        }
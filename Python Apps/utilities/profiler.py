@@ -0,0 +1,183 @@
+import collections
+import functools
+import math
+import threading
+import time
+
+from utilities.stopwatch import Stopwatch
+
+
+class LatencyHistogram(object):
+    """Streaming latency histogram with log-spaced buckets (about 9% wide from 1us
+    to over a minute), so percentiles cost fixed memory however long it runs"""
+
+    _MIN_NS = 1000
+    _BUCKETS_PER_OCTAVE = 8
+    _NUM_BUCKETS = 8 * 36
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._counts = [0] * self._NUM_BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, ns):
+        if ns > self._MIN_NS:
+            idx = min(self._NUM_BUCKETS - 1, int(math.log2(ns / self._MIN_NS) * self._BUCKETS_PER_OCTAVE))
+        else:
+            idx = 0
+        self._counts[idx] += 1
+        self.count += 1
+        self.total_ns += ns
+        self.max_ns = max(self.max_ns, ns)
+
+    def percentile_ns(self, p):
+        if self.count == 0:
+            return 0.0
+
+        target = p / 100.0 * self.count
+        cumulative = 0
+        for idx, count in enumerate(self._counts):
+            cumulative += count
+            if cumulative >= target:
+                # Upper edge of the bucket, never above the largest sample seen
+                return min(self.max_ns, self._MIN_NS * 2 ** ((idx + 1) / self._BUCKETS_PER_OCTAVE))
+
+        return self.max_ns
+
+    def mean_ns(self):
+        return self.total_ns / self.count if self.count > 0 else 0.0
+
+
+class _StageTimer(object):
+
+    def __init__(self, profiler, name, frame_id):
+        self._profiler = profiler
+        self._name = name
+        self._frame_id = frame_id
+        self._sw = None
+
+    def __enter__(self):
+        self._sw = Stopwatch()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._profiler.record(self._name, self._sw.get_ns(), self._frame_id)
+        return False
+
+
+class _NullTimer(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class Profiler(object):
+    """Named stage timers feeding a latency histogram per stage.
+
+    Use `with profiler.stage('resize'):` or the @profiler.profiled('gesture') decorator.
+    When disabled, stage() hands back a shared no-op timer. summary() gives the
+    count, mean, p50/p95/p99 and max per stage; with csv_path set every sample is
+    also kept for a per-frame CSV export."""
+
+    _MAX_CSV_ROWS = 100000
+
+    def __init__(self, enabled=False, report_interval_s=10.0, csv_path=None):
+        self._histograms = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._null_timer = _NullTimer()
+        self.configure(enabled, report_interval_s, csv_path)
+
+    def configure(self, enabled=False, report_interval_s=10.0, csv_path=None):
+        self.enabled = enabled
+        self._report_interval_s = report_interval_s
+        self._csv_path = csv_path
+        self._csv_rows = collections.deque(maxlen=self._MAX_CSV_ROWS) if csv_path is not None else None
+        self._last_report = time.monotonic()
+
+    def stage(self, name, frame_id=None):
+        if not self.enabled:
+            return self._null_timer
+
+        return _StageTimer(self, name, frame_id)
+
+    def profiled(self, name):
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name, ns, frame_id=None):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = LatencyHistogram()
+                self._histograms[name] = histogram
+            histogram.add(ns)
+
+        if self._csv_rows is not None:
+            self._csv_rows.append((frame_id, name, time.perf_counter_ns() - ns, ns))
+
+    def summary(self):
+        summary = collections.OrderedDict()
+        with self._lock:
+            for name, histogram in self._histograms.items():
+                summary[name] = {
+                    'count': histogram.count,
+                    'mean_ms': histogram.mean_ns() / 1e6,
+                    'p50_ms': histogram.percentile_ns(50) / 1e6,
+                    'p95_ms': histogram.percentile_ns(95) / 1e6,
+                    'p99_ms': histogram.percentile_ns(99) / 1e6,
+                    'max_ms': histogram.max_ns / 1e6,
+                }
+
+        return summary
+
+    def reset(self):
+        with self._lock:
+            for histogram in self._histograms.values():
+                histogram.reset()
+
+    def print_summary_if_due(self):
+        if not self.enabled:
+            return False
+
+        now = time.monotonic()
+        if now - self._last_report < self._report_interval_s:
+            return False
+
+        self._last_report = now
+        for name, stats in self.summary().items():
+            print(f"[{name}] n={stats['count']} mean={stats['mean_ms']:.2f}ms p50={stats['p50_ms']:.2f}ms "
+                  f"p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms max={stats['max_ms']:.2f}ms")
+
+        return True
+
+    def export_csv(self, path=None):
+        """Writes (and clears) the per-sample rows: frame id, stage, start and duration in microseconds"""
+        path = path if path is not None else self._csv_path
+        if path is None or self._csv_rows is None:
+            return
+
+        rows = self._csv_rows
+        self._csv_rows = collections.deque(maxlen=self._MAX_CSV_ROWS)
+        with open(path, 'a') as f:
+            if f.tell() == 0:
+                f.write('frame_id,stage,start_us,duration_us\n')
+            for frame_id, name, start_ns, ns in rows:
+                f.write(f"{'' if frame_id is None else frame_id},{name},{start_ns / 1000:.1f},{ns / 1000:.1f}\n")
+
+
+profiler = Profiler()
@@ -0,0 +1,57 @@
+import contextlib
+import threading
+import time
+
+
+class StartupTimeline(object):
+    """When each startup step began and how long it took, in seconds since this
+    module was first imported. Steps running side by side on other threads show
+    up as overlapping spans."""
+
+    def __init__(self):
+        self._origin = time.monotonic()
+        self._lock = threading.Lock()
+        self._events = []
+        self._completed = False
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._add(name, start, time.monotonic())
+
+    def mark(self, name):
+        now = time.monotonic()
+        self._add(name, now, now)
+
+    def _add(self, name, start, end):
+        with self._lock:
+            self._events.append({
+                'name': name,
+                'thread': threading.current_thread().name,
+                'start_s': start - self._origin,
+                'duration_s': end - start,
+            })
+
+    def complete(self, name):
+        """Marks the end of startup and prints the timeline, the first time only"""
+        if self._completed:
+            return False
+
+        self._completed = True
+        self.mark(name)
+        self.print_report()
+        return True
+
+    def report(self):
+        with self._lock:
+            return sorted(self._events, key=lambda event: event['start_s'])
+
+    def print_report(self):
+        for event in self.report():
+            print(f"[startup] {event['start_s']:7.2f}s +{event['duration_s']:6.2f}s  {event['name']} ({event['thread']})")
+
+
+startup = StartupTimeline()
@@ -1,8 +1,9 @@
-import datetime
+import time
 
 
 class Stopwatch:
-    _MILLISECONDS_PER_SECOND = 1000
+    _NANOSECONDS_PER_MILLISECOND = 1000000
+    _NANOSECONDS_PER_MICROSECOND = 1000
 
     def __init__(self):
         self._duration = None
@@ -10,24 +11,35 @@ class Stopwatch:
 
     def stop(self):
         if self._duration is None:
-            end = datetime.datetime.now()
-            delta = end - self.start
-            # only return whole int number, don't need micro seconds
-            self._duration = int(delta.total_seconds() * Stopwatch._MILLISECONDS_PER_SECOND)
+            self._duration = time.perf_counter_ns() - self.start
 
-        return self._duration
+        # only return whole int number, don't need micro seconds
+        return self._duration // Stopwatch._NANOSECONDS_PER_MILLISECOND
 
     def get(self):
-        end = datetime.datetime.now()
-        delta = end - self.start
         # only return whole int number, don't need micro seconds
-        return int(delta.total_seconds() * Stopwatch._MILLISECONDS_PER_SECOND)
-        
+        return self.get_ns() // Stopwatch._NANOSECONDS_PER_MILLISECOND
+
+    def get_ns(self):
+        return time.perf_counter_ns() - self.start
+
+    def get_us(self):
+        return self.get_ns() / Stopwatch._NANOSECONDS_PER_MICROSECOND
+
+    def get_ms(self):
+        return self.get_ns() / Stopwatch._NANOSECONDS_PER_MILLISECOND
+
     def restart(self):
         ms = self.stop()
         self._reset()
         return ms
 
+    def restart_ns(self):
+        self.stop()
+        ns = self._duration
+        self._reset()
+        return ns
+
     def _reset(self):
-        self.start = datetime.datetime.now()
+        self.start = time.perf_counter_ns()
         self._duration = None
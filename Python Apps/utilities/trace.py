@@ -0,0 +1,91 @@
+import collections
+import json
+import struct
+import threading
+import time
+
+
+TRACE_OFF = 0
+TRACE_FRAME = 1
+TRACE_DEBUG = 2
+
+
+class Tracer(object):
+    """Level-gated per-frame trace records kept in an in-memory ring buffer.
+
+    Callers guard each record with is_enabled(), so nothing is built or formatted
+    when tracing is off. Enabled records are stored as raw tuples and only turned
+    into JSONL or binary when the buffer is dumped on a background thread. Records
+    may come from any thread; dumps are written one after the other, in order."""
+
+    _BINARY_MAGIC = b'GTRC'
+
+    def __init__(self,  level=TRACE_OFF,  capacity=10000,  echo=False):
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._last_dump = None
+        self.configure(level,  capacity,  echo)
+
+    def configure(self,  level=TRACE_OFF,  capacity=10000,  echo=False):
+        self.level = level
+        self.echo = echo
+        self._capacity = capacity
+        self._records = collections.deque(maxlen=capacity)
+
+    def register(self,  channel,  fields):
+        self._channels[channel] = tuple(fields)
+
+    def is_enabled(self,  level=TRACE_FRAME):
+        return self.level >= level
+
+    def record(self,  channel,  values):
+        with self._lock:
+            self._records.append((time.monotonic(),  channel,  values))
+        if self.echo:
+            fields = self._channels.get(channel,  ())
+            print(f"{channel}: " + " ".join(f"{field}={value}" for field, value in zip(fields, values)))
+
+    def drain(self):
+        """Swaps the ring buffer for an empty one and returns what it held"""
+        with self._lock:
+            records = self._records
+            self._records = collections.deque(maxlen=self._capacity)
+        # Nothing appends to the old buffer once it is swapped out under the lock
+        return list(records)
+
+    def dump_async(self,  path,  binary=False):
+        """Writes the drained records on a background thread, which waits for the
+        previous dump to finish first so that lines never interleave"""
+        records = self.drain()
+        target = self._write_binary if binary else self._write_jsonl
+        with self._lock:
+            thread = threading.Thread(target=self._write_after,  args=(self._last_dump,  target,  path,  records),  daemon=True)
+            self._last_dump = thread
+        thread.start()
+        return thread
+
+    def _write_after(self,  previous,  target,  path,  records):
+        if previous is not None:
+            previous.join()
+        target(path,  records)
+
+    def _write_jsonl(self,  path,  records):
+        with open(path,  'a') as f:
+            for timestamp, channel, values in records:
+                entry = {'t': timestamp,  'channel': channel}
+                entry.update(zip(self._channels.get(channel,  ()),  values))
+                f.write(json.dumps(entry) + '\n')
+
+    def _write_binary(self,  path,  records):
+        # Header (new files only): magic, length-prefixed JSON channel table. Records: channel id,
+        # value count, timestamp, then the values as doubles
+        channel_ids = {channel: idx for idx, channel in enumerate(self._channels)}
+        header = json.dumps([[channel, list(fields)] for channel, fields in self._channels.items()]).encode()
+        with open(path,  'ab') as f:
+            if f.tell() == 0:
+                f.write(self._BINARY_MAGIC + struct.pack('<I',  len(header)) + header)
+            for timestamp, channel, values in records:
+                f.write(struct.pack(f'<BBd{len(values)}d',  channel_ids.get(channel,  255),  len(values),  timestamp,  *values))
+
+
+tracer = Tracer()
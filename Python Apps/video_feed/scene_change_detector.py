@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+
+
+class SceneChangeDetector(object):
+    """Tells whether a frame is worth running the models on by differencing it
+    with the previous frame at thumbnail size.
+
+    A pixel has changed when its grey level moves by more than pixel_threshold.
+    While more than wake_fraction of the pixels change the scene is active and
+    every frame is inferred. Once fewer than idle_fraction have changed for
+    idle_after_frames frames in a row the scene is idle: the models only run
+    idle_fps times a second and the previous skeletons are reused in between.
+    The first frame over wake_fraction switches back at once."""
+
+    _THUMBNAIL_WIDTH = 80
+
+    def __init__(self, pixel_threshold=12, wake_fraction=0.01, idle_fraction=0.002, idle_after_frames=30, idle_fps=1.0):
+        self._pixel_threshold = pixel_threshold
+        self._wake_fraction = wake_fraction
+        self._idle_fraction = idle_fraction
+        self._idle_after_frames = idle_after_frames
+        self._idle_interval_s = 1.0 / idle_fps if idle_fps > 0 else float('inf')
+        self._previous = None
+        self._quiet_frames = 0
+        self._last_inference = None
+        self.idle = False
+        self.changed_fraction = 0.0
+        self.num_frames = 0
+        self.num_skipped = 0
+        self.num_wakeups = 0
+
+    def _thumbnail(self, image):
+        height = max(1, round(self._THUMBNAIL_WIDTH * image.shape[0] / image.shape[1]))
+        # Sampled down to twice the size, then averaged so sensor noise does not count
+        # as motion; a tenth of the cost of averaging the whole frame
+        sampled = cv2.resize(image, (2 * self._THUMBNAIL_WIDTH, 2 * height), interpolation=cv2.INTER_NEAREST)
+        small = cv2.resize(sampled, (self._THUMBNAIL_WIDTH, height), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    def should_infer(self, image, timestamp):
+        self.num_frames += 1
+        thumbnail = self._thumbnail(image)
+        if self._previous is None or self._previous.shape != thumbnail.shape:
+            self.changed_fraction = 1.0
+        else:
+            changed = cv2.absdiff(thumbnail, self._previous) > self._pixel_threshold
+            self.changed_fraction = float(np.count_nonzero(changed)) / changed.size
+        self._previous = thumbnail
+
+        if self.changed_fraction > self._wake_fraction:
+            if self.idle:
+                self.num_wakeups += 1
+            self.idle = False
+            self._quiet_frames = 0
+        elif self.changed_fraction < self._idle_fraction:
+            self._quiet_frames += 1
+            if self._quiet_frames >= self._idle_after_frames:
+                self.idle = True
+        else:
+            # In between the two thresholds the scene keeps its state
+            self._quiet_frames = 0
+
+        infer = (not self.idle or self._last_inference is None or
+                 timestamp - self._last_inference >= self._idle_interval_s)
+        if infer:
+            self._last_inference = timestamp
+        else:
+            self.num_skipped += 1
+
+        return infer
+
+    def skipped_ratio(self):
+        return self.num_skipped / self.num_frames if self.num_frames > 0 else 0.0
+
+    def stats(self):
+        return {
+            'idle': self.idle,
+            'changed_fraction': self.changed_fraction,
+            'frames': self.num_frames,
+            'skipped': self.num_skipped,
+            'skipped_ratio': self.skipped_ratio(),
+            'wakeups': self.num_wakeups,
+        }
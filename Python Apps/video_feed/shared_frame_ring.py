@@ -0,0 +1,183 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from jetcam.frame_pool import FrameBuffer
+
+
+class SharedFrame(FrameBuffer):
+    """A ring slot lent to a reader. array is a view of the shared memory rather than a
+    copy, so release() it once done and the writer can fill the slot again."""
+
+    __slots__ = ('slot',)
+
+    def __init__(self, ring, array, slot, seq, timestamp):
+        super().__init__(ring, array)
+        self.slot = slot
+        self.frame_id = seq
+        self.timestamp = timestamp
+
+
+class SharedFrameRing(object):
+    """Frames of one shape handed from a capture process to the process running the
+    models through num_slots slots of shared memory.
+
+    write() copies a frame into a slot nobody reads and publishes it as the latest
+    frame, with a sequence number and its capture time. read_latest() lends out the
+    latest frame in place, and the slot stays pinned until the frame is released. A
+    frame replaced before anyone read it counts as overwritten. When every other slot
+    is pinned the writer waits up to its backpressure timeout for one to be released,
+    then drops the frame, so a stalled reader never holds up capture for longer.
+
+    Both sides share one multiprocessing.Condition, which has to be handed to the other
+    process when it starts; the ring is created by the reading side and attached to by
+    name. Also works between two threads of one process."""
+
+    # Columns of the per-slot header
+    _SEQ, _PINS, _READ = range(3)
+    # The shared counters
+    (_LATEST, _NEXT_SEQ, _FINISHED, _WRITTEN, _DROPPED, _OVERWRITTEN, _NUM_READ,
+     _INTERVALS, _INTERVAL_SUM_US, _INTERVAL_SUMSQ_US, _INTERVAL_MAX_US) = range(11)
+    _NUM_COUNTERS = 11
+    _ALIGNMENT = 64
+
+    def __init__(self, shape, dtype=np.uint8, num_slots=8, cond=None, name=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.num_slots = num_slots
+        self._cond = cond if cond is not None else multiprocessing.Condition()
+        self._owner = name is None
+        self._last_write = None
+
+        slots_size = num_slots * 3 * 8
+        timestamps_size = num_slots * 8
+        counters_size = self._NUM_COUNTERS * 8
+        header_size = -(-(slots_size + timestamps_size + counters_size) // self._ALIGNMENT) * self._ALIGNMENT
+        frame_size = -(-int(np.prod(self.shape)) * self.dtype.itemsize // self._ALIGNMENT) * self._ALIGNMENT
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=header_size + num_slots * frame_size)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.name = self._shm.name
+
+        buf = self._shm.buf
+        self._slots = np.ndarray((num_slots, 3), dtype=np.int64, buffer=buf)
+        self._timestamps = np.ndarray((num_slots,), dtype=np.float64, buffer=buf, offset=slots_size)
+        self._counters = np.ndarray((self._NUM_COUNTERS,), dtype=np.int64, buffer=buf, offset=slots_size + timestamps_size)
+        self._frames = [np.ndarray(self.shape, dtype=self.dtype, buffer=buf, offset=header_size + slot * frame_size)
+                        for slot in range(num_slots)]
+        if self._owner:
+            self._slots[:] = 0
+            self._timestamps[:] = 0.0
+            self._counters[:] = 0
+            self._counters[self._LATEST] = -1
+            self._counters[self._NEXT_SEQ] = 1
+
+    def _free_slot(self):
+        latest = self._counters[self._LATEST]
+        free = [slot for slot in range(self.num_slots) if slot != latest and self._slots[slot, self._PINS] == 0]
+        # The oldest frame goes first
+        return min(free, key=lambda slot: self._slots[slot, self._SEQ]) if len(free) > 0 else None
+
+    def write(self, image, timestamp=None, timeout=0.0):
+        """Publishes a copy of image as the latest frame. Returns False, counting a drop,
+        when the reader holds every slot for longer than timeout."""
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._free_slot() is not None, timeout):
+                self._counters[self._DROPPED] += 1
+                return False
+            slot = self._free_slot()
+
+        # Readers only pin the latest slot, so this one is the writer's until it is published
+        np.copyto(self._frames[slot], image)
+
+        with self._cond:
+            latest = self._counters[self._LATEST]
+            if latest >= 0 and self._slots[latest, self._READ] == 0:
+                self._counters[self._OVERWRITTEN] += 1
+            self._slots[slot, self._SEQ] = self._counters[self._NEXT_SEQ]
+            self._slots[slot, self._READ] = 0
+            self._timestamps[slot] = timestamp
+            self._counters[self._LATEST] = slot
+            self._counters[self._NEXT_SEQ] += 1
+            self._counters[self._WRITTEN] += 1
+            self._record_interval(timestamp)
+            self._cond.notify_all()
+
+        return True
+
+    def _record_interval(self, timestamp):
+        if self._last_write is not None:
+            interval_us = int((timestamp - self._last_write) * 1e6)
+            self._counters[self._INTERVALS] += 1
+            self._counters[self._INTERVAL_SUM_US] += interval_us
+            self._counters[self._INTERVAL_SUMSQ_US] += interval_us * interval_us
+            self._counters[self._INTERVAL_MAX_US] = max(self._counters[self._INTERVAL_MAX_US], interval_us)
+        self._last_write = timestamp
+
+    def finish(self):
+        """Tells the reader that no more frames will be written"""
+        with self._cond:
+            self._counters[self._FINISHED] = 1
+            self._cond.notify_all()
+
+    def is_finished(self):
+        return bool(self._counters[self._FINISHED])
+
+    def read_latest(self, after_seq=0, timeout=None):
+        """The latest frame as a SharedFrame, waiting up to timeout for one newer than
+        after_seq. None on timeout, or once the writer has finished and every frame was read."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._counters[self._NEXT_SEQ] - 1 > after_seq or self._counters[self._FINISHED], timeout)
+            slot = self._counters[self._LATEST]
+            if slot < 0 or self._slots[slot, self._SEQ] <= after_seq:
+                return None
+
+            self._slots[slot, self._PINS] += 1
+            if self._slots[slot, self._READ] == 0:
+                self._slots[slot, self._READ] = 1
+                self._counters[self._NUM_READ] += 1
+            seq = int(self._slots[slot, self._SEQ])
+            timestamp = float(self._timestamps[slot])
+
+        return SharedFrame(self, self._frames[slot], slot, seq, timestamp)
+
+    def _put(self, frame):
+        with self._cond:
+            self._slots[frame.slot, self._PINS] -= 1
+            self._cond.notify_all()
+        frame.array = None
+
+    def stats(self):
+        with self._cond:
+            counters = self._counters.copy()
+            in_use = int(np.count_nonzero(self._slots[:, self._PINS]))
+
+        intervals = counters[self._INTERVALS]
+        mean_us = float(counters[self._INTERVAL_SUM_US] / intervals) if intervals > 0 else 0.0
+        variance = counters[self._INTERVAL_SUMSQ_US] / intervals - mean_us * mean_us if intervals > 0 else 0.0
+        return {
+            'written': int(counters[self._WRITTEN]),
+            'read': int(counters[self._NUM_READ]),
+            'overwritten': int(counters[self._OVERWRITTEN]),
+            'dropped': int(counters[self._DROPPED]),
+            'in_use': in_use,
+            'interval_ms': mean_us / 1000.0,
+            'jitter_ms': float(np.sqrt(max(variance, 0.0))) / 1000.0,
+            'max_interval_ms': float(counters[self._INTERVAL_MAX_US]) / 1000.0,
+        }
+
+    def close(self):
+        """Unmaps the ring, and frees it when this side created it"""
+        self._slots = self._timestamps = self._counters = None
+        self._frames = []
+        try:
+            self._shm.close()
+        except BufferError:
+            # A frame still held somewhere keeps the mapping alive until it is collected
+            pass
+        if self._owner:
+            self._shm.unlink()
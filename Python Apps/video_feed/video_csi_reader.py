@@ -5,9 +5,17 @@ import time
 import numpy as np
 
 class VideoCSIReader(VideoReader):
+
+    CAPTURE_WIDTH = 400
+    CAPTURE_HEIGHT = 300
     
-    def __init__(self):
-        self._camera = CSICamera(width=224, height=224, capture_width=400, capture_height=300, capture_fps=30)
+    def __init__(self, background_capture=True, full_resolution=False):
+        """Frames come squashed to the 224x224 pose model input, or at the capture
+        resolution with full_resolution, for OpenPose(crop_to_person=True) to crop from"""
+        width, height = (self.CAPTURE_WIDTH, self.CAPTURE_HEIGHT) if full_resolution else (224, 224)
+        self._camera = CSICamera(width=width, height=height, capture_width=self.CAPTURE_WIDTH, capture_height=self.CAPTURE_HEIGHT, capture_fps=30)
+        # The camera thread captures every frame as it arrives, so reading never waits on the sensor
+        self._camera.running = background_capture
             
     def read_frame(self,  show_preview=False):
         img = self._camera.read()
@@ -20,4 +28,9 @@ class VideoCSIReader(VideoReader):
             cv2.waitKey(1)
         
         return img
-        
+
+    def read_frame_buffer(self):
+        return self._camera.read_buffer()
+
+    def stats(self):
+        return self._camera.stats()
@@ -1,6 +1,6 @@
 from .video_reader import VideoReader
+from jetcam.frame_pool import shared_pool, unpooled
 import cv2
-from PIL import Image
 import time
 import numpy as np
 
@@ -8,6 +8,7 @@ class VideoOfflineReader(VideoReader):
     
     def __init__(self, file_path):
         self._cap = cv2.VideoCapture(file_path)
+        self._pool = None
             
     def read_frame(self,  show_preview=False):
         ret_val, img = self._cap.read()
@@ -18,4 +19,22 @@ class VideoOfflineReader(VideoReader):
             cv2.waitKey(1)
         
         return img
-        
+
+    def read_frame_buffer(self):
+        if self._pool is None:
+            height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            self._pool = shared_pool((height,  width,  3))
+
+        buffer = self._pool.acquire()
+        # Decodes in place as long as the frame matches the pooled shape
+        ret_val, img = self._cap.read(image=buffer.array)
+        if not ret_val:
+            buffer.release()
+            return None
+
+        if img is not buffer.array:
+            buffer.release()
+            return unpooled(img)
+
+        return buffer
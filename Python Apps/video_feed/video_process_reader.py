@@ -0,0 +1,114 @@
+import multiprocessing
+from multiprocessing import resource_tracker
+
+import numpy as np
+
+from .video_reader import VideoReader
+from .shared_frame_ring import SharedFrameRing
+
+
+def _capture_main(reader_class, reader_args, cond, conn, stop, num_slots, backpressure_timeout_s):
+    ring = None
+    buffer = None
+    try:
+        reader = reader_class(*reader_args)
+        buffer = reader.read_frame_buffer()
+        if buffer is None:
+            conn.send(None)
+            return
+
+        # The reading side sizes the ring from the first frame and sends back its name
+        conn.send((buffer.array.shape, buffer.array.dtype.str))
+        ring = SharedFrameRing(buffer.array.shape, buffer.array.dtype, num_slots, cond, name=conn.recv())
+        while buffer is not None and not stop.is_set():
+            ring.write(buffer.array, buffer.timestamp, backpressure_timeout_s)
+            buffer.release()
+            buffer = reader.read_frame_buffer()
+    except (KeyboardInterrupt, EOFError):
+        pass
+    finally:
+        if buffer is not None:
+            buffer.release()
+        if ring is not None:
+            ring.finish()
+            ring.close()
+
+
+class VideoProcessReader(VideoReader):
+    """Runs reader_class(*reader_args) in a capture process of its own, which writes every
+    frame into a SharedFrameRing, so capture never waits for the GIL or for a stalled
+    inference step in this process.
+
+    read_frame_buffer() returns the newest frame not returned yet, in place in shared
+    memory; frames that arrived in between are skipped and counted as overwritten.
+    The process is forked, as main.py has no __main__ guard for a spawned process to
+    import it behind, so create the reader before starting any other thread."""
+
+    _START_METHOD = 'fork'
+    _JOIN_TIMEOUT_S = 2.0
+
+    def __init__(self, reader_class, *reader_args, num_slots=8, backpressure_timeout_s=0.0, read_timeout_s=0.5):
+        context = multiprocessing.get_context(self._START_METHOD)
+        self._num_slots = num_slots
+        self._read_timeout_s = read_timeout_s
+        self._cond = context.Condition()
+        self._stop = context.Event()
+        self._conn, child_conn = context.Pipe()
+        self._ring = None
+        self._last_seq = 0
+        self._process = context.Process(target=_capture_main, name='capture', daemon=True,
+                                        args=(reader_class, reader_args, self._cond, child_conn, self._stop,
+                                              num_slots, backpressure_timeout_s))
+        # Started before the fork so both processes share it; a tracker of the capture
+        # process's own would free the ring as soon as that process exits
+        resource_tracker.ensure_running()
+        self._process.start()
+        # So that recv() fails instead of waiting forever if the capture process dies
+        child_conn.close()
+
+    def _attach(self):
+        try:
+            spec = self._conn.recv()
+        except EOFError:
+            spec = None
+        if spec is None:
+            return False
+
+        shape, dtype = spec
+        self._ring = SharedFrameRing(shape, dtype, self._num_slots, self._cond)
+        self._conn.send(self._ring.name)
+        return True
+
+    def read_frame(self):
+        frame = self.read_frame_buffer()
+        if frame is None:
+            return None
+
+        image = np.copy(frame.array)
+        frame.release()
+        return image
+
+    def read_frame_buffer(self):
+        if self._ring is None and not self._attach():
+            return None
+
+        while True:
+            frame = self._ring.read_latest(self._last_seq, self._read_timeout_s)
+            if frame is not None:
+                self._last_seq = frame.frame_id
+                return frame
+            if self._ring.is_finished() or not self._process.is_alive():
+                return None
+
+    def stats(self):
+        return self._ring.stats() if self._ring is not None else {}
+
+    def close(self):
+        self._stop.set()
+        self._process.join(self._JOIN_TIMEOUT_S)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
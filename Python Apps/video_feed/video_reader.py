@@ -1,8 +1,18 @@
 import abc
 
+from jetcam.frame_pool import unpooled
+
 
 class VideoReader(metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
     def read_frame(self):
         """ required method """
+
+    def read_frame_buffer(self):
+        """ Returns the next frame as a FrameBuffer to release() when done, or None """
+        img = self.read_frame()
+        if img is None:
+            return None
+
+        return unpooled(img)